@@ -1,23 +1,33 @@
 import os
 import json
-from flask import Flask, render_template, request, redirect, url_for, jsonify
+from flask import (
+    Flask,
+    Response,
+    render_template,
+    request,
+    redirect,
+    url_for,
+    jsonify,
+    stream_with_context,
+)
 from multiprocessing import Value
-from fake_headers import Headers
 from urllib.parse import urlparse
 
 try:
     from manga import Manga, Chapter
+    from manga_sources.store import get_store
     from tools import Downloader, logger, driver_manager as manager, get_app_path
+    from tools.image_utils import EINK_PROFILES, ENCODERS
 except ImportError:
     from manga_dl.manga import Manga, Chapter
+    from manga_dl.manga_sources.store import get_store
     from manga_dl.tools import (
         Downloader,
         logger,
         driver_manager as manager,
         get_app_path,
     )
-
-headers = Headers().generate()
+    from manga_dl.tools.image_utils import EINK_PROFILES, ENCODERS
 
 app = Flask(__name__, static_folder="public")
 app.url_map.strict_slashes = False
@@ -40,7 +50,7 @@ def index():
 @app.route("/search/<string:query>", methods=["GET"])
 def search_query(query):
     query = query.replace("%%%", "/")
-    mangas = Manga.search(query)
+    mangas = Manga.cluster(Manga.search(query))
     return render_template("search.html", results=mangas, query=query)
 
 
@@ -90,7 +100,9 @@ def manga_chapters(manga_id, chapter_id):
     chapter = Chapter.from_url(chapter_url)
 
     if chapter.source.use_selenium_in_get_chapter_img_urls:
-        id, driver = manager.get_driver()
+        id, driver = manager.get_driver(
+            chapter.source.driver_remove_options, chapter.source.driver_capabilities
+        )
         imgs = chapter.get_chapter_imgs(driver=driver)
         manager.release_driver(id)
     else:
@@ -118,7 +130,7 @@ def search():
     error = ""
     try:
         if query:
-            mangas = Manga.search(query)
+            mangas = Manga.cluster(Manga.search(query))
             results = [i.to_json() for i in mangas]
         else:
             suc = False
@@ -139,18 +151,60 @@ def search():
     return jsonify(data)
 
 
+@app.route("/api/search/stream", methods=["GET"])
+def search_stream():
+    query = request.args.get("query", "")
+
+    def events():
+        if not query:
+            yield f"event: error\ndata: {json.dumps({'error': 'No query provided'})}\n\n"
+            return
+
+        found = []
+        try:
+            for source, mangas in Manga.search_iter(query):
+                found.extend(mangas)
+                data = {"source": source, "results": [i.to_json() for i in mangas]}
+                yield f"data: {json.dumps(data)}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming search results: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': 'Unknown error'})}\n\n"
+
+        # everything ranked together, with the same series from several sources merged
+        mangas = Manga.cluster(Manga.rank(query, found))
+        data = {"results": [i.to_json() for i in mangas]}
+        yield f"event: done\ndata: {json.dumps(data)}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.route("/api/manga/download", methods=["POST"])
 def manga_download():
     if isDownloading.value == 1:  # type: ignore
         return jsonify({"success": False, "message": "Only one download at a time"})
 
-    isDownloading.value = 1  # type: ignore
     data = request.get_json()
     start_id = data["start_id"]
     end_id = data["end_id"]
     quality = data["quality"]
     dtypes = data["dtypes"]
     manga_id = data["manga_id"]
+    profile = data.get("profile", None)
+    img_format = data.get("img_format", "jpeg")
+    dedup = bool(data.get("dedup", False))
+
+    if profile and profile not in EINK_PROFILES:
+        message = f"Unknown profile {profile}, use one of {', '.join(EINK_PROFILES)}"
+        return jsonify({"success": False, "message": message}), 400
+    if img_format not in ENCODERS:
+        message = f"Unknown image format {img_format}, use one of {', '.join(ENCODERS)}"
+        return jsonify({"success": False, "message": message}), 400
+
+    isDownloading.value = 1  # type: ignore
 
     quality = int(quality)
 
@@ -168,9 +222,15 @@ def manga_download():
         paths = []
         for dtype in dtypes:
             if dtype == "pdf":
-                path = manga.create_pdf(quality=quality)
+                path = manga.create_pdf(quality=quality, profile=profile, dedup=dedup)
+            elif dtype == "cbz":
+                path = manga.create_cbz(
+                    quality=quality, profile=profile, img_format=img_format, dedup=dedup
+                )
             else:
-                path = manga.create_epub(quality=quality)
+                path = manga.create_epub(
+                    quality=quality, profile=profile, img_format=img_format, dedup=dedup
+                )
             paths.append(os.path.abspath(path))
         data["paths"] = paths
     except Exception as e:
@@ -223,7 +283,9 @@ def manga_chapter_img():
 
     else:
         if chapter.source.use_selenium_in_get_chapter_img_urls:
-            id, driver = manager.get_driver()
+            id, driver = manager.get_driver(
+                chapter.source.driver_remove_options, chapter.source.driver_capabilities
+            )
             imgs = chapter.get_chapter_imgs(driver=driver)
             manager.release_driver(id)
         else:
@@ -237,9 +299,12 @@ def manga_chapter_img():
 def img_url(url):
     url = url_decode(url)
     parse = urlparse(url)
-    headers["Referer"] = f"{parse.scheme}://{parse.netloc}"
+    # the client adds its own headers
+    headers = {"Referer": f"{parse.scheme}://{parse.netloc}"}
 
-    urlpath = Downloader.download_one(url, headers=headers, download_dir=temp_dir)
+    urlpath = Downloader.download_one(
+        url, headers=headers, download_dir=temp_dir, validators=get_store(temp_dir)
+    )
 
     with open(urlpath.filepath, "rb") as f:
         return f.read(), 200, {"Content-Type": "image/jpeg"}
@@ -250,9 +315,11 @@ def img_url_post():
     data = request.get_json()
     url = data["url"]
     referer = data["referer"]
-    headers["Referer"] = referer
+    headers = {"Referer": referer}
 
-    urlpath = Downloader.download_one(url, headers=headers, download_dir=temp_dir)
+    urlpath = Downloader.download_one(
+        url, headers=headers, download_dir=temp_dir, validators=get_store(temp_dir)
+    )
 
     with open(urlpath.filepath, "rb") as f:
         return f.read(), 200, {"Content-Type": "image/jpeg"}
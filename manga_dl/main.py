@@ -4,17 +4,20 @@ import argparse
 import webbrowser
 import sys
 import logging
+import multiprocessing
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 try:
     from app import app
     from tools import logger, run_with_cloudflared, get_app_path
-    from manga import Manga
+    from manga import Manga, SearchResult
+    from watchlist import Watchlist, SYNC_INTERVAL, sync
 except ImportError:
     from manga_dl.app import app
     from manga_dl.tools import logger, run_with_cloudflared, get_app_path
-    from manga_dl.manga import Manga
+    from manga_dl.manga import Manga, SearchResult
+    from manga_dl.watchlist import Watchlist, SYNC_INTERVAL, sync
 
 
 from pytimedinput import timedInput
@@ -55,6 +58,8 @@ def prompt(query=None):
     }
     manga = qs.select("Select a manga:", choices=list(mangas_dict.keys())).ask()
     manga = mangas_dict[manga]
+    if isinstance(manga, SearchResult):
+        manga = manga.manga()
     manga.set_info()
     # show total chapters
     print(f"Total chapters: {manga.total_chapters}")
@@ -86,7 +91,7 @@ def prompt(query=None):
 
     # select epub or pdf
     choices = qs.checkbox(
-        "Select formats:", choices=["epub", "pdf"], default="epub"
+        "Select formats:", choices=["epub", "pdf", "cbz"], default="epub"
     ).ask()
     # quality 1-100
     quality = qs.text(
@@ -104,6 +109,8 @@ def prompt(query=None):
             path = manga.create_epub(quality=quality)
         elif choice == "pdf":
             path = manga.create_pdf(quality=quality)
+        elif choice == "cbz":
+            path = manga.create_cbz(quality=quality)
     
     path = os.path.dirname(path)
     os.system(f'start {os.path.realpath(path)}')
@@ -138,17 +145,65 @@ def cli(args):
             args.format = "epub"
             logger.info(f"Format not specified, defaulting to {args.format}")
 
+        target_size = None
+        if args.target_size:
+            target_size = args.target_size * 1024
+            logger.info(f"Target size: {args.target_size}KB per {args.target_per}")
+
+        options = {
+            "quality": quality,
+            "target_size": target_size,
+            "target_per": args.target_per,
+            "min_ssim": args.min_ssim,
+            "profile": args.profile,
+        }
+        if args.format != "pdf":
+            options["img_format"] = args.img_format
+
+        if args.dedup:
+            options["dedup"] = True
+        if args.drop_pages:
+            with open(args.drop_pages, "r") as f:
+                options["drop_pages"] = [i.strip() for i in f if i.strip()]
+
+        if args.profile:
+            logger.info(f"Profile: {args.profile}")
+
         logger.info(f"Format: {args.format}")
         logger.info(f"Dowloading {manga.title}...")
         if args.format == "epub":
-            manga.create_epub(quality=quality)
+            manga.create_epub(**options)
         elif args.format == "pdf":
-            manga.create_pdf(quality=quality)
+            manga.create_pdf(**options)
+        elif args.format == "cbz":
+            manga.create_cbz(**options)
 
         logger.info("Done!")
         sys.exit(0)
 
 
+def watch(args):
+    watchlist = Watchlist()
+
+    if args.unwatch:
+        if not watchlist.remove(Manga.autodetect(args.unwatch, args.source).url):
+            logger.info(f"{args.unwatch} is not in the watchlist")
+        return
+
+    if args.manga:
+        manga = Manga.autodetect(args.manga, args.source)
+        quality = max(10, min(100, args.quality))
+        watchlist.add(manga, args.format or "epub", quality, download_existing=args.all_chapters)
+        if not args.once:
+            return
+
+    if not len(watchlist):
+        logger.info("The watchlist is empty, add a manga with: sync -m <manga> -f <format>")
+        return
+
+    sync(watchlist, interval=args.interval, once=args.once)
+
+
 def parser():
     parser = argparse.ArgumentParser(
         description="Manga Downloader",
@@ -157,7 +212,7 @@ def parser():
     parser.add_argument(
         "mode",
         nargs="?",
-        choices=["gui", "prompt", "cli"],
+        choices=["gui", "prompt", "cli", "sync"],
         help="Mode to run",
         default="prompt",
     )
@@ -171,12 +226,66 @@ def parser():
     parser.add_argument(
         "-f",
         "--format",
-        choices=["epub", "pdf"],
-        help="Format to download epub or pdf",
+        choices=["epub", "pdf", "cbz"],
+        help="Format to download epub, pdf or cbz",
+    )
+    parser.add_argument(
+        "-if",
+        "--img-format",
+        choices=["jpeg", "webp", "avif"],
+        default="jpeg",
+        help="Image encoder for epub and cbz pages (pdf is always jpeg)",
     )
     parser.add_argument(
         "-q", "--quality", type=int, default=100, help="Quality of images 10-100"
     )
+    parser.add_argument(
+        "-ts",
+        "--target-size",
+        type=int,
+        help="Size budget in KB, the quality of each page is searched to fit it",
+    )
+    parser.add_argument(
+        "--target-per",
+        choices=["page", "volume"],
+        default="page",
+        help="Apply the size budget per page or to the whole volume",
+    )
+    parser.add_argument(
+        "--min-ssim",
+        type=float,
+        help="Minimum SSIM (0-1) a page must keep when fitting to size",
+    )
+    parser.add_argument(
+        "-pr",
+        "--profile",
+        choices=["eink", "eink-ordered", "eink-jpeg"],
+        help="Output profile, e-ink profiles save 4-bit grayscale dithered pages",
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Store repeated pages (credits, recruitment pages) only once",
+    )
+    parser.add_argument(
+        "--drop-pages",
+        help="File with filler pages to remove, one dHash (hex) or image path per line",
+    )
+    parser.add_argument(
+        "--interval",
+        type=int,
+        default=SYNC_INTERVAL,
+        help="sync: seconds between two checks of the watchlist",
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="sync: check the watchlist once and exit"
+    )
+    parser.add_argument("--unwatch", help="sync: manga to remove from the watchlist")
+    parser.add_argument(
+        "--all-chapters",
+        action="store_true",
+        help="sync: download the chapters already out when adding a manga",
+    )
     parser.add_argument("--host", default="0.0.0.0", help="Host address of server")
     parser.add_argument("-p", "--port", default=80, type=int, help="Port of server")
     parser.add_argument(
@@ -227,8 +336,12 @@ def parser():
     elif args.mode == "cli":
         cli(args)
 
+    elif args.mode == "sync":
+        watch(args)
+
 
 def main():
+    multiprocessing.freeze_support()
     try:
         parser()
     except KeyboardInterrupt:
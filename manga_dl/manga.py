@@ -7,13 +7,17 @@ from typing import Union
 import concurrent.futures as cf
 from ebooklib import epub
 import re
-import requests
 import os
 import shutil
 import sys
+import threading
+import time
+import asyncio
+from queue import Empty, Queue
 
 from PIL import Image
-from fuzzywuzzy import fuzz
+import numpy as np
+from rapidfuzz import fuzz, process, utils as fuzz_utils
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
@@ -21,6 +25,7 @@ from tools import (
     Downloader,
     PDFChapter,
     PDF,
+    CBZ,
     create_failure_image,
     get_file_name,
     URLFile,
@@ -29,11 +34,30 @@ from tools import (
     driver_manager as manager,
     get_app_path,
     share_progress_bar,
+    split_strip,
 )
 
 from tools.exceptions import MangaNotFound
+from tools.image_utils import (
+    encode_page,
+    encoded_filename,
+    encoder_available,
+    fit_quality,
+    find_duplicates,
+    find_fillers,
+    format_hash,
+    page_signature,
+    eink_convert,
+    eink_filename,
+    media_type,
+    EINK_PROFILES,
+    EXTENSIONS,
+)
 
 from manga_sources import Chapter, MangaInfo, BaseSource, get_source, sources
+from manga_sources.utils import scraper
+from manga_sources.catalog import get_catalog
+from manga_sources.store import close_stores, get_store
 
 
 app_path = get_app_path()
@@ -49,6 +73,66 @@ class classproperty(property):
         return classmethod(self.fget).__get__(None, owner)()  # type: ignore
 
 
+class SearchResult:
+    """
+    A search hit, only what the results list shows: the MangaInfo of the
+    search and its source. Becomes a full Manga with manga() once picked.
+
+    Other attributes (title, cover_url, last_chapter...) are read from the MangaInfo.
+    """
+
+    __slots__ = ("info", "source", "other_sources")
+
+    def __init__(self, info: MangaInfo):
+        self.info = info
+        self.source: BaseSource = get_source(info.url)
+        # same series on other sources, set by Manga.cluster
+        self.other_sources: list["SearchResult"] = []
+
+    def __getattr__(self, name: str):
+        if name in SearchResult.__slots__:
+            raise AttributeError(name)
+        return getattr(self.info, name)
+
+    @property
+    def id(self) -> str:
+        return self.source.id
+
+    @property
+    def author(self) -> str:
+        return ", ".join(self.info.authors)
+
+    def manga(self) -> "Manga":
+        return Manga.from_mangainfo(self.info)
+
+    def to_json(self) -> dict:
+        info = self.info
+        return {
+            "url": info.url,
+            "id": self.id,
+            "title": info.title,
+            "cover_url": info.cover_url,
+            "author": self.author,
+            "alternative_title": ", ".join(info.alternative_titles),
+            "status": info.status,
+            "genre": ", ".join(info.genres),
+            "description": info.description,
+            "total_chapters": len(info.chapters),
+            "last_chapter": info.last_chapter,
+            "updated": info.last_updated,
+            "views": info.views,
+            "rating": info.rating,
+            "chapters": info.chapters,
+            "domain": self.source.current_domain,
+            "other_sources": [
+                {"id": i.id, "domain": i.source.current_domain} for i in self.other_sources
+            ],
+        }
+
+    def __repr__(self) -> str:
+        return f"SearchResult({self.info.url})"
+
+
 class Manga:
     """
     Manga
@@ -89,18 +173,22 @@ class Manga:
         self.artists = []
         self.views = ""
         self.rating = ""
+        # same series on other sources, set by Manga.cluster
+        self.other_sources: list["Manga"] = []
         self.retry_count = int(os.environ.get("RETRY_COUNT", "3"))
 
         self.temp_dir = os.environ.get("TEMP_DIR", "tmp")
         if not os.path.exists(self.temp_dir):
             os.makedirs(self.temp_dir)
 
-        self.headers = self.source.headers
 
         self._info_set = False
         self._save_chapters_str = ""
         self._pbar = None
         self._quality = 100
+        self._target_size = None
+        self._profile = None
+        self._img_format = "jpeg"
         # self._manager = FileManager()
 
         self.check_temp_dir()
@@ -112,6 +200,7 @@ class Manga:
         """
 
         temp_dir = os.environ.get("TEMP_DIR", "tmp")
+        close_stores()
         if os.path.exists(temp_dir):
             shutil.rmtree(temp_dir)
         os.makedirs(temp_dir)
@@ -126,6 +215,10 @@ class Manga:
     
     
 
+    @property
+    def headers(self) -> dict:
+        return self.source.headers
+
     @property
     def genre(self) -> str:
         return ", ".join(self.genres)
@@ -151,32 +244,164 @@ class Manga:
         return len(self.chapters)
 
     @staticmethod
-    def search(query: str) -> list["Manga"]:
+    def search_iter(query: str, deadline: Union[float, None] = None):
+        """
+        Search for manga in all sources, yielding results as each source finishes
+
+        Parameters:
+        -----------
+        query: str -> query to search for
+        deadline: float -> seconds to wait for each source from when its search started,
+            SEARCH_DEADLINE by default. Sources that miss it are left running in the background.
+
+        Yields:
+        -------
+        tuple[str, list[SearchResult]] -> source name and its results, best matches first
+        """
+        if deadline is None:
+            deadline = float(os.environ.get("SEARCH_DEADLINE", 10))
+
+        done: Queue = Queue()
+        started: dict[str, float] = {}
+
+        def run(source):
+            started[source.name] = time.monotonic()
+            try:
+                done.put((source, source.search(query), None))
+            except Exception as e:
+                done.put((source, [], e))
+
+        # daemon threads, a hung source neither blocks the caller nor the exit
+        for source in sources:
+            threading.Thread(target=run, args=(source,), daemon=True).start()
+
+        pending = {source.name: source for source in sources}
+        while pending:
+            # each source gets the whole deadline from when it started
+            now = time.monotonic()
+            ends = {name: started.get(name, now) + deadline for name in pending}
+            late = [name for name, end in ends.items() if end <= now]
+            if late:
+                domains = ", ".join(pending.pop(name).domain for name in late)
+                logger.warning(f"Search deadline of {deadline}s missed by {domains}")
+                continue
+
+            try:
+                source, found, error = done.get(timeout=min(ends.values()) - now)
+            except Empty:
+                continue
+            if source.name not in pending:
+                continue
+            del pending[source.name]
+
+            if error:
+                logger.error(f"Error searching {source.domain}: {error}")
+                continue
+            yield source.name, Manga.rank(query, [SearchResult(i) for i in found])
+
+    @staticmethod
+    def search(
+        query: str, deadline: Union[float, None] = None, callback=None
+    ) -> list["SearchResult"]:
         """
         Search for manga in all sources
 
         Parameters:
         -----------
         query: str -> query to search for
+        deadline: float -> seconds to wait for the sources, SEARCH_DEADLINE by default
+        callback: Callable[[str, list[SearchResult]], None] -> called with each source's results as they come
 
         Returns:
         --------
-        list[Manga] -> list of Manga objects
+        list[SearchResult] -> results, best matches first. SearchResult.manga() gives the Manga
         """
 
         mangas = []
-        with cf.ThreadPoolExecutor() as executor:
-            futures = [executor.submit(source.search, query) for source in sources]
-            for future in cf.as_completed(futures):
-                results = future.result()
-                mangas.extend(results)
-
-        mangas = [Manga.from_mangainfo(manga) for manga in mangas]
-        mangas.sort(
-            key=lambda x: fuzz.ratio(x.title.lower(), query.lower()), reverse=True
+        for source, results in Manga.search_iter(query, deadline):
+            if callback:
+                callback(source, results)
+            mangas.extend(results)
+
+        return Manga.rank(query, mangas)
+
+    @staticmethod
+    def scores(query: str, mangas: list, scorer=fuzz.ratio) -> list[float]:
+        """
+        How well each manga matches the query: the best score over its title
+        and alternative titles, computed in one batch.
+
+        Parameters:
+        -----------
+        query: str -> query to score against
+        mangas: list[Manga | MangaInfo] -> anything with title and alternative_titles
+        scorer: rapidfuzz scorer, fuzz.ratio by default
+
+        Returns:
+        --------
+        list[float] -> scores from 0 to 100, in the order of mangas
+        """
+        names = []
+        owners = []
+        for i, manga in enumerate(mangas):
+            for name in [manga.title, *manga.alternative_titles]:
+                names.append(name)
+                owners.append(i)
+
+        best = np.zeros(len(mangas))
+        if names:
+            matrix = process.cdist(
+                [query], names, scorer=scorer, processor=fuzz_utils.default_process, workers=-1
+            )
+            np.maximum.at(best, owners, matrix[0])
+        return best.tolist()
+
+    @staticmethod
+    def rank(query: str, mangas: list, scorer=fuzz.ratio) -> list:
+        """mangas sorted by their score against the query, best first"""
+        scores = Manga.scores(query, mangas, scorer)
+        order = sorted(range(len(mangas)), key=lambda i: scores[i], reverse=True)
+        return [mangas[i] for i in order]
+
+    @staticmethod
+    def cluster(mangas: list, ratio: Union[int, None] = None) -> list:
+        """
+        Merge the results of different sources that are the same series.
+
+        Each result joins the first earlier one with a title scoring at least
+        ratio (CLUSTER_RATIO, 95 by default) that has no result from its source
+        yet, so the order of mangas decides which source is shown first.
+
+        Returns:
+        --------
+        list[Manga | SearchResult] -> one manga per series, the others in its other_sources
+        """
+        if ratio is None:
+            ratio = int(os.environ.get("CLUSTER_RATIO", 95))
+
+        titles = [manga.title for manga in mangas]
+        matrix = process.cdist(
+            titles,
+            titles,
+            scorer=fuzz.token_sort_ratio,
+            processor=fuzz_utils.default_process,
+            score_cutoff=ratio,
+            workers=-1,
         )
 
-        return mangas
+        # first manga of each cluster: sources in the cluster
+        clusters: dict[int, set[str]] = {}
+        for i, manga in enumerate(mangas):
+            manga.other_sources = []
+            for c in np.flatnonzero(matrix[i, :i]).tolist():
+                if c in clusters and manga.source.name not in clusters[c]:
+                    clusters[c].add(manga.source.name)
+                    mangas[c].other_sources.append(manga)
+                    break
+            else:
+                clusters[i] = {manga.source.name}
+
+        return [mangas[c] for c in clusters]
 
     @classmethod
     def from_json(cls, data: dict) -> "Manga":
@@ -194,11 +419,45 @@ class Manga:
 
     @classmethod
     def from_id(cls, id: str) -> "Manga":
+        # a manga seen before, whatever the source can tell from the id alone
+        cached = get_store().manga_by_id(id)
+        if cached:
+            return cls(cached["url"])
         for s in sources:
             if s.valid_id(id):
                 return cls(s.id_to_url(id))
         raise MangaNotFound(f"Could not find manga with id: {id}")
 
+    @classmethod
+    def from_catalog(cls, title: str, source: str = "") -> Union["Manga", None]:
+        """
+        Best match for a title in the local catalog, None unless it is close
+        enough (CATALOG_MIN_RATIO) to skip the live search
+        """
+        catalog = get_catalog()
+        if not catalog:
+            return None
+
+        min_ratio = int(os.environ.get("CATALOG_MIN_RATIO", 90))
+        infos = [MangaInfo.from_json(data) for data in catalog.search(title)]
+        scores = Manga.scores(title, infos, fuzz.token_set_ratio)
+        for r, info in sorted(zip(scores, infos), key=lambda x: x[0], reverse=True):
+            if r < min_ratio:
+                break
+
+            try:
+                manga = cls.from_mangainfo(info)
+            except Exception:
+                # from a source that is gone
+                continue
+            if source and source not in manga.source:
+                continue
+
+            logger.info(f"Found {title} in the catalog: {manga.url}")
+            return manga
+
+        return None
+
     @classmethod
     def autodetect(cls, inp, source: str = "") -> "Manga":
         if isinstance(inp, str):
@@ -206,23 +465,28 @@ class Manga:
                 manga = cls(inp)
                 manga.set_info()
                 return manga
+            elif get_store().manga_by_id(inp):
+                manga = cls.from_id(inp)
+                manga.set_info()
+                return manga
             else:
-                most_likely = None
+                most_likely = cls.from_catalog(inp, source)
+                if most_likely:
+                    return most_likely
+
                 mangas = Manga.search(inp)
+                if source:
+                    mangas = [i for i in mangas if source in i.source]
+
                 # find most likely with title with fuzz
                 ratio = 0
-                for manga in mangas:
-                    if source:
-                        if source not in manga.source:
-                            continue
-
-                    r = fuzz.token_set_ratio(manga.title.upper(), inp.upper())
+                for r, manga in zip(Manga.scores(inp, mangas, fuzz.token_set_ratio), mangas):
                     if r > ratio:
                         ratio = r
                         most_likely = manga
                 if not most_likely:
                     raise MangaNotFound(f"Could not find manga with title: {inp}")
-                return most_likely
+                return most_likely.manga()
 
         elif isinstance(inp, Manga):
             return inp
@@ -251,6 +515,9 @@ class Manga:
             "rating": self.rating,
             "chapters": self.chapters,
             "domain": self.source.current_domain,
+            "other_sources": [
+                {"id": i.id, "domain": i.source.current_domain} for i in self.other_sources
+            ],
         }
 
     def __str__(self) -> str:
@@ -300,14 +567,36 @@ class Manga:
         else:
             quality = self._quality
 
+        if self._target_size:
+            quality = f"{quality}_size_{self._target_size // 1024}KB"
+        if self._profile:
+            quality = f"{quality}_{self._profile}"
+        elif self._img_format != "jpeg":
+            quality = f"{quality}_{self._img_format}"
+
         title = f"{self.title}_quality_{quality}_chapters_{self._save_chapters_str}_source_{self.source.current_domain}"
         pat = r"[^a-zA-Z0-9-_]"
         return re.sub(pat, "_", title)
 
-    def set_info(self):
-        m = self.source.get_info()
+    def set_info(self, refresh: bool = False):
+        """
+        Set the manga's info and chapters, from the cache while it is fresh
+
+        Parameters:
+        -----------
+        refresh: bool -> fetch the info again even if the cache is fresh
+        """
+        m = self.source.get_info(refresh=refresh)
         m.add_to_class(self)
 
+    def warm_drivers(self):
+        """Start chrome for slow sources, it takes a while to be ready"""
+        if self.source.is_slow() and manager.chromedriver_installed:
+            manager.warm(
+                remove_options=self.source.driver_remove_options,
+                capabilities=self.source.driver_capabilities,
+            )
+
     def chapter_template(self, chapter_title, filenames) -> str:
         return f"""<h1>{chapter_title}</h1>
             <div style="display: flex; flex-direction: column; align-items: center; justify-content: center">
@@ -323,7 +612,7 @@ class Manga:
         path = os.path.join(self.temp_dir, get_file_name(self.cover_url))
         if os.path.exists(path):
             return path
-        res = requests.get(self.cover_url, headers=self.headers)
+        res = scraper.get(self.cover_url, headers=self.headers)
         with open(path, "wb") as f:
             f.write(res.content)
         return path
@@ -561,31 +850,120 @@ class Manga:
         logger.info(f"Selected {len(self.chapters)} chapters")
         return self.chapters
 
-    def lower_quality(self, filename: str, quality: int):
-        # add quality to filename
-        name, ext = os.path.splitext(filename)
-        name = f"{name}_q{quality}"
-        qfilename = f"{name}{ext}"
+    def page_budgets(self, filenames: list[str], target_size: int, target_per="page") -> dict[str, int]:
+        if target_per == "page":
+            return {i: target_size for i in filenames}
 
-        qpath = os.path.join(self.temp_dir, qfilename)
-        path = os.path.join(self.temp_dir, filename)
+        # share the volume budget between pages by pixel count
+        pixels = {}
+        for filename in filenames:
+            try:
+                with Image.open(os.path.join(self.temp_dir, filename)) as img:
+                    pixels[filename] = img.size[0] * img.size[1]
+            except Exception:
+                pixels[filename] = 0
+
+        total = sum(pixels.values()) or 1
+        return {i: max(1, int(target_size * p / total)) for i, p in pixels.items()}
+
+    def budget_filename(
+        self, filename: str, budget: int, min_ssim=None, img_format="jpeg", max_quality=95
+    ) -> str:
+        name, _ = os.path.splitext(filename)
+        # every search setting is in the name, or a cached page is reused for another
+        qfilename = f"{name}_{img_format}_b{budget}_q{max_quality}"
+        if min_ssim:
+            qfilename += f"_m{int(min_ssim * 1000)}"
+        return f"{qfilename}{EXTENSIONS[img_format]}"
+
+    def process_images(self, img_filenames_chapter: dict[str, list[Chapter]], jobs: dict, desc: str):
+        """
+        Run cpu bound image jobs in worker processes.
 
-        if os.path.exists(qpath):
-            return filename, qfilename
+        jobs: {filename: (qfilename, func, args)}, func(*args) must write the
+        new file to qfilename. If a job fails the original file is kept.
+        """
+        with cf.ProcessPoolExecutor() as executor:
+            futures = {}
+            for filename, (qfilename, func, args) in jobs.items():
+                futures[executor.submit(func, *args)] = (filename, qfilename)
 
-        try:
-            img = Image.open(path)
-            if img.mode != "RGB":
-                img = img.convert("RGB")
+            with tqdm(total=len(futures), desc=desc) as bar:
+                for future in cf.as_completed(futures):
+                    filename, qfilename = futures[future]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logger.error(f"Error processing {filename}: {e}")
+                        qfilename = filename
+                    for chapter in img_filenames_chapter[filename]:
+                        chapter.add_qfile((filename, qfilename))
+                    bar.update(1)
+                    share_progress_bar(len(futures), bar.n, bar.desc)
 
-            img.save(qpath, optimize=True, quality=quality)
-            img.close()
-        except Exception as e:
-            logger.error(f"Error lowering quality: {e}")
-            logger.info(f"Saving image without lowering quality")
-            shutil.copy(path, qpath)
+        for chapter in self.chapters:
+            chapter.order_qfiles()
 
-        return filename, qfilename
+    def dedup_pages(self, drop_pages: Union[list, None] = None, merge=True):
+        filenames = []
+        for chapter in self.chapters:
+            for filename in chapter.img_filenames:
+                if filename and filename not in filenames:
+                    filenames.append(filename)
+
+        signatures = {}
+        with cf.ProcessPoolExecutor() as executor:
+            paths = [os.path.join(self.temp_dir, i) for i in filenames]
+            with tqdm(total=len(paths), desc="Hashing pages") as bar:
+                for filename, future in zip(
+                    filenames, [executor.submit(page_signature, i) for i in paths]
+                ):
+                    try:
+                        signatures[filename] = future.result()
+                    except Exception as e:
+                        logger.error(f"Error hashing {filename}: {e}")
+                    bar.update(1)
+                    share_progress_bar(len(paths), bar.n, bar.desc)
+
+        duplicates = find_duplicates(signatures) if merge else {}
+        dropped = find_fillers(signatures, drop_pages) if drop_pages else set()
+
+        if duplicates:
+            repeated = {duplicates[i] for i in duplicates}
+            logger.info(f"Found {len(duplicates)} repeated pages, stored once")
+            for filename in repeated:
+                logger.debug(
+                    f"Repeated page {filename}: {format_hash(signatures[filename][0])}"
+                )
+        if dropped:
+            logger.info(f"Dropping {len(dropped)} filler pages")
+
+        for chapter in self.chapters:
+            chapter.replace_files(duplicates, dropped)
+
+    def split_strip(self, filename: str):
+        path = os.path.join(self.temp_dir, filename)
+        paths = split_strip(path)
+        return filename, [os.path.basename(i) for i in paths]
+
+    def split_strips(self):
+        filenames = [i for chapter in self.chapters for i in chapter.img_filenames if i]
+        slices = {}
+        # strips are big, only a couple are decoded at the same time
+        with cf.ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(self.split_strip, i) for i in filenames]
+            with tqdm(total=len(futures), desc="Splitting long strips") as bar:
+                for future in cf.as_completed(futures):
+                    filename, sfilenames = future.result()
+                    if len(sfilenames) > 1:
+                        slices[filename] = sfilenames
+                    bar.update(1)
+                    share_progress_bar(len(futures), bar.n, bar.desc)
+
+        if slices:
+            logger.info(f"Split {len(slices)} long strips into pages")
+            for chapter in self.chapters:
+                chapter.add_slices(slices)
 
     def create_failure_image(self, url):
         filename = get_file_name(f"{url}-error.png", True)
@@ -623,61 +1001,215 @@ class Manga:
             if os.path.exists(path):
                 os.remove(path)
 
-    def add_chapters(
-        self, book: Union[epub.EpubBook, PDF], quality=None
-    ) -> Union[list[epub.EpubHtml], list[PDFChapter]]:
-        if quality == 100:
-            quality = None
+    def resolve_chapters(self):
+        """
+        Get the image urls of every chapter, yielding each chapter as soon as
+        it's resolved. Selenium sources are spread over the driver pool.
+        """
+        total = len(self.chapters)
+        if self.source.async_chapter_img_urls:
+            yield from self.resolve_chapters_async()
+            return
 
         if not self.source.use_selenium_in_get_chapter_img_urls:
             with cf.ThreadPoolExecutor() as executor:
-                futures = [executor.submit(i.get_chapter_imgs) for i in self.chapters]
-                with tqdm(total=len(futures), desc="Getting Chapter Imgs") as bar:
+                futures = {executor.submit(i.get_chapter_imgs): i for i in self.chapters}
+                with tqdm(total=total, desc="Getting Chapter Imgs") as bar:
                     for future in cf.as_completed(futures):
                         bar.update(1)
-                        share_progress_bar(len(self.chapters), bar.n, bar.desc)
+                        share_progress_bar(total, bar.n, bar.desc)
+                        yield futures[future]
+            return
 
-        else:
-            if not manager.chromedriver_installed:
-                logger.error(
-                    f"You need chrome to download for {self.source.current_domain}"
-                )
-                logger.error("Please install chrome and try again")
-                sys.exit(1)
+        if not manager.chromedriver_installed:
+            logger.error(f"You need chrome to download for {self.source.current_domain}")
+            logger.error("Please install chrome and try again")
+            sys.exit(1)
 
-            logger.info(
-                "Using Selenium to get chapter img urls (this may take a while)"
+        logger.info(
+            f"Using Selenium to get chapter img urls with {manager.driver_count} drivers (this may take a while)"
+        )
+
+        def get_chapter_imgs(chapter: Chapter):
+            # recycled and on-demand drivers start with the defaults
+            key, driver = manager.get_driver(
+                self.source.driver_remove_options, self.source.driver_capabilities
             )
+            try:
+                chapter.get_chapter_imgs(driver=driver)
+            except Exception as e:
+                logger.error(f"Error getting imgs for {chapter}: {e}")
+            finally:
+                manager.release_driver(key)
+            return chapter
+
+        # one worker per driver, so a worker never waits for a driver
+        with cf.ThreadPoolExecutor(max_workers=manager.driver_count) as executor:
+            futures = [executor.submit(get_chapter_imgs, i) for i in self.chapters]
+            with tqdm(total=total, desc="Getting Chapter Imgs") as bar:
+                for future in cf.as_completed(futures):
+                    bar.update(1)
+                    share_progress_bar(total, bar.n, bar.desc)
+                    yield future.result()
+
+        manager.quit()
+
+    def resolve_chapters_async(self):
+        """
+        Get the image urls of every chapter over one aiohttp session, yielding
+        each chapter as soon as it's resolved. Requests per host are limited
+        by HOST_LIMIT.
+        """
+        total = len(self.chapters)
+        queue: Queue = Queue()
+
+        async def resolve_all():
+            async with scraper.async_session() as session:
+
+                async def resolve(chapter: Chapter):
+                    try:
+                        await chapter.get_chapter_imgs_async(session)
+                    except Exception as e:
+                        logger.error(f"Error getting imgs for {chapter}: {e}")
+                    queue.put(chapter)
+
+                await asyncio.gather(*[resolve(i) for i in self.chapters])
+
+        def run():
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(resolve_all())
+            except Exception as e:
+                logger.error(f"Error getting chapter imgs: {e}")
+            finally:
+                loop.close()
+                queue.put(None)
+
+        threading.Thread(target=run, daemon=True).start()
+        with tqdm(total=total, desc="Getting Chapter Imgs") as bar:
+            while True:
+                chapter = queue.get()
+                if chapter is None:
+                    break
+
+                bar.update(1)
+                share_progress_bar(total, bar.n, bar.desc)
+                yield chapter
+
+    def download_resolved(self, img_urls_iter) -> tuple[list[URLFile], list[str]]:
+        """
+        Download image urls while they are still being resolved.
+
+        Parameters
+        ----------
+        img_urls_iter : Iterable[list[str]]
+            Image urls of each chapter, in the order the chapters get resolved.
+            Whatever got resolved while a batch was downloading makes the next batch.
+
+        Returns
+        -------
+        tuple[list[URLFile], list[str]]
+            Downloaded files and failed urls
+
+        Raises
+        ------
+        Exception
+            Whatever stopped the download thread, once it is joined
+        """
+        queue: Queue = Queue()
+        downloaded_files: list[URLFile] = []
+        failed_urls: list[str] = []
+        errors: list[BaseException] = []
+
+        def download():
+            done = False
+            while not done:
+                batches = [queue.get()]
+                while not queue.empty():
+                    batches.append(queue.get_nowait())
+
+                done = None in batches
+                urls = [url for batch in batches if batch for url in batch]
+                if not urls or errors:
+                    # after an error the queue is only drained until the end
+                    continue
+
+                try:
+                    with Downloader(
+                        urls, self.headers, self.temp_dir, validators=get_store(self.temp_dir)
+                    ) as downloader:
+                        files, failed = downloader.download()
+                except BaseException as e:
+                    errors.append(e)
+                    continue
+                downloaded_files.extend(files)
+                failed_urls.extend(failed)
 
-            driver = manager.get_driver()
-            i = 0
-            for chapter in tqdm(self.chapters, desc="Getting Chapter Imgs"):
-                chapter.get_chapter_imgs(driver=driver[1])
-                share_progress_bar(len(self.chapters), i, "Getting Chapter Imgs")
-                i += 1
-            manager.release_driver(driver[0])
-            manager.quit()
+        t = threading.Thread(target=download, daemon=True)
+        t.start()
+        try:
+            for img_urls in img_urls_iter:
+                queue.put(img_urls)
+                if errors:
+                    break
+        finally:
+            queue.put(None)
+            t.join()
+
+        if errors:
+            raise errors[0]
+        return downloaded_files, failed_urls
+
+    def add_chapters(
+        self,
+        book: Union[epub.EpubBook, PDF, CBZ],
+        quality=None,
+        split_strips=True,
+        target_size=None,
+        target_per="page",
+        min_ssim=None,
+        profile=None,
+        img_format="jpeg",
+        dedup=False,
+        drop_pages=None,
+    ) -> Union[list[epub.EpubHtml], list[PDFChapter]]:
+        if quality == 100:
+            quality = None
+
+        if not encoder_available(img_format):
+            logger.warning(f"No {img_format} encoder available, using jpeg")
+            img_format = "jpeg"
 
-        img_urls = []
         img_url_to_chapter: dict[str, Chapter] = {}
-        for chapter in self.chapters:
-            chapter_imgs = chapter.img_urls
-            img_urls.extend(chapter_imgs)
-            for img_url in chapter_imgs:
-                img_url_to_chapter[img_url] = chapter
+        # the chapter images are resolved next
+        self.warm_drivers()
+
+        def resolved_img_urls():
+            for chapter in self.resolve_chapters():
+                chapter_imgs = chapter.img_urls
+                for img_url in chapter_imgs:
+                    img_url_to_chapter[img_url] = chapter
+                yield chapter_imgs
 
-        iurls = img_urls
+        iurls = []
         checked_files = []
         for i in range(self.retry_count):
-            if not iurls:
-                break
+            if i == 0:
+                # downloading starts while the rest of the chapters are resolved
+                downloaded_files, failed_urls = self.download_resolved(
+                    resolved_img_urls()
+                )
+            else:
+                if not iurls:
+                    break
 
-            if i > 0:
                 logger.info(f"Retrying failed images: {len(iurls)}")
                 share_progress_bar(len(iurls), 0, "Retrying failed images")
 
-            with Downloader(iurls, self.headers, self.temp_dir) as downloader:
-                downloaded_files, failed_urls = downloader.download()
+                with Downloader(
+                    iurls, self.headers, self.temp_dir, validators=get_store(self.temp_dir)
+                ) as downloader:
+                    downloaded_files, failed_urls = downloader.download()
 
             if downloaded_files:
                 downloaded_files, failed_files = self.check_imgs(downloaded_files)
@@ -708,31 +1240,78 @@ class Manga:
         for chapter in self.chapters:
             chapter.order_files()
 
-        img_filenames_chapter = {}
+        if split_strips:
+            self.split_strips()
+
+        if dedup or drop_pages:
+            self.dedup_pages(drop_pages, merge=dedup)
+
+        # a repeated page can be shared by many chapters
+        img_filenames_chapter: dict[str, list[Chapter]] = {}
         for chapter in self.chapters:
             for filename in chapter.img_filenames:
-                img_filenames_chapter[filename] = chapter
+                img_filenames_chapter.setdefault(filename, []).append(chapter)
+
+        if profile in EINK_PROFILES:
+            jobs = {}
+            for filename in img_filenames_chapter.keys():
+                qfilename = eink_filename(filename, profile, quality)
+                jobs[filename] = (
+                    qfilename,
+                    eink_convert,
+                    (
+                        os.path.join(self.temp_dir, filename),
+                        os.path.join(self.temp_dir, qfilename),
+                        profile,
+                        quality,
+                    ),
+                )
+            self.process_images(img_filenames_chapter, jobs, f"Converting to {profile}")
 
-        if quality is not None:
-            with cf.ThreadPoolExecutor() as executor:
-                futures = [
-                    executor.submit(self.lower_quality, i, quality)
-                    for i in img_filenames_chapter.keys()
-                ]
-                with tqdm(
-                    total=len(futures), desc=f"Lowering quality to {quality}"
-                ) as bar:
-                    for future in cf.as_completed(futures):
-                        filename, qfilename = future.result()
-                        chapter = img_filenames_chapter[filename]
-                        chapter.add_qfile((filename, qfilename))
-                        bar.update(1)
-                        share_progress_bar(len(futures), bar.n, bar.desc)
+        elif target_size:
+            budgets = self.page_budgets(
+                list(img_filenames_chapter.keys()), target_size, target_per
+            )
+            jobs = {}
+            max_quality = quality or 95
+            for filename, budget in budgets.items():
+                qfilename = self.budget_filename(filename, budget, min_ssim, img_format, max_quality)
+                jobs[filename] = (
+                    qfilename,
+                    fit_quality,
+                    (
+                        os.path.join(self.temp_dir, filename),
+                        os.path.join(self.temp_dir, qfilename),
+                        budget,
+                        min_ssim,
+                        10,
+                        max_quality,
+                        img_format,
+                    ),
+                )
+            self.process_images(
+                img_filenames_chapter, jobs, f"Fitting pages to {target_size // 1024}KB"
+            )
 
-            for chapter in self.chapters:
-                chapter.order_qfiles()
+        elif quality is not None or img_format != "jpeg":
+            jobs = {}
+            for filename in img_filenames_chapter.keys():
+                qfilename = encoded_filename(filename, img_format, quality)
+                jobs[filename] = (
+                    qfilename,
+                    encode_page,
+                    (
+                        os.path.join(self.temp_dir, filename),
+                        os.path.join(self.temp_dir, qfilename),
+                        img_format,
+                        quality,
+                    ),
+                )
+            desc = f"Encoding {img_format}" + (f" at {quality}" if quality else "")
+            self.process_images(img_filenames_chapter, jobs, desc)
 
         items = []
+        added_filenames = set()
         for chapter in self.chapters:
             title = chapter.title
             ch_id = chapter.id
@@ -747,13 +1326,17 @@ class Manga:
                 items.append(epub_chapter)
 
                 for filename in filenames:
+                    if filename in added_filenames:
+                        continue
+                    added_filenames.add(filename)
+
                     path = os.path.join(self.temp_dir, filename)
                     with open(path, "rb") as f:
                         book.add_item(
                             epub.EpubItem(
                                 uid=f"image_{filename}",
                                 file_name=f"images/{filename}",
-                                media_type="image/jpeg",
+                                media_type=media_type(filename),
                                 content=f.read(),
                             )
                         )
@@ -762,6 +1345,11 @@ class Manga:
                 paths = [os.path.join(self.temp_dir, i) for i in filenames]
                 items.append((title, paths))
 
+            elif isinstance(book, CBZ):
+                paths = [os.path.join(self.temp_dir, i) for i in filenames]
+                book.add_chapter(title, paths)
+                items.append((title, paths))
+
         if isinstance(book, PDF):
 
             def create_chapter(item):
@@ -786,7 +1374,19 @@ class Manga:
             os.makedirs(path)
         return path
 
-    def create_epub(self, quality=None, path: str = ""):
+    def create_epub(
+        self,
+        quality=None,
+        path: str = "",
+        split_strips=True,
+        target_size=None,
+        target_per="page",
+        min_ssim=None,
+        profile=None,
+        img_format="jpeg",
+        dedup=False,
+        drop_pages=None,
+    ):
         """
         Create an epub file of the novel.
 
@@ -796,13 +1396,43 @@ class Manga:
             The quality of the images in the epub file. If None, the original quality is used. Defaults to None.
         path : str, optional
             The path to save the epub file to. If None, the file is saved to the current working directory. Defaults to current working directory.
+        split_strips : bool, optional
+            Cut long strips (webtoons) into page-height slices. Defaults to True.
+        target_size : int, optional
+            Byte budget for the images. Each page gets the highest JPEG quality (up to quality) that fits. Defaults to None.
+        target_per : str, optional
+            "page" if target_size is per page, "volume" if it is shared by all pages. Defaults to "page".
+        min_ssim : float, optional
+            Minimum SSIM a page must keep, even if that goes over target_size. Defaults to None.
+        profile : str, optional
+            Output profile, one of "eink", "eink-ordered" or "eink-jpeg" for 4-bit grayscale pages for e-ink readers. Defaults to None.
+        img_format : str, optional
+            Image encoder for the pages, one of "jpeg", "webp" or "avif". Defaults to "jpeg".
+        dedup : bool, optional
+            Store near-identical pages (credits, recruitment pages) only once. Defaults to False.
+        drop_pages : list, optional
+            Filler pages to remove, as dHash hex strings or image paths. Defaults to None.
 
         """
 
         book = epub.EpubBook()
 
         self._quality = quality
-        chapters = self.add_chapters(book, quality=quality)
+        self._target_size = target_size
+        self._profile = profile
+        self._img_format = img_format
+        chapters = self.add_chapters(
+            book,
+            quality=quality,
+            split_strips=split_strips,
+            target_size=target_size,
+            target_per=target_per,
+            min_ssim=min_ssim,
+            profile=profile,
+            img_format=img_format,
+            dedup=dedup,
+            drop_pages=drop_pages,
+        )
 
         share_progress_bar(3, 0, "Creating Epub")
 
@@ -849,7 +1479,18 @@ class Manga:
         share_progress_bar(3, 3, "Creating Epub")
         return path
 
-    def create_pdf(self, quality=None, path: str = ""):  # type: ignore
+    def create_pdf(
+        self,
+        quality=None,
+        path: str = "",
+        split_strips=True,
+        target_size=None,
+        target_per="page",
+        min_ssim=None,
+        profile=None,
+        dedup=False,
+        drop_pages=None,
+    ):  # type: ignore
         """
         Create a pdf file of the novel.
 
@@ -859,16 +1500,43 @@ class Manga:
             The quality of the images in the pdf file. If None, the original quality is used. Defaults to None.
         path : str, optional
             The path to save the pdf file to. If None, the file is saved to the current working directory. Defaults to current working directory.
+        split_strips : bool, optional
+            Cut long strips (webtoons) into page-height slices. Defaults to True.
+        target_size : int, optional
+            Byte budget for the images. Each page gets the highest JPEG quality (up to quality) that fits. Defaults to None.
+        target_per : str, optional
+            "page" if target_size is per page, "volume" if it is shared by all pages. Defaults to "page".
+        min_ssim : float, optional
+            Minimum SSIM a page must keep, even if that goes over target_size. Defaults to None.
+        profile : str, optional
+            Output profile, one of "eink", "eink-ordered" or "eink-jpeg" for 4-bit grayscale pages for e-ink readers. Defaults to None.
+        dedup : bool, optional
+            Store near-identical pages (credits, recruitment pages) only once. Defaults to False.
+        drop_pages : list, optional
+            Filler pages to remove, as dHash hex strings or image paths. Defaults to None.
         """
 
-        pdf = PDF()
+        pdf = PDF(dedup=dedup)
 
         self._quality = quality
+        self._target_size = target_size
+        self._profile = profile
+        self._img_format = "jpeg"
         pdf.set_title(self.title)
         pdf.set_author(self.author)
         pdf.set_cover(self.download_cover())
 
-        chapters: list[PDFChapter] = self.add_chapters(pdf, quality=quality)  # type: ignore
+        chapters: list[PDFChapter] = self.add_chapters(
+            pdf,
+            quality=quality,
+            split_strips=split_strips,
+            target_size=target_size,
+            target_per=target_per,
+            min_ssim=min_ssim,
+            profile=profile,
+            dedup=dedup,
+            drop_pages=drop_pages,
+        )  # type: ignore
         share_progress_bar(3, 0, "Creating PDF")
         [pdf.add_chapter(i) for i in chapters]
 
@@ -912,3 +1580,77 @@ class Manga:
         logger.info(f"Manga(create_pdf): Saving to {path}")
         share_progress_bar(3, 3, "Creating PDF")
         return path
+
+    def create_cbz(
+        self,
+        quality=None,
+        path: str = "",
+        split_strips=True,
+        target_size=None,
+        target_per="page",
+        min_ssim=None,
+        profile=None,
+        img_format="jpeg",
+        dedup=False,
+        drop_pages=None,
+    ):
+        """
+        Create a cbz file of the novel.
+
+        Parameters
+        ----------
+        quality : int, optional
+            The quality of the images in the cbz file. If None, the original quality is used. Defaults to None.
+        path : str, optional
+            The path to save the cbz file to. If None, the file is saved to the current working directory. Defaults to current working directory.
+        split_strips : bool, optional
+            Cut long strips (webtoons) into page-height slices. Defaults to True.
+        target_size : int, optional
+            Byte budget for the images. Each page gets the highest quality (up to quality) that fits. Defaults to None.
+        target_per : str, optional
+            "page" if target_size is per page, "volume" if it is shared by all pages. Defaults to "page".
+        min_ssim : float, optional
+            Minimum SSIM a page must keep, even if that goes over target_size. Defaults to None.
+        profile : str, optional
+            Output profile, one of "eink", "eink-ordered" or "eink-jpeg" for 4-bit grayscale pages for e-ink readers. Defaults to None.
+        img_format : str, optional
+            Image encoder for the pages, one of "jpeg", "webp" or "avif". Defaults to "jpeg".
+        dedup : bool, optional
+            Store near-identical pages (credits, recruitment pages) only once. Defaults to False.
+        drop_pages : list, optional
+            Filler pages to remove, as dHash hex strings or image paths. Defaults to None.
+        """
+
+        cbz = CBZ()
+
+        self._quality = quality
+        self._target_size = target_size
+        self._profile = profile
+        self._img_format = img_format
+        cbz.set_title(self.title)
+        cbz.set_author(self.author)
+        cbz.set_description(self.description)
+        cbz.set_cover(self.download_cover())
+
+        self.add_chapters(
+            cbz,
+            quality=quality,
+            split_strips=split_strips,
+            target_size=target_size,
+            target_per=target_per,
+            min_ssim=min_ssim,
+            profile=profile,
+            img_format=img_format,
+            dedup=dedup,
+            drop_pages=drop_pages,
+        )
+        share_progress_bar(3, 0, "Creating CBZ")
+
+        filename = f"{self.get_save_name()}.cbz"
+        path = self.get_save_path(path)
+        path = os.path.join(path, filename)
+
+        cbz.write(path)
+        logger.info(f"Manga(create_cbz): Saving to {path}")
+        share_progress_bar(3, 3, "Creating CBZ")
+        return path
@@ -1,8 +1,14 @@
 from .source1 import MangaNato, Bato, ONEkissmanga, BaseSource, Chapter, MangaInfo
 from .source2 import MangaKakalot # Error getting chapter imgs
+from tools.client import client
+from tools.mirrors import Mirrors
 
 sources = [MangaNato, Bato, ONEkissmanga]
 
+for source in sources:
+    if source.use_mirrors:
+        client.add_mirrors(Mirrors(source.name, source.all_domains()))
+
 
 class SourceNotFound(Exception):
     pass
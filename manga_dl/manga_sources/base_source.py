@@ -1,7 +1,7 @@
 import json
+from typing import Union
 from urllib.parse import urlparse
 import os
-from fake_headers import Headers
 
 import sys
 
@@ -9,6 +9,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from tools.exceptions import SourceNotFound
 from tools.utils import logger, get_app_path
+from tools.client import client
 from string import Formatter
 
 
@@ -118,15 +119,45 @@ class classproperty(property):
 class BaseSource:
     domain = "base.com"
     alternate_domains = []
+    # default chrome options the source's chapter pages don't work with
+    driver_remove_options = []
+    # extra capabilities the source's drivers need
+    driver_capabilities = {}
+    # SoupStrainer arguments of the parts of each kind of page the source reads
+    strainers: dict[str, dict] = {}
+    # the source has get_chapter_img_urls_async
+    async_chapter_img_urls = False
+    # alternate_domains are mirrors of domain, requests go to the healthiest one
+    use_mirrors = False
+    # domain sent as the Referer, domain if empty
+    referer_domain = ""
     manga_format = "https://{domain}/manga/{ID}"
 
     def __init__(self, url: str):
         self.url = url
-        self.temp_dir = os.environ.get("TEMP_DIR", os.path.join(get_app_path(), "tmp"))
-        self.headers: dict = Headers(headers=True).generate()
-        self.headers["Referer"] = f"https://{self.domain}/"
+        self._headers: Union[dict, None] = None
+        self._temp_dir = ""
         self.use_selenium_in_get_chapter_img_urls = False
 
+    # headers and temp_dir are built on first use, search results never need them
+    @property
+    def headers(self) -> dict:
+        if self._headers is None:
+            # the client's headers, so images are fetched with the same fingerprint as pages
+            referer = self.referer_domain or self.domain
+            self._headers = client.request_headers({"Referer": f"https://{referer}/"})
+        return self._headers
+
+    @headers.setter
+    def headers(self, headers: dict):
+        self._headers = headers
+
+    @property
+    def temp_dir(self) -> str:
+        if not self._temp_dir:
+            self._temp_dir = os.environ.get("TEMP_DIR") or os.path.join(get_app_path(), "tmp")
+        return self._temp_dir
+
     @classmethod
     def id_to_url(cls, id: str) -> str:
         id = id.replace(f"{cls.name}_", "")
@@ -141,6 +172,12 @@ class BaseSource:
                 manga_format = manga_format.replace(var, f"cls.{var}")
         return eval("f" + repr(manga_format))
 
+    def prepare_driver(self, driver):
+        for option in self.driver_remove_options:
+            driver.remove_option(option)
+        for name, value in self.driver_capabilities.items():
+            driver.set_capability(name, value)
+
     def is_slow(self) -> bool:
         return self.use_selenium_in_get_chapter_img_urls
 
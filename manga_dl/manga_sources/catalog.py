@@ -0,0 +1,142 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+from typing import Union
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import get_app_path, logger
+from .store import get_store
+
+
+CATALOG_PATH = os.path.join(get_app_path(), "catalog.db")
+
+
+class Catalog:
+    """
+    Local full-text index of every manga seen in a search or an info page,
+    searchable by title, alternative titles and authors without the network.
+
+    Uses a SQLite FTS5 table with the trigram tokenizer, so partial words and
+    typos inside a title still match. Queries shorter than a trigram, or
+    sqlite builds without the tokenizer, fall back to LIKE.
+
+    Methods:
+        add(infos: list[dict]) Index MangaInfo json dicts, replacing the same urls.
+
+        search(query: str, limit: int) MangaInfo json dicts matching the query, best first.
+    """
+
+    def __init__(self, path: str = CATALOG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.trigram = True
+
+        with self._lock, self.conn:
+            exists = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'catalog'"
+            ).fetchone()
+            if not exists:
+                try:
+                    self._create("trigram")
+                except sqlite3.OperationalError:
+                    self._create("unicode61")
+            self.trigram = "trigram" in self.conn.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'catalog'"
+            ).fetchone()[0]
+
+        self.new = not exists
+
+    def _create(self, tokenizer: str):
+        self.conn.execute(
+            "CREATE VIRTUAL TABLE catalog USING fts5("
+            "title, alternative_titles, authors, url UNINDEXED, data UNINDEXED, "
+            f"tokenize = '{tokenizer}')"
+        )
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT count(*) FROM catalog").fetchone()[0]
+
+    def add(self, infos: list[dict]):
+        rows = []
+        for info in infos:
+            if not isinstance(info, dict) or not info.get("title") or not info.get("url"):
+                continue
+            # the chapters are refetched with the info anyway
+            data = {k: v for k, v in info.items() if k != "chapters"}
+            rows.append(
+                (
+                    info["title"],
+                    " | ".join(info.get("alternative_titles") or []),
+                    " | ".join(info.get("authors") or []),
+                    info["url"],
+                    json.dumps(data),
+                )
+            )
+
+        if not rows:
+            return
+
+        try:
+            with self._lock, self.conn:
+                self.conn.executemany(
+                    "DELETE FROM catalog WHERE url = ?", [(i[3],) for i in rows]
+                )
+                self.conn.executemany(
+                    "INSERT INTO catalog (title, alternative_titles, authors, url, data) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Error adding to the catalog {self.path}: {e}")
+
+    def search(self, query: str, limit: int = 20) -> list[dict]:
+        query = " ".join(query.split())
+        if not query:
+            return []
+
+        if self.trigram and len(query) >= 3:
+            # every term is a phrase, so punctuation in titles can't break the syntax
+            terms = " ".join('"' + i.replace('"', '""') + '"' for i in query.split())
+            sql = "SELECT data FROM catalog WHERE catalog MATCH ? ORDER BY rank LIMIT ?"
+            args: tuple = (terms, limit)
+        else:
+            like = f"%{query}%"
+            sql = (
+                "SELECT data FROM catalog WHERE title LIKE ? OR alternative_titles LIKE ? "
+                "OR authors LIKE ? LIMIT ?"
+            )
+            args = (like, like, like, limit)
+
+        try:
+            with self._lock:
+                rows = self.conn.execute(sql, args).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error searching the catalog {self.path}: {e}")
+            return []
+
+        return [json.loads(i[0]) for i in rows]
+
+
+_catalog: Union[Catalog, None] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> Union[Catalog, None]:
+    """The catalog, opened on first use. None if it can't be opened"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            try:
+                _catalog = Catalog()
+                if _catalog.new:
+                    # what the cache already knows
+                    _catalog.add(get_store().infos())
+            except sqlite3.Error as e:
+                logger.error(f"Error opening the catalog {CATALOG_PATH}: {e}")
+                return None
+        return _catalog
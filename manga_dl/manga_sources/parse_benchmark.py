@@ -0,0 +1,91 @@
+"""
+Benchmark the html parsing of the sources over saved pages.
+
+Pages are saved as <source name>_<page kind>.html, the kinds are the keys
+of the source's strainers (info, chapter, search, ...). One page of every
+source ships in manga_sources/fixtures and is used by default.
+
+    python -m manga_sources.parse_benchmark
+    python -m manga_sources.parse_benchmark my_pages --save <source name> <kind> <url>
+"""
+
+import argparse
+import os
+import timeit
+
+from bs4 import BeautifulSoup
+
+from . import MangaKakalot, sources
+from .utils import HTML_PARSER, make_soup, scraper
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def save_fixture(folder: str, name: str, kind: str, url: str) -> str:
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+
+    res = scraper.get(url)
+    res.raise_for_status()
+    path = os.path.join(folder, f"{name}_{kind}.html")
+    with open(path, "wb") as f:
+        f.write(res.content)
+    return path
+
+
+def benchmark(folder: str = FIXTURES, number: int = 10) -> list[tuple[str, str, float]]:
+    """
+    Time each saved page with html.parser, the default parser and the
+    default parser with the source's strainer.
+
+    Returns
+    -------
+    list[tuple[str, str, float]]
+        (page, method, ms per parse)
+    """
+    results = []
+    for source in sources + [MangaKakalot]:
+        for kind, strainer in source.strainers.items():
+            path = os.path.join(folder, f"{source.name}_{kind}.html")
+            if not os.path.exists(path):
+                continue
+
+            with open(path, "rb") as f:
+                html = f.read()
+
+            page = os.path.basename(path)
+            methods = {
+                "html.parser": lambda: BeautifulSoup(html, "html.parser"),
+                HTML_PARSER: lambda: make_soup(html),
+                f"{HTML_PARSER} + strainer": lambda: make_soup(html, strainer),
+            }
+            for method, parse in methods.items():
+                seconds = timeit.timeit(parse, number=number)
+                results.append((page, method, seconds / number * 1000))
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark source html parsing")
+    parser.add_argument(
+        "folder", nargs="?", default=FIXTURES, help="Folder with the saved pages"
+    )
+    parser.add_argument("-n", "--number", type=int, default=10, help="Parses per page")
+    parser.add_argument(
+        "--save",
+        nargs=3,
+        metavar=("SOURCE", "KIND", "URL"),
+        help="Save a page to the folder first",
+    )
+    args = parser.parse_args()
+
+    if args.save:
+        print("Saved", save_fixture(args.folder, *args.save))
+
+    results = benchmark(args.folder, args.number)
+    if not results:
+        print(f"No pages found in {args.folder}")
+
+    for page, method, ms in results:
+        print(f"{page:40} {method:25} {ms:10.2f} ms")
@@ -1,5 +1,6 @@
 from urllib.parse import urlparse
-import requests
+from html import unescape
+import json
 
 
 import sys
@@ -7,28 +8,48 @@ import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from bs4 import BeautifulSoup
 from selenium.webdriver.common.by import By
 
 
-from tools.utils import logger, Driver
-from tools.exceptions import MangaNotFound, InvalidMangaUrl
-from bs4 import BeautifulSoup
-from fake_headers import Headers
+from tools.utils import logger, Driver, driver_manager
+from tools.exceptions import MangaNotFound, InvalidMangaUrl, NotModified
 import re
 from urllib.parse import quote_plus
 from .base_source import BaseSource
-from .utils import MangaInfo, Chapter, scraper, static_exists, exists
+from .utils import (
+    MangaInfo,
+    Chapter,
+    scraper,
+    static_exists,
+    exists,
+    async_exists,
+    make_soup,
+)
 
 
 class MangaNato(BaseSource):
     domain = "manganato.com"
     alternate_domains = ["chapmanganato.com"]
+    referer_domain = alternate_domains[0]
     manga_format = "https://{alternate_domains[0]}/manga-{ID}"
+    strainers = {
+        "info": {
+            "class_": [
+                "info-image",
+                "story-info-right",
+                "story-info-right-extent",
+                "panel-story-info-description",
+                "panel-story-chapter-list",
+            ]
+        },
+        "chapter": {"class_": "container-chapter-reader"},
+    }
+    async_chapter_img_urls = True
 
     def __init__(self, url: str):
         url = MangaNato.valid_url(url)
         super().__init__(url)
-        self.headers["Referer"] = f"https://{self.alternate_domains[0]}/"
 
     @staticmethod
     def valid_url(url: str) -> str:
@@ -46,20 +67,18 @@ class MangaNato(BaseSource):
     @static_exists("https://manganato.com/getstorysearchjson")
     def search(query: str) -> list[MangaInfo]:
         url = "https://manganato.com/getstorysearchjson"
-        headers = Headers().generate()
-        update = {
+        headers = {
             "Referer": "https://manganato.com/",
             "Origin": "https://manganato.com",
             "Accept": "application/json, text/javascript, */*; q=0.01",
         }
-        headers.update(update)
 
         data = {
             "searchword": query,
         }
         results = []
         try:
-            res = requests.post(url, headers=headers, data=data)
+            res = scraper.post(url, headers=headers, data=data)
             res.raise_for_status()
             result = res.json()["searchlist"]
 
@@ -93,90 +112,100 @@ class MangaNato(BaseSource):
     def get_info(self) -> MangaInfo:
         try:
             res = scraper.get(self.url)
-            soup = BeautifulSoup(res.text, "html.parser")  # type: ignore
-
-            # story-info-left
-            img = soup.select_one(".info-image img")  # type: ignore
-            cover_url: str = img.get("src")  # type: ignore
-            info = soup.select_one(".story-info-right")  # type: ignore
-
-            title = info.find("h1").text.strip()  # type: str # type: ignore
-
-            alt = ""
-            author = ""
-            status = ""
-            genre = ""
-
-            trs = info.find_all("tr")  # type: ignore
-            for tr in trs:
-                label = tr.select_one(".table-label").text.strip()
-                value = tr.select_one(".table-value").text.strip()
-                if "Alt" in label:
-                    alt = value
-                elif "Author" in label:
-                    author = value
-                elif "Status" in label:
-                    status = value
-                elif "Genre" in label:
-                    genre = value
-
-            # story-info-right-extent
-            info2 = soup.select_one(".story-info-right-extent")  # type: ignore
-            ptags = info2.find_all("p")  # type: ignore
-            updated = ptags[0].text.strip()
-            views = ptags[1].text.strip()
-            rating = ptags[3].text.strip()
-
-            description = (
-                soup.select_one(".panel-story-info-description")
-                .text.replace("Description :", "")  # type: ignore
-                .strip()
-            )
-
-            chapters_block = soup.select_one(".panel-story-chapter-list")
-            chapters_lis = chapters_block.find_all("li")[::-1]  # type: ignore
-            chapters = []
-            for chapter in chapters_lis:
-                atag = chapter.find("a")  # type: ignore
-                chapter_url = atag.get("href")  # type: ignore
-                if chapter_url.endswith("/"):
-                    chapter_url = chapter_url[:-1]
-                chapter_title = atag.text.strip()  # type: ignore
-                chapter_views = chapter.select_one(".chapter-view").text.strip()  # type: ignore
-                chapter_upload_date = chapter.select_one(".chapter-time").text.strip()  # type: ignore
-                chapters.append(
-                    Chapter(
-                        url=chapter_url,
-                        source=self,
-                        title=chapter_title,
-                        views=chapter_views,
-                        date=chapter_upload_date,
-                    )
-                )
-
-            if ";" in alt:
-                alt = alt.split(";")
-            else:
-                alt = [alt]
-
-            m = MangaInfo(title=title, url=self.url)
-            m.alternative_titles = [i.strip() for i in alt]
-            m.authors = [i.strip() for i in author.split(",")]
-            m.genres = [i.strip() for i in genre.split("-")]
-            m.status = status
-            m.description = description
-            m.cover_url = cover_url
-            m.last_updated = updated
-            m.views = views
-            m.rating = rating
-            m.chapters = chapters
-
-            return m
-
+            return self.parse_info(make_soup(res.text, self.strainers["info"]))
+        except NotModified:
+            raise
         except Exception as e:
             logger.error(f"Error getting manga info for {self.url}: {e}")
             raise MangaNotFound(f"Manga not found: {self.url}")
 
+    def parse_info(self, soup: BeautifulSoup) -> MangaInfo:
+        """Info of a manga page, parsed whole or with strainers["info"]"""
+
+        # story-info-left
+        img = soup.select_one(".info-image img")  # type: ignore
+        cover_url: str = img.get("src")  # type: ignore
+        info = soup.select_one(".story-info-right")  # type: ignore
+
+        title = info.find("h1").text.strip()  # type: str # type: ignore
+
+        alt = ""
+        author = ""
+        status = ""
+        genre = ""
+
+        trs = info.find_all("tr")  # type: ignore
+        for tr in trs:
+            label = tr.select_one(".table-label").text.strip()
+            value = tr.select_one(".table-value").text.strip()
+            if "Alt" in label:
+                alt = value
+            elif "Author" in label:
+                author = value
+            elif "Status" in label:
+                status = value
+            elif "Genre" in label:
+                genre = value
+
+        # story-info-right-extent
+        info2 = soup.select_one(".story-info-right-extent")  # type: ignore
+        ptags = info2.find_all("p")  # type: ignore
+        updated = ptags[0].text.strip()
+        views = ptags[1].text.strip()
+        rating = ptags[3].text.strip()
+
+        description = (
+            soup.select_one(".panel-story-info-description")
+            .text.replace("Description :", "")  # type: ignore
+            .strip()
+        )
+
+        chapters_block = soup.select_one(".panel-story-chapter-list")
+        chapters_lis = chapters_block.find_all("li")[::-1]  # type: ignore
+        chapters = []
+        for chapter in chapters_lis:
+            atag = chapter.find("a")  # type: ignore
+            chapter_url = atag.get("href")  # type: ignore
+            if chapter_url.endswith("/"):
+                chapter_url = chapter_url[:-1]
+            chapter_title = atag.text.strip()  # type: ignore
+            chapter_views = chapter.select_one(".chapter-view").text.strip()  # type: ignore
+            chapter_upload_date = chapter.select_one(".chapter-time").text.strip()  # type: ignore
+            chapters.append(
+                Chapter(
+                    url=chapter_url,
+                    source=self,
+                    title=chapter_title,
+                    views=chapter_views,
+                    date=chapter_upload_date,
+                )
+            )
+
+        if ";" in alt:
+            alt = alt.split(";")
+        else:
+            alt = [alt]
+
+        m = MangaInfo(title=title, url=self.url)
+        m.alternative_titles = [i.strip() for i in alt]
+        m.authors = [i.strip() for i in author.split(",")]
+        m.genres = [i.strip() for i in genre.split("-")]
+        m.status = status
+        m.description = description
+        m.cover_url = cover_url
+        m.last_updated = updated
+        m.views = views
+        m.rating = rating
+        m.chapters = chapters
+
+        return m
+
+    def parse_chapter_img_urls(self, html: str) -> list[str]:
+        soup = make_soup(html, self.strainers["chapter"])
+        imgs = soup.select(".container-chapter-reader img")  # type: ignore
+        imgs = [i.get("src") for i in imgs]  # type: ignore
+        return [i for i in imgs if i and self._id in i]  # type: ignore
+
     @exists
     def get_chapter_img_urls(self, chapter_url: str) -> list:
         if chapter_url.startswith("/"):
@@ -184,11 +213,27 @@ class MangaNato(BaseSource):
 
         try:
             res = scraper.get(chapter_url)
-            soup = BeautifulSoup(res.text, "html.parser")
-            imgs = soup.select(".container-chapter-reader img")  # type: ignore
-            imgs = [i.get("src") for i in imgs]  # type: ignore
-            imgs: list[str] = [i for i in imgs if self._id in i]  # type: ignore
+            imgs = self.parse_chapter_img_urls(res.text)
+
+        except NotModified:
+            raise
+        except Exception as e:
+            logger.error(
+                f"Error getting chapter images for {chapter_url}: {e}",
+            )
+            imgs = []
+
+        return imgs
 
+    @async_exists
+    async def get_chapter_img_urls_async(self, chapter_url: str, session) -> list:
+        if chapter_url.startswith("/"):
+            chapter_url = f"{self.url}{chapter_url}"
+
+        try:
+            imgs = self.parse_chapter_img_urls(await scraper.async_text(session, chapter_url))
+        except NotModified:
+            raise
         except Exception as e:
             logger.error(
                 f"Error getting chapter images for {chapter_url}: {e}",
@@ -201,6 +246,21 @@ class MangaNato(BaseSource):
 class ONEkissmanga(BaseSource):
     domain = "1stkissmanga.me"
     alternate_domains = ["1stkissmanga.com", "1stkissmanga.io"]
+    strainers = {
+        "info": {
+            "class_": [
+                "post-title",
+                "summary_image",
+                "post-content_item",
+                "count-comment",
+                "add-bookmark",
+                "description-summary",
+                "wp-manga-chapter",
+            ]
+        },
+        "chapter": {"class_": "entry-content"},
+    }
+    async_chapter_img_urls = True
 
     def __init__(self, url: str):
         super().__init__(url)
@@ -217,15 +277,12 @@ class ONEkissmanga(BaseSource):
         data = {"action": "wp-manga-search-manga", "title": query}
         results = []
         try:
-            headers = Headers().generate()
-            headers.update(
-                {
-                    "Referer": "https://1stkissmanga.me/",
-                    "x-requested-with": "XMLHttpRequest",
-                    "content-type": "application/x-www-form-urlencoded;",
-                    "origin": "https://1stkissmanga.me",
-                }
-            )
+            headers = {
+                "Referer": "https://1stkissmanga.me/",
+                "x-requested-with": "XMLHttpRequest",
+                "content-type": "application/x-www-form-urlencoded;",
+                "origin": "https://1stkissmanga.me",
+            }
 
             res = scraper.post(search_url, data=data, headers=headers)
             res.raise_for_status()
@@ -246,61 +303,70 @@ class ONEkissmanga(BaseSource):
     @exists
     def get_info(self) -> MangaInfo:
         try:
-            soup = BeautifulSoup(scraper.get(self.url).content, "html.parser")
-            # Get the title
-            title = soup.find(class_="post-title").text.strip()  # type: ignore
-
-            # Get the cover URL
-            cover_url: str = soup.find("div", class_="summary_image").find("img")["src"]  # type: ignore
-
-            post_contents = soup.select(".post-content_item .summary-content")
-            rating_rank = post_contents[0].text.strip().split()[1]
-            alternatives = post_contents[2].text.strip().split(";")
-            authors = post_contents[3].text.strip().split(",")
-            artists = post_contents[4].text.strip().split(",")
-            genre = post_contents[5].text.strip()
-            type_ = post_contents[6].text.strip()
-            tags = post_contents[7].text.strip().split(",")
-            release = post_contents[8].text.strip()
-            status = post_contents[9].text.strip()
-
-            total_comments = soup.find("div", class_="count-comment").text.strip()  # type: ignore
-            total_bookmarked = soup.find("div", class_="add-bookmark").text.strip()  # type: ignore
-            description = soup.select_one(".description-summary .summary__content").text.strip()  # type: ignore
-
-            chapter_list = soup.select(".wp-manga-chapter")[::-1]  # type: ignore
-            chapters = []
-            for chapter in chapter_list:
-                ch = chapter.find("a")
-                ch_url = ch["href"]  # type: ignore
-                if ch_url.endswith("/"):  # type: ignore
-                    ch_url = ch_url[:-1]
-                ch_title = ch.text.strip()  # type: ignore
-                ch_date = chapter.select_one(".chapter-release-date").text.strip()  # type: ignore
-                chapters.append(Chapter(url=ch_url, source=self, title=ch_title, date=ch_date))  # type: ignore
-
-            m = MangaInfo(title=title, url=self.url)
-            m.cover_url = cover_url
-            m.alternative_titles = alternatives
-            m.authors = authors
-            m.artists = artists
-            m.genres = [i.strip() for i in genre.split(",")]
-            m.tags = tags
-            m.status = status
-            m.description = description
-            m.chapters = chapters
-            m.rating = rating_rank
-            m.last_updated = release
-            m.total_comments = total_comments
-            m.total_bookmarked = total_bookmarked
-            m.type = type_
-
-            return m
-
+            return self.parse_info(make_soup(scraper.get(self.url).content, self.strainers["info"]))
+        except NotModified:
+            raise
         except Exception as e:
             logger.error(f"Error getting manga info for {self.url}: {e}")
             raise MangaNotFound(f"Manga not found: {self.url}")
 
+    def parse_info(self, soup: BeautifulSoup) -> MangaInfo:
+        """Info of a manga page, parsed whole or with strainers["info"]"""
+        # Get the title
+        title = soup.find(class_="post-title").text.strip()  # type: ignore
+
+        # Get the cover URL
+        cover_url: str = soup.find("div", class_="summary_image").find("img")["src"]  # type: ignore
+
+        post_contents = soup.select(".post-content_item .summary-content")
+        rating_rank = post_contents[0].text.strip().split()[1]
+        alternatives = post_contents[2].text.strip().split(";")
+        authors = post_contents[3].text.strip().split(",")
+        artists = post_contents[4].text.strip().split(",")
+        genre = post_contents[5].text.strip()
+        type_ = post_contents[6].text.strip()
+        tags = post_contents[7].text.strip().split(",")
+        release = post_contents[8].text.strip()
+        status = post_contents[9].text.strip()
+
+        total_comments = soup.find("div", class_="count-comment").text.strip()  # type: ignore
+        total_bookmarked = soup.find("div", class_="add-bookmark").text.strip()  # type: ignore
+        description = soup.select_one(".description-summary .summary__content").text.strip()  # type: ignore
+
+        chapter_list = soup.select(".wp-manga-chapter")[::-1]  # type: ignore
+        chapters = []
+        for chapter in chapter_list:
+            ch = chapter.find("a")
+            ch_url = ch["href"]  # type: ignore
+            if ch_url.endswith("/"):  # type: ignore
+                ch_url = ch_url[:-1]
+            ch_title = ch.text.strip()  # type: ignore
+            ch_date = chapter.select_one(".chapter-release-date").text.strip()  # type: ignore
+            chapters.append(Chapter(url=ch_url, source=self, title=ch_title, date=ch_date))  # type: ignore
+
+        m = MangaInfo(title=title, url=self.url)
+        m.cover_url = cover_url
+        m.alternative_titles = alternatives
+        m.authors = authors
+        m.artists = artists
+        m.genres = [i.strip() for i in genre.split(",")]
+        m.tags = tags
+        m.status = status
+        m.description = description
+        m.chapters = chapters
+        m.rating = rating_rank
+        m.last_updated = release
+        m.total_comments = total_comments
+        m.total_bookmarked = total_bookmarked
+        m.type = type_
+
+        return m
+
+    def parse_chapter_img_urls(self, html: str) -> list[str]:
+        soup = make_soup(html, self.strainers["chapter"])
+        imgs = soup.select(".entry-content img")  # type: ignore
+        return [i.get("src") for i in imgs]  # type: ignore
+
     @exists
     def get_chapter_img_urls(self, chapter_url: str) -> list:
         if chapter_url.startswith("/"):
@@ -308,10 +374,25 @@ class ONEkissmanga(BaseSource):
 
         try:
             res = scraper.get(chapter_url)
-            soup = BeautifulSoup(res.text, "html.parser")
-            imgs = soup.select(".entry-content img")  # type: ignore
-            imgs = [i.get("src") for i in imgs]  # type: ignore
+            imgs = self.parse_chapter_img_urls(res.text)
+
+        except NotModified:
+            raise
+        except Exception as e:
+            logger.error(f"Error getting chapter images for {chapter_url}: {e}")
+            imgs = []
+
+        return imgs
+
+    @async_exists
+    async def get_chapter_img_urls_async(self, chapter_url: str, session) -> list:
+        if chapter_url.startswith("/"):
+            chapter_url = f"{self.url}{chapter_url}"
 
+        try:
+            imgs = self.parse_chapter_img_urls(await scraper.async_text(session, chapter_url))
+        except NotModified:
+            raise
         except Exception as e:
             logger.error(f"Error getting chapter images for {chapter_url}: {e}")
             imgs = []
@@ -330,10 +411,16 @@ class Bato(BaseSource):
         "mangatoto.com",
     ]
     manga_format = "https://{domain}/series/{ID.replace('_', '/')}"
+    strainers = {
+        "search": {"id": "series-list"},
+        "info": {"class_": ["attr-cover", "item-title", "detail-set", "main"]},
+    }
+    use_mirrors = True
 
     def __init__(self, url: str):
         super().__init__(url)
-        self.use_selenium_in_get_chapter_img_urls = True
+        # image urls are read from the page data, selenium is only a fallback
+        self.use_selenium_in_get_chapter_img_urls = False
 
     @property
     def _id(self) -> str:
@@ -348,7 +435,7 @@ class Bato(BaseSource):
         results = []
         try:
             res = scraper.get(url)
-            soup = BeautifulSoup(res.text, "html.parser")
+            soup = make_soup(res.text, Bato.strainers["search"])
             slist = soup.select_one("#series-list")
             if not slist:
                 raise Exception("No results found")
@@ -433,116 +520,142 @@ class Bato(BaseSource):
     def get_info(self) -> MangaInfo:
         try:
             res = scraper.get(self.url)
-            soup = BeautifulSoup(res.text, "html.parser")
-
-            # .attr-cover
-            cover_url = ""
-            cover_src = soup.select_one(".attr-cover img")
-            if cover_src:
-                cover_url = cover_src["src"]
-
-            # h1 item-title
-            title = ""
-            title_h3 = soup.select_one("h3.item-title")
-            if title_h3:
-                title = title_h3.text.strip()
-
-            summary = ""
-            info = soup.select_one(".detail-set")
-            infos = {
-                "Rank": "",
-                "Authors": "",
-                "Artists": "",
-                "Genres": "",
-                "Translated language": "",
-                "Original language": "",
-                "Original work": "",
-            }
-            if info:
-                items = info.select(".attr-item")
-
-                for item in items:
-                    h = item.select_one(".text-muted")
-                    if h:
-                        h = h.text.strip().replace(":", "")  # type: ignore
-                        val = item.select_one("span").text.replace("\n", "").replace("\r", "").strip()  # type: ignore
-
-                        infos[h] = val
-
-                # div mt-3
-                sdiv = info.select_one("div.mt-3")
-                if sdiv:
-                    summary = sdiv.text.strip()
-
-            genres = [i for i in infos["Genres"].split(",")]
-            authors = [i for i in infos["Authors"].split(",")]
-            artists = [i for i in infos["Artists"].split(",")]
-            rank = infos["Rank"]
-            original_language = infos["Original language"]
-            translated_language = infos["Translated language"]
-            status = infos["Original work"]
-
-            chapters = []
-
-            citems = soup.select(".main > .item")[::-1]
-            for c in citems:
-                chtitle: str = ""
-                link: str = ""
-                atag = c.select_one("a")
-                if atag:
-                    chtitle = atag.text.strip()
-                    link = atag["href"]  # type: ignore
-
-                if link.startswith("/"):
-                    link = f"https://{Bato.domain}{link}"
-
-                extra = c.select_one(".extra")
-                views: str = ""
-                date: str = ""
-                if extra:
-                    views = extra.select("span i")  # type: ignore
-                    views = " ".join([i.text for i in views])  # type: ignore
-                    date = extra.select_one("i.ps-3").text.strip()  # type: ignore
-
-                views = Bato.parse_views(views)
-                chapters.append(
-                    Chapter(
-                        title=chtitle, url=link, views=views, date=date, source=self
-                    )
-                )
-
-            m = MangaInfo(title=title, url=self.url)
-            m.cover_url = cover_url  # type: ignore
-            m.rank = rank
-            m.authors = authors
-            m.artists = artists
-            m.genres = genres
-            m.original_language = original_language
-            m.translated_language = translated_language
-            m.status = status
-            m.description = summary
-            m.chapters = chapters
-
-            return m
-
+            return self.parse_info(make_soup(res.text, self.strainers["info"]))
+        except NotModified:
+            raise
         except Exception as e:
             logger.error(f"Error getting manga info for {self.url}: {e}")
             raise MangaNotFound(f"Manga not found: {self.url}")
 
-    @exists
-    def get_chapter_img_urls(self, chapter_url: str, **kw) -> list[str]:
+    def parse_info(self, soup: BeautifulSoup) -> MangaInfo:
+        """Info of a manga page, parsed whole or with strainers["info"]"""
+
+        # .attr-cover
+        cover_url = ""
+        cover_src = soup.select_one(".attr-cover img")
+        if cover_src:
+            cover_url = cover_src["src"]
+
+        # h1 item-title
+        title = ""
+        title_h3 = soup.select_one("h3.item-title")
+        if title_h3:
+            title = title_h3.text.strip()
+
+        summary = ""
+        info = soup.select_one(".detail-set")
+        infos = {
+            "Rank": "",
+            "Authors": "",
+            "Artists": "",
+            "Genres": "",
+            "Translated language": "",
+            "Original language": "",
+            "Original work": "",
+        }
+        if info:
+            items = info.select(".attr-item")
+
+            for item in items:
+                h = item.select_one(".text-muted")
+                if h:
+                    h = h.text.strip().replace(":", "")  # type: ignore
+                    val = item.select_one("span").text.replace("\n", "").replace("\r", "").strip()  # type: ignore
+
+                    infos[h] = val
+
+            # div mt-3
+            sdiv = info.select_one("div.mt-3")
+            if sdiv:
+                summary = sdiv.text.strip()
+
+        genres = [i for i in infos["Genres"].split(",")]
+        authors = [i for i in infos["Authors"].split(",")]
+        artists = [i for i in infos["Artists"].split(",")]
+        rank = infos["Rank"]
+        original_language = infos["Original language"]
+        translated_language = infos["Translated language"]
+        status = infos["Original work"]
+
+        chapters = []
+
+        citems = soup.select(".main > .item")[::-1]
+        for c in citems:
+            chtitle: str = ""
+            link: str = ""
+            atag = c.select_one("a")
+            if atag:
+                chtitle = atag.text.strip()
+                link = atag["href"]  # type: ignore
+
+            if link.startswith("/"):
+                link = f"https://{Bato.domain}{link}"
+
+            extra = c.select_one(".extra")
+            views: str = ""
+            date: str = ""
+            if extra:
+                views = extra.select("span i")  # type: ignore
+                views = " ".join([i.text for i in views])  # type: ignore
+                date = extra.select_one("i.ps-3").text.strip()  # type: ignore
+
+            views = Bato.parse_views(views)
+            chapters.append(
+                Chapter(
+                    title=chtitle, url=link, views=views, date=date, source=self
+                )
+            )
+
+        m = MangaInfo(title=title, url=self.url)
+        m.cover_url = cover_url  # type: ignore
+        m.rank = rank
+        m.authors = authors
+        m.artists = artists
+        m.genres = genres
+        m.original_language = original_language
+        m.translated_language = translated_language
+        m.status = status
+        m.description = summary
+        m.chapters = chapters
+
+        return m
+
+    @staticmethod
+    def parse_chapter_img_urls(html: str) -> list[str]:
+        """
+        Read the image urls embedded in a chapter page, without a browser.
+
+        Supports the v2 reader (const imgHttps = [...]; in an inline script)
+        and the v3 reader (imageFiles in the props of an astro-island).
+        """
+        m = re.search(r"const\s+imgHttp(?:s|Lis)\s*=\s*(\[.*?\])\s*;", html, re.S)
+        if m:
+            try:
+                urls = json.loads(m.group(1))
+                return [i for i in urls if isinstance(i, str) and i]
+            except ValueError as e:
+                logger.error(f"Error parsing imgHttps: {e}")
+
+        for props in re.findall(r'<astro-island[^>]*?props="([^"]*)"', html):
+            props = unescape(props)
+            if "imageFiles" not in props:
+                continue
+            try:
+                # astro serializes every prop as [type, value]
+                files = json.loads(props)["imageFiles"][1]
+                if isinstance(files, str):
+                    files = json.loads(files)
+                urls = [i[1] if isinstance(i, list) else i for i in files]
+                return [i for i in urls if isinstance(i, str) and i]
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                logger.error(f"Error parsing imageFiles: {e}")
+
+        return []
+
+    def _get_chapter_img_urls_selenium(self, chapter_url: str, driver: Driver) -> list[str]:
         results = []
-        got_driver = False
-        driver: Driver = kw.get("driver", None)
         for i in range(2):
             try:
-                if not driver:
-                    raise Exception(
-                        f"Cannot get img urls in {self.domain} without driver"
-                    )
-
-                got_driver = True
-
                 driver.get(chapter_url)
                 imgs = driver.find_elements(By.XPATH, "//div[@id='viewer']//img")
                 for img in imgs:
@@ -552,9 +665,37 @@ class Bato(BaseSource):
                     break
             except Exception as e:
                 logger.error(f"Error getting chapter image urls for {chapter_url}: {e}")
+        return results
+
+    @exists
+    def get_chapter_img_urls(self, chapter_url: str, **kw) -> list[str]:
+        results = []
+        try:
+            res = scraper.get(chapter_url)
+            res.raise_for_status()
+            results = self.parse_chapter_img_urls(res.text)
+        except NotModified:
+            raise
+        except Exception as e:
+            logger.error(f"Error getting chapter page {chapter_url}: {e}")
 
-        if got_driver:
-            driver.usable = True
+        if not results:
+            logger.warning(
+                f"No image data in {chapter_url}, falling back to selenium"
+            )
+            driver: Driver = kw.get("driver", None)
+            if driver:
+                results = self._get_chapter_img_urls_selenium(chapter_url, driver)
+            elif driver_manager.chromedriver_installed:
+                key, driver = driver_manager.get_driver(
+                    self.driver_remove_options, self.driver_capabilities
+                )
+                try:
+                    results = self._get_chapter_img_urls_selenium(chapter_url, driver)  # type: ignore
+                finally:
+                    driver_manager.release_driver(key)
+            else:
+                logger.error(f"Cannot get img urls in {self.domain} without chrome")
 
         if "pbar" in kw:
             kw["pbar"].update(1)
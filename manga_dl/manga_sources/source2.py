@@ -12,16 +12,32 @@ from selenium.webdriver.support.wait import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
 from tools.utils import logger, get_file_name, Driver
-from tools.exceptions import MangaNotFound
-from bs4 import BeautifulSoup
+from tools.exceptions import MangaNotFound, NotModified
 from .base_source import BaseSource
-from .utils import MangaInfo, Chapter, scraper, static_exists, exists
+from .utils import MangaInfo, Chapter, scraper, static_exists, exists, make_soup
 import base64
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from bs4 import BeautifulSoup
 
 
 class MangaKakalot(BaseSource):
     domain = "mangakakalot.to"
     manga_format = "https://{domain}/{ID}"
+    # the pages are drawn on canvases, so images have to load
+    driver_remove_options = [
+        "--disable-dev-shm-usage",
+        "--blink-settings=imagesEnabled=false",
+    ]
+    # network events are read back to get the page images
+    driver_capabilities = {"goog:loggingPrefs": {"performance": "ALL"}}
+    strainers = {
+        "search": {"class_": "manga-list"},
+        "chapters": {"id": "list-chapter-en"},
+        "info": {"class_": "detail-box"},
+        "chapter": {"id": "list-image"},
+    }
 
     def __init__(self, url):
         super().__init__(url)
@@ -38,7 +54,7 @@ class MangaKakalot(BaseSource):
 
             # all atags: url > img: src
             if res:
-                soup = BeautifulSoup(res.text, "html.parser")
+                soup = make_soup(res.text, cls.strainers["search"])
                 inner = soup.find(class_="manga-list")
                 items = inner.select(".item") if inner else []  # type: ignore
                 for item in items:
@@ -85,118 +101,248 @@ class MangaKakalot(BaseSource):
         url = f"https://mangakakalot.to/ajax/manga/list-chapter-volume?id={cid}"
         try:
             res = scraper.get(url)
-            soup = BeautifulSoup(res.text, "html.parser")
-
-            chd = soup.select_one("#list-chapter-en")
-            items = chd.select(".item")[::-1]  # type: ignore
-            chapters = []
-            for item in items:
-                atag = item.find("a")
-                url: str = ""
-                title = ""
-                if atag:
-                    url = atag["href"]  # type: ignore
-                    title = atag.text.strip()
-                timet = item.select_one(".item-time")  # type: ignore
-                date = ""
-                if timet:
-                    date = timet.text.strip()
-
-                if url and title:
-                    if url.startswith("/"):
-                        url = f"https://{self.domain}{url}"
-
-                    chapters.append(
-                        Chapter(url=url, source=self, title=title, date=date)
-                    )
-
-            return chapters
+            return self.parse_chapters(make_soup(res.text, self.strainers["chapters"]))
         except Exception as e:
             logger.error(f"Error getting chapters for {self.url}: {e}")
             return []
 
+    def parse_chapters(self, soup: BeautifulSoup) -> list[Chapter]:
+        """Chapters of the chapter list, parsed whole or with strainers["chapters"]"""
+        chd = soup.select_one("#list-chapter-en")
+        items = chd.select(".item")[::-1]  # type: ignore
+        chapters = []
+        for item in items:
+            atag = item.find("a")
+            url: str = ""
+            title = ""
+            if atag:
+                url = atag["href"]  # type: ignore
+                title = atag.text.strip()
+            timet = item.select_one(".item-time")  # type: ignore
+            date = ""
+            if timet:
+                date = timet.text.strip()
+
+            if url and title:
+                if url.startswith("/"):
+                    url = f"https://{self.domain}{url}"
+
+                chapters.append(
+                    Chapter(url=url, source=self, title=title, date=date)
+                )
+
+        return chapters
+
     @exists
     def get_info(self) -> MangaInfo:
         try:
             res = scraper.get(self.url)
-            soup = BeautifulSoup(res.text, "html.parser")
-            soup = soup.select_one(".detail-box")  # type: ignore
+            info = self.parse_info(make_soup(res.text, self.strainers["info"]))
+            info.chapters = self.get_chapters()
+            return info
+        except NotModified:
+            raise
+        except Exception as e:
+            raise MangaNotFound(f"Error getting info for {self.url}: {e}")
 
-            potert = soup.select_one(".manga-poster > img")  # type: ignore
-            cover_url: str = potert["src"] if potert else "/public/error.png"  # type: ignore
+    def parse_info(self, soup: BeautifulSoup) -> MangaInfo:
+        """
+        Info of a manga page, parsed whole or with strainers["info"].
+        The chapters are on another page, see parse_chapters.
+        """
+        soup = soup.select_one(".detail-box")  # type: ignore
+
+        potert = soup.select_one(".manga-poster > img")  # type: ignore
+        cover_url: str = potert["src"] if potert else "/public/error.png"  # type: ignore
+
+        info = soup.select_one(".db-info")  # type: ignore
+
+        title = ""
+        alias = []
+        titlet = soup.select_one(".manga-name")  # type: ignore
+        if titlet:
+            title = titlet.text.strip()
+        aliast = soup.select_one(".alias")  # type: ignore
+        if aliast:
+            alias = [aliast.text.strip()]
+
+        infod = {
+            "Author(s)": "",
+            "Status": "",
+            "Published": "",
+            "Views": "",
+            "Genres": "",
+        }
+
+        lines = info.select(".line-content")  # type: ignore
+        for content in lines[1:-1]:
+            # title
+            key = content.select_one(".title")  # type: ignore
+            key = key.text.replace(":", "").strip() if key else ""
+
+            # result
+            val = content.select_one(".result")
+            val = (
+                val.text.replace("\n", "").replace("\r", "").strip() if val else ""
+            )
 
-            info = soup.select_one(".db-info")  # type: ignore
+            infod[key] = val
+
+        ratet = lines[-1]
+        rate = ratet.select_one(".rate-result")  # type: ignore
+        rate = (
+            " ".join(re.split(r"\s+", rate.text, flags=re.UNICODE)).strip()
+            if rate
+            else ""
+        )
+
+        infod["Authors"] = [i.strip() for i in infod["Author(s)"].split(",")]  # type: ignore
+        infod["Genres"] = [i.strip() for i in infod["Genres"].split(",")]  # type: ignore
+
+        # dbs-content
+        description = ""
+        dest = soup.select_one(".dbs-content")  # type: ignore
+        if dest:
+            description = dest.text.strip()
+
+        return MangaInfo(
+            url=self.url,
+            title=title,
+            cover_url=cover_url,
+            description=description,
+            alternative_titles=alias,
+            genres=infod["Genres"],
+            authors=infod["Authors"],
+            status=infod["Status"],
+            rating=rate,
+            views=infod["Views"],
+            last_updated=infod["Published"],
+        )
 
-            title = ""
-            alias = []
-            titlet = soup.select_one(".manga-name")  # type: ignore
-            if titlet:
-                title = titlet.text.strip()
-            aliast = soup.select_one(".alias")  # type: ignore
-            if aliast:
-                alias = [aliast.text.strip()]
-
-            infod = {
-                "Author(s)": "",
-                "Status": "",
-                "Published": "",
-                "Views": "",
-                "Genres": "",
-            }
-
-            lines = info.select(".line-content")  # type: ignore
-            for content in lines[1:-1]:
-                # title
-                key = content.select_one(".title")  # type: ignore
-                key = key.text.replace(":", "").strip() if key else ""
-
-                # result
-                val = content.select_one(".result")
-                val = (
-                    val.text.replace("\n", "").replace("\r", "").strip() if val else ""
-                )
+    @staticmethod
+    def _read_network_log(driver: Driver) -> list[dict]:
+        messages = []
+        try:
+            entries = driver.get_log("performance")
+        except Exception:
+            return messages
 
-                infod[key] = val
+        for entry in entries:
+            try:
+                messages.append(json.loads(entry["message"])["message"])
+            except (KeyError, ValueError):
+                continue
+        return messages
 
-            ratet = lines[-1]
-            rate = ratet.select_one(".rate-result")  # type: ignore
-            rate = (
-                " ".join(re.split(r"\s+", rate.text, flags=re.UNICODE)).strip()
-                if rate
-                else ""
-            )
+    @staticmethod
+    def select_page_images(messages: list[dict]) -> list[tuple[str, str]]:
+        """
+        Pick the chapter pages out of the network events of a page.
+
+        Parameters
+        ----------
+        messages : list[dict]
+            DevTools Network.* events
+
+        Returns
+        -------
+        list[tuple[str, str]]
+            (url, requestId) of the page images, in request order
+        """
+        requested = {}
+        responses = {}
+        for message in messages:
+            method = message.get("method")
+            params = message.get("params", {})
+            if method == "Network.requestWillBeSent":
+                requested.setdefault(params.get("requestId"), len(requested))
+
+            elif method == "Network.responseReceived":
+                response = params.get("response", {})
+                if response.get("status") != 200:
+                    continue
+                if params.get("type") != "Image" and not response.get(
+                    "mimeType", ""
+                ).startswith("image/"):
+                    continue
+                if not response.get("url", "").startswith("http"):
+                    continue
+                responses[params["requestId"]] = response["url"]
+
+        # pages come from the same folder, logos and covers don't
+        groups: dict[str, list[str]] = {}
+        for request_id, url in responses.items():
+            groups.setdefault(url.rsplit("/", 1)[0], []).append(request_id)
+        if not groups:
+            return []
 
-            infod["Authors"] = [i.strip() for i in infod["Author(s)"].split(",")]  # type: ignore
-            infod["Genres"] = [i.strip() for i in infod["Genres"].split(",")]  # type: ignore
-
-            # dbs-content
-            description = ""
-            dest = soup.select_one(".dbs-content")  # type: ignore
-            if dest:
-                description = dest.text.strip()
-
-            return MangaInfo(
-                url=self.url,
-                title=title,
-                cover_url=cover_url,
-                description=description,
-                alternative_titles=alias,
-                genres=infod["Genres"],
-                authors=infod["Authors"],
-                status=infod["Status"],
-                rating=rate,
-                views=infod["Views"],
-                last_updated=infod["Published"],
-                chapters=self.get_chapters(),
-            )
+        pages = max(groups.values(), key=len)
+        pages.sort(key=lambda i: requested.get(i, len(requested)))
+        return [(responses[i], i) for i in pages]
 
-        except Exception as e:
-            raise MangaNotFound(f"Error getting info for {self.url}: {e}")
+    @classmethod
+    def _captured_pages(cls, driver: Driver, messages: list[dict]) -> list[tuple[str, str]]:
+        """The captured page images, [] until there is one for every canvas"""
+        pages = cls.select_page_images(messages)
+        canvases = len(driver.find_elements(By.TAG_NAME, "canvas"))
+        if not canvases or len(pages) < canvases:
+            return []
+        return pages
+
+    def _network_images(self, driver: Driver, chapter_url: str, messages: list[dict]) -> list[str]:
+        """Page images captured from the network, saved from the response bodies when possible"""
+        pages = self._captured_pages(driver, messages)
+        if not pages:
+            logger.warning(f"Not every canvas of {chapter_url} has a captured image")
+            return []
+
+        results = []
+        for url, request_id in pages:
+            filepath = os.path.join(self.temp_dir, get_file_name(url))
+            try:
+                body = driver.execute_cdp_cmd(
+                    "Network.getResponseBody", {"requestId": request_id}
+                )
+                data = body["body"]
+                data = base64.b64decode(data) if body.get("base64Encoded") else data.encode()
+                with open(filepath, "wb") as f:
+                    f.write(data)
+                results.append(filepath)
+            except Exception:
+                # the body is gone from the browser, download it later
+                results.append(url)
+        return results
+
+    def _canvas_images(self, driver: Driver, chapter_url: str) -> list[str]:
+        """
+        Serialize all the canvases in one script call and save them as png.
+        A canvas that can't be read (tainted, or not drawn yet) fails the
+        chapter, it would be missing a page.
+        """
+        data_urls = driver.execute_script(
+            "return Array.from(document.getElementsByTagName('canvas'), c => {"
+            " try { return c.width && c.height ? c.toDataURL() : null; } catch (e) { return null; } });"
+        )
+        unread = [i for i, data_url in enumerate(data_urls) if not data_url]
+        if unread:
+            logger.warning(f"Could not read canvases {unread} of {chapter_url}")
+            return []
+
+        def save(i, data_url: str):
+            header, data = data_url.split(",", 1)
+            ext = ".png" if "image/png" in header else ".jpg"
+            filename = get_file_name(f"{chapter_url}_{i}{ext}", True)
+            filepath = os.path.join(self.temp_dir, filename)
+            with open(filepath, "wb") as f:
+                f.write(base64.b64decode(data))
+            return filepath
+
+        with ThreadPoolExecutor() as executor:
+            return list(executor.map(save, range(len(data_urls)), data_urls))
 
     @exists
     def get_chapter_img_urls(self, chapter_url: str, **kw) -> list[str]:
         results = []
-        got_driver = False
         driver: Driver = kw.get("driver", None)
         for i in range(2):
             try:
@@ -205,12 +351,12 @@ class MangaKakalot(BaseSource):
                         f"Cannot get img urls in {self.domain} without driver"
                     )
 
-                got_driver = True
-                driver.remove_option("--disable-dev-shm-usage")
-                driver.remove_option("--blink-settings=imagesEnabled=false")
+                self.prepare_driver(driver)
+                # drop the events of the previous page
+                self._read_network_log(driver)
 
                 driver.get(chapter_url)
-                soup = BeautifulSoup(driver.page_source, "html.parser")
+                soup = make_soup(driver.page_source, self.strainers["chapter"])
 
                 lst_img = soup.select_one("#list-image")  # type: ignore
                 imgs = lst_img.select("img")  # type: ignore
@@ -219,30 +365,30 @@ class MangaKakalot(BaseSource):
 
                 # imgs can be stored in canvas
                 if not results:
-                    try:
-                        wait = WebDriverWait(driver, 10)
-                        # last card-warp have canvas
-                        wait.until(
-                            EC.presence_of_element_located((By.CSS_SELECTOR, ".card-wrap:last-child canvas"))
-                        )
-                    except Exception as e:
-                        logger.error(
-                            f"Error waiting for canvas in {chapter_url}: {e}",
-                        )
+                    capture = os.environ.get("CAPTURE_NETWORK", "1") == "1"
+                    messages = self._read_network_log(driver) if capture else []
+
+                    # the pages are often in by the load event, then there's nothing to wait for
+                    if not (capture and self._captured_pages(driver, messages)):
+                        try:
+                            wait = WebDriverWait(driver, 10)
+                            # last card-warp have canvas
+                            wait.until(
+                                EC.presence_of_element_located((By.CSS_SELECTOR, ".card-wrap:last-child canvas"))
+                            )
+                        except Exception as e:
+                            logger.error(
+                                f"Error waiting for canvas in {chapter_url}: {e}",
+                            )
+                        if capture:
+                            messages += self._read_network_log(driver)
 
-                    canvases = driver.find_elements(By.TAG_NAME, "canvas")
-                    for i, canvas in enumerate(canvases):
-                        canvas_base64 = driver.execute_script(
-                            "return arguments[0].toDataURL('image/jpeg').substring(22);",
-                            canvas,
-                        )
-                        canvas_jpg = base64.b64decode(canvas_base64)
+                    if capture:
+                        results = self._network_images(driver, chapter_url, messages)
 
-                        filename = get_file_name(f"{chapter_url}_{i}.jpg")
-                        filepath = os.path.join(self.temp_dir, filename)
-                        with open(filepath, "wb") as f:
-                            f.write(canvas_jpg)
-                        results.append(filepath)
+                # canvas serialization is the last resort
+                if not results:
+                    results = self._canvas_images(driver, chapter_url)
 
                 if results:
                     break
@@ -250,9 +396,6 @@ class MangaKakalot(BaseSource):
             except Exception as e:
                 logger.error(f"Error getting chapter image urls for {chapter_url}: {e}")
 
-        if got_driver:
-            driver.usable = True
-
         if "pbar" in kw:
             kw["pbar"].update(1)
         return results
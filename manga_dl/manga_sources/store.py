@@ -0,0 +1,328 @@
+import glob
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Union
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import get_file_name, logger, safe_remove
+
+
+STORE_NAME = "metadata.db"
+# PRAGMA user_version of a store whose json caches were migrated
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS manga (
+    key TEXT PRIMARY KEY, url TEXT, id TEXT, data TEXT, updated REAL
+);
+CREATE INDEX IF NOT EXISTS manga_url ON manga (url);
+CREATE INDEX IF NOT EXISTS manga_id ON manga (id);
+
+CREATE TABLE IF NOT EXISTS chapters (
+    manga_key TEXT, position INTEGER, url TEXT, id TEXT, title TEXT, views TEXT, date TEXT,
+    PRIMARY KEY (manga_key, position)
+);
+CREATE INDEX IF NOT EXISTS chapters_url ON chapters (url);
+CREATE INDEX IF NOT EXISTS chapters_id ON chapters (id);
+
+CREATE TABLE IF NOT EXISTS images (
+    key TEXT PRIMARY KEY, url TEXT, urls TEXT, updated REAL
+);
+CREATE INDEX IF NOT EXISTS images_url ON images (url);
+
+CREATE TABLE IF NOT EXISTS searches (
+    key TEXT PRIMARY KEY, query TEXT, results TEXT, updated REAL
+);
+
+CREATE TABLE IF NOT EXISTS validators (
+    url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT
+);
+"""
+
+
+class MetadataStore:
+    """
+    The cached manga info, chapter lists, chapter image urls and searches,
+    in one SQLite database (WAL, so the app and the cli can share it).
+
+    Entries are keyed like the json files they replace, get_file_name(url, True),
+    and saved with the time they were fetched.
+
+    Methods:
+        get_manga(key) / put_manga(key, url, id, data) Manga info, chapters included.
+
+        get_images(key) / put_images(key, url, urls) Image urls of a chapter.
+
+        get_search(key) / put_search(key, query, results) Results of a search.
+
+        manga_by_id(id) Info of a manga by id.
+
+        touch(kind, key) Mark an entry as just fetched, after a 304.
+
+        get_validators(url) / save_validators(url, validators) ETag and Last-Modified of a page or image.
+
+        migrate(folder) Move the <key>_info.json caches of folder in, once.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def _one(self, sql: str, args: tuple):
+        with self._lock:
+            return self.conn.execute(sql, args).fetchone()
+
+    def _write(self, statements: list[tuple[str, Union[tuple, list]]]) -> bool:
+        """Run statements in one transaction, False if it was rolled back"""
+        try:
+            with self._lock, self.conn:
+                for sql, args in statements:
+                    if isinstance(args, list):
+                        self.conn.executemany(sql, args)
+                    else:
+                        self.conn.execute(sql, args)
+        except sqlite3.Error as e:
+            logger.error(f"Error saving to {self.path}: {e}")
+            return False
+        return True
+
+    def _manga_statements(self, key: str, url: str, id: str, data: dict, updated: float):
+        chapters = [
+            (key, i, c["url"], c.get("id", ""), c.get("title", ""), c.get("views", ""), c.get("date", ""))
+            for i, c in enumerate(data.get("chapters", []))
+        ]
+        data = {k: v for k, v in data.items() if k != "chapters"}
+        return [
+            (
+                "INSERT OR REPLACE INTO manga (key, url, id, data, updated) VALUES (?, ?, ?, ?, ?)",
+                (key, url, id, json.dumps(data), updated),
+            ),
+            ("DELETE FROM chapters WHERE manga_key = ?", (key,)),
+            (
+                "INSERT INTO chapters (manga_key, position, url, id, title, views, date) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                chapters,
+            ),
+        ]
+
+    def _with_chapters(self, key: str, data: str) -> dict:
+        info = json.loads(data)
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT url, id, title, views, date FROM chapters WHERE manga_key = ? ORDER BY position",
+                (key,),
+            ).fetchall()
+        info["chapters"] = [
+            {"url": url, "id": id, "title": title, "views": views, "date": date}
+            for url, id, title, views, date in rows
+        ]
+        return info
+
+    def get_manga(self, key: str) -> tuple[Union[dict, None], float]:
+        """Info json and the time it was saved, (None, 0) if missing"""
+        row = self._one("SELECT data, updated FROM manga WHERE key = ?", (key,))
+        if not row:
+            return None, 0
+        return self._with_chapters(key, row[0]), row[1]
+
+    def manga_by_id(self, id: str) -> Union[dict, None]:
+        row = self._one("SELECT key, data FROM manga WHERE id = ? ORDER BY updated DESC", (id,))
+        return self._with_chapters(*row) if row else None
+
+    def put_manga(self, key: str, url: str, id: str, data: dict):
+        self._write(self._manga_statements(key, url, id, data, time.time()))
+
+    def get_images(self, key: str) -> tuple[Union[list, None], float]:
+        row = self._one("SELECT urls, updated FROM images WHERE key = ?", (key,))
+        if not row:
+            return None, 0
+        return json.loads(row[0]), row[1]
+
+    def put_images(self, key: str, url: str, urls: list):
+        self._write(
+            [
+                (
+                    "INSERT OR REPLACE INTO images (key, url, urls, updated) VALUES (?, ?, ?, ?)",
+                    (key, url, json.dumps(urls), time.time()),
+                )
+            ]
+        )
+
+    def get_search(self, key: str) -> tuple[Union[list, None], float]:
+        row = self._one("SELECT results, updated FROM searches WHERE key = ?", (key,))
+        if not row:
+            return None, 0
+        return json.loads(row[0]), row[1]
+
+    def put_search(self, key: str, query: str, results: list):
+        self._write(
+            [
+                (
+                    "INSERT OR REPLACE INTO searches (key, query, results, updated) VALUES (?, ?, ?, ?)",
+                    (key, query, json.dumps(results), time.time()),
+                )
+            ]
+        )
+
+    def touch(self, kind: str, key: str):
+        table = {"manga": "manga", "images": "images"}[kind]
+        self._write([(f"UPDATE {table} SET updated = ? WHERE key = ?", (time.time(), key))])
+
+    def get_validators(self, url: str) -> dict:
+        row = self._one("SELECT etag, last_modified FROM validators WHERE url = ?", (url,))
+        if not row:
+            return {}
+        return {k: v for k, v in zip(("etag", "last_modified"), row) if v}
+
+    def save_validators(self, url: str, validators: dict):
+        if not validators:
+            return
+        self._write(
+            [
+                (
+                    "INSERT OR REPLACE INTO validators (url, etag, last_modified) VALUES (?, ?, ?)",
+                    (url, validators.get("etag", ""), validators.get("last_modified", "")),
+                )
+            ]
+        )
+
+    def infos(self) -> list[dict]:
+        """Every manga info and search result saved, without chapters"""
+        with self._lock:
+            manga = self.conn.execute("SELECT data FROM manga").fetchall()
+            searches = self.conn.execute("SELECT results FROM searches").fetchall()
+        infos = [json.loads(i[0]) for i in manga]
+        for (results,) in searches:
+            infos.extend(json.loads(results))
+        return infos
+
+    @property
+    def version(self) -> int:
+        return self._one("PRAGMA user_version", ())[0]
+
+    def migrate(self, folder: str) -> int:
+        """
+        Move the <key>_info.json files of folder into the store, keeping
+        their modification time as the time they were saved, then mark the
+        store as migrated (SCHEMA_VERSION) in the same transaction.
+
+        Manga rows get their url and id, chapter image rows the url of the
+        chapter they were cached for, when a migrated manga lists it.
+
+        Files are only removed once they are saved. Unreadable ones are left
+        in place, and all of them if the write fails, to be tried on next open.
+
+        Returns
+        -------
+        int
+            Files migrated
+        """
+        from . import get_source
+
+        caches = []
+        for path in glob.glob(os.path.join(folder, "*_info.json")):
+            key = os.path.basename(path)[: -len("_info.json")]
+            try:
+                with open(path, "r") as f:
+                    caches.append((path, key, json.load(f), os.path.getmtime(path)))
+            except Exception as e:
+                logger.error(f"Error migrating {path}: {e}")
+
+        # image caches are keyed by their chapter url, which only the manga know
+        chapter_urls = {}
+        for _, _, data, _ in caches:
+            if isinstance(data, dict) and data.get("url"):
+                for chapter in data.get("chapters", []):
+                    url = chapter.get("url", "")
+                    chapter_urls[get_file_name(url, True)] = url
+
+        statements: list = []
+        paths = []
+        for path, key, data, updated in caches:
+            if isinstance(data, dict) and "results" in data:
+                # a search, saved with its time
+                statements.append(
+                    (
+                        "INSERT OR REPLACE INTO searches (key, query, results, updated) VALUES (?, ?, ?, ?)",
+                        (key, "", json.dumps(data["results"]), data.get("time", 0)),
+                    )
+                )
+            elif isinstance(data, dict) and data.get("url"):
+                url = data["url"]
+                row = self._one("SELECT updated FROM manga WHERE url = ?", (url,))
+                if not row or row[0] < updated:
+                    try:
+                        id = data.get("id") or get_source(url).id
+                    except Exception:
+                        id = ""
+                    statements.extend(self._manga_statements(key, url, id, data, updated))
+            elif isinstance(data, list) and all(isinstance(i, dict) for i in data):
+                # a search from before the ttl
+                statements.append(
+                    (
+                        "INSERT OR REPLACE INTO searches (key, query, results, updated) VALUES (?, ?, ?, ?)",
+                        (key, "", json.dumps(data), 0),
+                    )
+                )
+            elif isinstance(data, list):
+                statements.append(
+                    (
+                        "INSERT OR REPLACE INTO images (key, url, urls, updated) VALUES (?, ?, ?, ?)",
+                        (key, chapter_urls.get(key, ""), json.dumps(data), updated),
+                    )
+                )
+            else:
+                logger.error(f"Error migrating {path}: unknown cache format")
+                continue
+            paths.append(path)
+
+        statements.append((f"PRAGMA user_version = {SCHEMA_VERSION}", ()))
+        if not self._write(statements):
+            return 0
+        for path in paths:
+            safe_remove(path)
+
+        if paths:
+            logger.info(f"Migrated {len(paths)} cache files to {self.path}")
+        return len(paths)
+
+
+_stores: dict[str, MetadataStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(temp_dir: str = "") -> MetadataStore:
+    """The store of temp_dir (TEMP_DIR by default), opened and migrated on first use"""
+    temp_dir = os.path.abspath(temp_dir or os.environ.get("TEMP_DIR", "tmp"))
+    with _stores_lock:
+        store = _stores.get(temp_dir)
+        if store is None:
+            if not os.path.exists(temp_dir):
+                os.makedirs(temp_dir)
+            store = MetadataStore(os.path.join(temp_dir, STORE_NAME))
+            # until a migration is saved, so a failed one is tried again
+            if store.version < SCHEMA_VERSION:
+                store.migrate(temp_dir)
+            _stores[temp_dir] = store
+        return store
+
+
+def close_stores():
+    """Close the open stores, before their folders are removed"""
+    with _stores_lock:
+        for store in _stores.values():
+            store.close()
+        _stores.clear()
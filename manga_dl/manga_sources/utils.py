@@ -5,106 +5,330 @@ import json
 import re
 
 import sys
+import threading
+import time
 from urllib.parse import urlparse
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from tools import get_file_name, safe_remove, logger
-from cloudscraper import create_scraper
+from tools import SingleFlight, get_file_name, logger
+from tools.exceptions import NotModified
+from tools.client import client
+from bs4 import BeautifulSoup, SoupStrainer
 import os
 import re
 from .base_source import BaseSource
+from .catalog import get_catalog
+from .store import get_store
 
 
-scraper = create_scraper(
-    browser={"browser": "firefox", "platform": "windows", "mobile": False}
-)
+# every page request of the sources goes through the shared client
+scraper = client
 
+try:
+    import lxml  # noqa: F401
 
-def _info_path(temp_dir, url: str) -> str:
-    return os.path.join(temp_dir, f"{get_file_name(url, True)}_info.json")
+    HTML_PARSER = os.environ.get("HTML_PARSER", "lxml")
+except ImportError:
+    HTML_PARSER = os.environ.get("HTML_PARSER", "html.parser")
+
+
+def make_soup(markup, strainer: Union[dict, None] = None, parser: str = "") -> BeautifulSoup:
+    """
+    Parse html with lxml when it's installed, html.parser otherwise.
+
+    Parameters
+    ----------
+    markup : str | bytes
+        Page html
+    strainer : dict, optional
+        SoupStrainer arguments, only the matching tags and what's inside
+        them are built. e.g. {"class_": ["chapter-list"]} or {"id": "list"}
+    parser : str, optional
+        Parser to use instead of the default one
+    """
+    parse_only = None
+    if strainer:
+        strainer = dict(strainer)
+        if "class_" in strainer:
+            strainer["class_"] = _has_class(strainer["class_"])
+        parse_only = SoupStrainer(**strainer)
+    return BeautifulSoup(markup, parser or HTML_PARSER, parse_only=parse_only)
+
+
+def _has_class(names: Union[str, list]):
+    """
+    Match any of the class names. While parsing, the strainer sees the raw
+    class attribute ("row detail-set"), so it is split here: a plain class_
+    would miss the tags with more than one class.
+    """
+    names = {names} if isinstance(names, str) else set(names)
+
+    def match(value) -> bool:
+        if not value:
+            return False
+        classes = value.split() if isinstance(value, str) else value
+        return any(i in names for i in classes)
+
+    return match
+
+
+def _cache_key(self, args) -> tuple[str, str]:
+    """Key and url of the cache entry of a source method call"""
+    url = self.url
+    if len(args) > 1:
+        url = args[1]
+
+    if url.startswith("/"):
+        url = self.url + url
+
+    parse = urlparse(url)
+    if parse.query:
+        url = url.replace(parse.query, "")
+
+    return get_file_name(url, True), url
+
+
+def _load_cache(self, args) -> tuple[Any, float]:
+    """
+    Cached result of a source method call and its age in seconds, (None, 0)
+    if missing. Calls with a url are chapter images, without one manga info.
+    """
+    key, url = _cache_key(self, args)
+    store = get_store(self.temp_dir)
+    if len(args) > 1:
+        data, updated = store.get_images(key)
+    else:
+        data, updated = store.get_manga(key)
+        if data:
+            data = MangaInfo.from_json(data)
+
+    if not data:
+        return None, 0
+
+    logger.info(f"Loaded info from cache: {url}")
+    return data, time.time() - updated
+
+
+def _save_cache(self, args, data):
+    key, url = _cache_key(self, args)
+    store = get_store(self.temp_dir)
+    if isinstance(data, MangaInfo):
+        data = data.to_json()
+        store.put_manga(key, url, self.id, data)
+
+        catalog = get_catalog()
+        if catalog:
+            catalog.add([data])
+        return MangaInfo.from_json(data)
+
+    if data:
+        store.put_images(key, url, data)
+    return data
+
+
+# seconds a cached entry is fresh, by kind. Info holds the chapter list, so it expires soon
+INFO_TTL = int(os.environ.get("INFO_TTL", 60 * 60))
+CHAPTER_TTL = int(os.environ.get("CHAPTER_TTL", 30 * 24 * 60 * 60))
+# seconds past its ttl an entry is still returned while it is refreshed in the background
+STALE_TTL = int(os.environ.get("STALE_TTL", 24 * 60 * 60))
+
+_refreshing: set[str] = set()
+_refreshing_lock = threading.Lock()
+
+
+def _in_background(key: str, func, *args):
+    """Run func in a thread, unless it is already running for key"""
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def run():
+        try:
+            func(*args)
+        except Exception as e:
+            logger.error(f"Error refreshing {key}: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def _ttl(data) -> int:
+    return INFO_TTL if isinstance(data, MangaInfo) else CHAPTER_TTL
+
+
+def _revalidation(self, args, data) -> tuple[str, str, dict]:
+    """Key, url and the validators to send for a cached entry, none without one"""
+    key, url = _cache_key(self, args)
+    validators = {url: get_store(self.temp_dir).get_validators(url)} if data else {}
+    return key, url, validators
+
+
+def _not_modified(self, args, key: str, url: str, data):
+    get_store(self.temp_dir).touch("images" if len(args) > 1 else "manga", key)
+    logger.info(f"Not modified: {url}")
+    return data
+
+
+def _fetch(func, args, kwargs, data):
+    """
+    Fetch and cache the result of a source method call. With a cached entry the
+    page is requested conditionally, a 304 keeps the entry without parsing it.
+    """
+    key, url, validators = _revalidation(args[0], args, data)
+    with client.revalidating(validators) as received:
+        try:
+            fetched = func(*args, **kwargs)
+        except NotModified:
+            return _not_modified(args[0], args, key, url, data)
+
+    get_store(args[0].temp_dir).save_validators(url, received.get(url, {}))
+    return _save_cache(args[0], args, fetched)
+
+
+async def _fetch_async(func, args, kwargs, data):
+    key, url, validators = _revalidation(args[0], args, data)
+    with client.revalidating(validators) as received:
+        try:
+            fetched = await func(*args, **kwargs)
+        except NotModified:
+            return _not_modified(args[0], args, key, url, data)
+
+    get_store(args[0].temp_dir).save_validators(url, received.get(url, {}))
+    return _save_cache(args[0], args, fetched)
+
+
+_flights = SingleFlight()
+
+
+def _unshared(data):
+    """A copy of a result fetched for another caller, so its chapters aren't shared"""
+    if isinstance(data, MangaInfo):
+        return MangaInfo.from_json(data.to_json())
+    return list(data) if isinstance(data, list) else data
+
+
+def _fetch_once(func, args, kwargs, data):
+    """_fetch, waiting on the fetch of the same entry instead if one is running"""
+    key = _cache_key(args[0], args)[0]
+    fetched, shared = _flights.do(key, _fetch, func, args, kwargs, data)
+    return _unshared(fetched) if shared else fetched
 
 
 # creae a check_exists decorator that will take url from the function and check if it exists in the cache
 def exists(func):
-    def wrapper(*args, **kwargs):
-        self = args[0]
-        url = self.url
-        if len(args) > 1:
-            url = args[1]
+    """
+    Cache the result of a source method by url.
+
+    Entries younger than their ttl (INFO_TTL for info, CHAPTER_TTL for chapter
+    images) are returned as is. For STALE_TTL more they are still returned, and
+    refreshed in the background, unless the call passes kwargs (a driver): those
+    are refreshed right away. Older entries, or any with refresh=True, are
+    fetched again, falling back to the cache if that fails or finds nothing.
+    Refetches are conditional requests when the page sent an ETag or Last-Modified.
+    Concurrent fetches of the same entry wait on the first one.
+    """
+
+    def wrapper(*args, refresh: bool = False, **kwargs):
+        data, age = _load_cache(args[0], args)
+        if data and not refresh:
+            if age < _ttl(data):
+                return data
+            # kwargs are lent by the caller (a selenium driver goes back to its pool
+            # once this returns), a refresh that needs them can't outlive the call
+            if age < _ttl(data) + STALE_TTL and not kwargs:
+                _in_background(_cache_key(args[0], args)[0], _fetch_once, func, args, kwargs, data)
+                return data
+
+        try:
+            fetched = _fetch_once(func, args, kwargs, data)
+        except Exception as e:
+            if not data:
+                raise
+            logger.error(f"Error refreshing {_cache_key(args[0], args)[1]}, using the cache: {e}")
+            return data
+
+        return fetched if fetched or not data else data
 
-        if url.startswith("/"):
-            url = self.url + url
+    return wrapper
 
-        parse = urlparse(url)
-        if parse.query:
-            url = url.replace(parse.query, "")
 
-        path = _info_path(self.temp_dir, url)
-        if os.path.exists(path):
-            try:
-                with open(path, "r") as f:
-                    data = json.load(f)
-                    if not data:
-                        raise Exception(f"Error loading cache from {path}")
+# same as exists, for coroutines. Stale entries are fetched again right away,
+# a background refresh could outlive the session it needs
+def async_exists(func):
+    async def wrapper(*args, refresh: bool = False, **kwargs):
+        data, age = _load_cache(args[0], args)
+        if data and not refresh and age < _ttl(data):
+            return data
 
-                    logger.info(f"Loaded info from cache: {url}: {path}")
-                    if isinstance(data, dict):
-                        return MangaInfo.from_json(data)
-                    else:
-                        return data
+        try:
+            fetched = await _fetch_async(func, args, kwargs, data)
+        except Exception as e:
+            if not data:
+                raise
+            logger.error(f"Error refreshing {_cache_key(args[0], args)[1]}, using the cache: {e}")
+            return data
 
-            except Exception as e:
-                logger.error(f"Error loading info from {path}: {e}")
-                safe_remove(path)
-        else:
-            info = False
-            data = func(*args, **kwargs)
-            if isinstance(data, MangaInfo):
-                data = data.to_json()
-                info = True
-
-            if data:
-                try:
-                    with open(path, "w") as f:
-                        json.dump(data, f)
-                except Exception as e:
-                    logger.error(f"Error saving info to {path}: {e}")
-                    safe_remove(path)
-
-            return MangaInfo.from_json(data) if info else data
+        return fetched if fetched or not data else data
 
     return wrapper
 
 
+# seconds a cached search is fresh, stale ones are returned and refreshed in the background
+SEARCH_TTL = int(os.environ.get("SEARCH_TTL", 60 * 60))
+# seconds after which a stale search is too old to return and is waited for
+SEARCH_MAX_STALE = int(os.environ.get("SEARCH_MAX_STALE", 7 * 24 * 60 * 60))
+
+
+def normalise_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
 def static_exists(search_url):
+    """
+    Cache the results of a source's search by normalised query.
+
+    Fresh results (younger than SEARCH_TTL) are returned without going to the
+    network. Stale ones are returned too, and refreshed in the background.
+    Missing or too old results are searched live, falling back to the cache
+    when the search fails or finds nothing.
+    """
+
     def decorator_warpper(func):
-        def wrapper(query):
-            url = f"{search_url}/{query}"
-            path = _info_path(os.environ.get("TEMP_DIR", "tmp"), url)
-            results = []
+        def search(query, key) -> list:
             data = [i.to_json() for i in func(query)]
             if sum([len(i) for i in data]) > 0:
-                results = data
-                try:
-                    with open(path, "w") as f:
-                        json.dump(data, f)
-                except Exception as e:
-                    logger.error(f"Error saving info to {path}: {e}")
-                    safe_remove(path)
-            else:
-                if os.path.exists(path):
-                    try:
-                        with open(path, "r") as f:
-                            data = json.load(f)
-                            if sum([len(i) for i in data]) == 0:
-                                raise Exception(f"Error loading cache from {path}")
-                            else:
-                                results = data
-                    except Exception as e:
-                        logger.error(f"Error loading info from {path}: {e}")
-                        safe_remove(path)
-            return [MangaInfo.from_json(result) for result in results]
+                get_store().put_search(key, normalise_query(query), data)
+                catalog = get_catalog()
+                if catalog:
+                    catalog.add(data)
+            return data
+
+        def wrapper(query):
+            key = get_file_name(f"{search_url}/{normalise_query(query)}", True)
+            cached, saved = get_store().get_search(key)
+            cached = cached or []
+            age = time.time() - saved
+
+            if cached and age < SEARCH_TTL:
+                return [MangaInfo.from_json(result) for result in cached]
+
+            if cached and age < SEARCH_MAX_STALE:
+                _in_background(key, search, query, key)
+                return [MangaInfo.from_json(result) for result in cached]
+
+            try:
+                results = search(query, key)
+            except Exception as e:
+                if not cached:
+                    raise
+                logger.error(f"Error searching {query!r} in {search_url}, using the cache: {e}")
+                results = []
+
+            return [MangaInfo.from_json(result) for result in results or cached]
 
         return wrapper
 
@@ -207,14 +431,25 @@ class Chapter:
     def add_file(self, file):  # file: (url, filename)
         self._img_filenames_not_ordered.append(file)
 
+    def add_slices(self, slices: dict[str, list[str]]):  # slices: {filename: [slice_filename]}
+        # replace each split strip with its slices, keeping the reading order
+        filenames = []
+        for filename in self.img_filenames:
+            filenames.extend(slices.get(filename, [filename]))
+        self._img_filenames = filenames
+
+    def replace_files(self, duplicates: dict[str, str], dropped: set[str]):
+        # point repeated pages to their first copy and remove filler pages
+        filenames = [duplicates.get(i, i) for i in self.img_filenames]
+        self._img_filenames = [i for i in filenames if i not in dropped]
+
     def _order_qfiles_files(
         self, qfiles: list[tuple[str, str]]
     ):  # qfiles: [(original_filename, new_filename)]
-        # map original_filename to new_filename with order
-        chapter_imgs_filenames_dict = {filename: "" for filename in self.img_filenames}
-        for original_filename, new_filename in qfiles:
-            chapter_imgs_filenames_dict[original_filename] = new_filename
-        self._img_filenames = list(chapter_imgs_filenames_dict.values())
+        # map original_filename to new_filename with order, a repeated page
+        # can show up more than once in the same chapter
+        new_filenames = dict(qfiles)
+        self._img_filenames = [new_filenames.get(i, "") for i in self.img_filenames]
 
     def add_qfile(self, qfile):  # qfile: (original_filename, new_filename)
         self._qimg_filenames_not_ordered.append(qfile)
@@ -226,6 +461,10 @@ class Chapter:
         self._chapter_imgs = self.source.get_chapter_img_urls(self.url, *args, **kwargs)
         return self._chapter_imgs
 
+    async def get_chapter_imgs_async(self, session):
+        self._chapter_imgs = await self.source.get_chapter_img_urls_async(self.url, session)
+        return self._chapter_imgs
+
     def __repr__(self):
         return f"<Chapter {self.title}>"
 
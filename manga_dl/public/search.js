@@ -1,6 +1,7 @@
 let previousQuery = "";
 let searched_querys = [];
 let queryResults = {};
+let searchStream = null;
 
 const timePassed = (d1, d2) => {
   let diff = Math.abs(d1 - d2) / 1000;
@@ -47,21 +48,54 @@ function searchQuery(query) {
   document.title = "Search: " + query;
 
   $("#spinner").removeClass("d-none");
-  $.ajax({
-    url: "/api/search",
-    type: "POST",
-    contentType: "application/json",
-    data: JSON.stringify({ query: query }),
-    dataType: "json",
-    success: function (data) {
-      // add to queryResults
-      if (Object.keys(queryResults).length > 20) {
-        delete queryResults[Object.keys(queryResults)[0]];
-      }
-      queryResults[query] = data;
-      add_results(data);
-    },
+  if (!window.EventSource) {
+    $.ajax({
+      url: "/api/search",
+      type: "POST",
+      contentType: "application/json",
+      data: JSON.stringify({ query: query }),
+      dataType: "json",
+      success: function (data) {
+        cacheResults(query, data);
+        add_results(data);
+      },
+    });
+    return;
+  }
+
+  // results come in as each source finishes
+  if (searchStream) {
+    searchStream.close();
+  }
+  const data = { results: [] };
+  $("#results").html("");
+  searchStream = new EventSource("/api/search/stream?query=" + encodeURIComponent(query));
+  searchStream.onmessage = function (event) {
+    const part = JSON.parse(event.data);
+    data.results = data.results.concat(part.results);
+    append_results(part.results);
+  };
+  searchStream.addEventListener("done", function (event) {
+    searchStream.close();
+    searchStream = null;
+    const clustered = JSON.parse(event.data);
+    cacheResults(query, clustered);
+    add_results(clustered);
   });
+  searchStream.onerror = function () {
+    if (searchStream) {
+      searchStream.close();
+      searchStream = null;
+    }
+    add_results(data);
+  };
+}
+
+function cacheResults(query, data) {
+  if (Object.keys(queryResults).length > 20) {
+    delete queryResults[Object.keys(queryResults)[0]];
+  }
+  queryResults[query] = data;
 }
 
 // add results to the page
@@ -72,47 +106,62 @@ function add_results(data) {
     $("#results").html("<h3>No results found</h3>");
   } else {
     $("#results").html("");
+    append_results(results);
+  }
+}
 
-    for (let i = 0; i < results.length; i++) {
-      let result = results[i];
-
-      let last_chapter = result.last_chapter;
-      if (last_chapter.length > 15) {
-        last_chapter = last_chapter.substring(0, 15) + "...";
-      }
-
-      let last_part = `<span class="dots"></span><small>${last_chapter}</small><span class="dots"></span>`;
-      if (!last_chapter) {
-        last_part = "";
-      }
-
-      let cover_url = result.cover_url;
-      if (!cover_url) {
-        cover_url = "/public/error.png";
-      }
-
-      let html = `<div class="mt-3 manga" id="m-${result.id}">
-              <div class="d-flex justify-content-between align-items-center">
-                <div class="d-flex flex-row align-items-center">
-                <div class="d-flex flex-column showimg" style="padding-right: 10px;">
-                  <img src="${cover_url}" class="rounded" style="width: 70px; height: 100px;" />
-                </div>
-                  <div class="d-flex flex-column">
-                    <span>${result.title}</span>
-                    <div class="d-flex flex-row align-items-center time-text">
-                      <small>${result.author}</small>
-                     ${last_part}
-                    <small>${result.domain}</small>
-                    </div>
+function append_results(results) {
+  for (let i = 0; i < results.length; i++) {
+    let result = results[i];
+
+    let last_chapter = result.last_chapter;
+    if (last_chapter.length > 15) {
+      last_chapter = last_chapter.substring(0, 15) + "...";
+    }
+
+    let last_part = `<span class="dots"></span><small>${last_chapter}</small><span class="dots"></span>`;
+    if (!last_chapter) {
+      last_part = "";
+    }
+
+    let sources = "";
+    const other_sources = result.other_sources || [];
+    for (let j = 0; j < other_sources.length; j++) {
+      sources += `<span class="dots"></span><a class="source-link" href="/manga/${other_sources[j].id}"><small>${other_sources[j].domain}</small></a>`;
+    }
+
+    let cover_url = result.cover_url;
+    if (!cover_url) {
+      cover_url = "/public/error.png";
+    }
+
+    let html = `<div class="mt-3 manga" id="m-${result.id}">
+            <div class="d-flex justify-content-between align-items-center">
+              <div class="d-flex flex-row align-items-center">
+              <div class="d-flex flex-column showimg" style="padding-right: 10px;">
+                <img src="${cover_url}" class="rounded" style="width: 70px; height: 100px;" />
+              </div>
+                <div class="d-flex flex-column">
+                  <span>${result.title}</span>
+                  <div class="d-flex flex-row align-items-center time-text">
+                    <small>${result.author}</small>
+                   ${last_part}
+                  <small>${result.domain}</small>
+                  ${sources}
                   </div>
                 </div>
               </div>
-            </div>`;
-      $("#results").append(html);
-    }
+            </div>
+          </div>`;
+    $("#results").append(html);
   }
 }
 
+// links to the same manga on other sources
+$(document).on("click", ".source-link", function (event) {
+  event.stopPropagation();
+});
+
 $(document).on("click", ".manga", function () {
   let id = $(this).attr("id").replace("m-", "");
   window.location.href = "/manga/" + id;
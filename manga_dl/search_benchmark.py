@@ -0,0 +1,69 @@
+"""
+Benchmark building search results as full Manga objects against SearchResult.
+
+Uses made up MangaInfo for every source, nothing goes to the network.
+
+    python search_benchmark.py -r 30 -n 100
+"""
+
+import argparse
+import timeit
+import tracemalloc
+
+from manga import Manga, SearchResult
+from manga_sources import MangaInfo, sources
+
+
+def search_infos(per_source: int) -> list[MangaInfo]:
+    infos = []
+    for source in sources:
+        for i in range(per_source):
+            url = source.id_to_url(f"{source.name}_benchmark-{i}")
+            infos.append(MangaInfo(f"Benchmark {source.name} {i}", url, last_chapter="Chapter 1"))
+    return infos
+
+
+def allocated(build, infos: list[MangaInfo]) -> int:
+    """Bytes still allocated by the results of build"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = [build(i) for i in infos]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    size = sum(i.size_diff for i in after.compare_to(before, "filename"))
+    del results
+    return size
+
+
+def benchmark(per_source: int = 10, number: int = 100) -> list[tuple[str, float, int]]:
+    """
+    Time building the results of one search of every source.
+
+    Returns
+    -------
+    list[tuple[str, float, int]]
+        (method, ms per search, bytes per search)
+    """
+    infos = search_infos(per_source)
+    methods = {
+        "Manga.from_mangainfo": Manga.from_mangainfo,
+        "SearchResult": SearchResult,
+    }
+
+    results = []
+    for method, build in methods.items():
+        seconds = timeit.timeit(lambda: [build(i) for i in infos], number=number)
+        results.append((method, seconds / number * 1000, allocated(build, infos)))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark building search results")
+    parser.add_argument("-r", "--results", type=int, default=10, help="Results per source")
+    parser.add_argument("-n", "--number", type=int, default=100, help="Searches to time")
+    args = parser.parse_args()
+
+    print(f"{len(sources) * args.results} results per search")
+    for method, ms, size in benchmark(args.results, args.number):
+        print(f"{method:25} {ms:10.3f} ms {size / 1024:10.1f} KiB")
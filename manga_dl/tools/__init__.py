@@ -1,5 +1,9 @@
 from .downloader2 import URLFile, get_file_name, Downloader
 from .create_pdf import PDFChapter, PDF
+from .create_cbz import CBZ
+from .client import HttpClient, StubBackend
+from .singleflight import SingleFlight
+from .image_utils import split_strip
 from .utils import *
 from .flask_cloudflared import run_with_cloudflared
 
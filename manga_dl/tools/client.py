@@ -0,0 +1,440 @@
+import asyncio
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Union
+from urllib.parse import urlparse
+
+import aiohttp
+import requests
+from cloudscraper import CipherSuiteAdapter, create_scraper
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from .exceptions import NotModified
+from .session import load_session, save_session, cookie_dicts, aiohttp_cookie_jar
+from .mirrors import Mirrors
+from .utils import logger
+
+
+# connections per host for async requests, and kept open per host for sync ones
+HOST_LIMIT = int(os.environ.get("HOST_LIMIT", 8))
+POOL_SIZE = int(os.environ.get("POOL_SIZE", 32))
+
+# (validators to send by url, validators received by url) of the running revalidation
+_revalidation: ContextVar[Union[tuple[dict, dict], None]] = ContextVar("revalidation", default=None)
+
+
+def response_validators(headers) -> dict:
+    """ETag and Last-Modified of a response, to revalidate it later"""
+    validators = {}
+    if headers.get("ETag"):
+        validators["etag"] = headers["ETag"]
+    if headers.get("Last-Modified"):
+        validators["last_modified"] = headers["Last-Modified"]
+    return validators
+
+
+def conditional_headers(validators: dict) -> dict:
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def pooled_adapter(adapter: HTTPAdapter) -> HTTPAdapter:
+    """
+    A copy of a mounted adapter that keeps POOL_SIZE connections per host.
+    The scraper's https adapter carries its TLS fingerprint, the copy keeps it.
+    """
+    kwargs = {"pool_connections": POOL_SIZE, "pool_maxsize": POOL_SIZE, "max_retries": adapter.max_retries}
+    if isinstance(adapter, CipherSuiteAdapter):
+        return CipherSuiteAdapter(
+            ssl_context=adapter.ssl_context,
+            cipherSuite=adapter.cipherSuite,
+            source_address=adapter.source_address,
+            server_hostname=adapter.server_hostname,
+            ecdhCurve=adapter.ecdhCurve,
+            **kwargs,
+        )
+    return HTTPAdapter(**kwargs)
+
+
+class RequestsBackend:
+    """Sends sync requests through a requests session and async ones through aiohttp."""
+
+    def __init__(self, session: requests.Session):
+        self.session = session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.session.request(method, url, **kwargs)
+
+    async def text(
+        self, session: aiohttp.ClientSession, url: str, **kwargs
+    ) -> tuple[int, str, dict]:
+        async with session.get(url, **kwargs) as res:
+            return res.status, await res.text(), dict(res.headers)
+
+    async def stream(
+        self, session: aiohttp.ClientSession, url: str, chunk_size: int, response: dict, **kwargs
+    ):
+        """Yields the body in chunks, response gets the status and headers"""
+        async with session.get(url, **kwargs) as res:
+            response["status"] = res.status
+            response["headers"] = dict(res.headers)
+            if res.status == 304:
+                return
+            res.raise_for_status()
+            async for chunk in res.content.iter_chunked(chunk_size):
+                yield chunk
+
+
+class StubBackend:
+    """
+    Answers from a dict instead of the network, for tests.
+
+    >>> stub = StubBackend({"https://manganato.com/": "<html></html>"})
+    >>> client = HttpClient(backend=stub)
+    >>> client.get("https://manganato.com/").text
+    '<html></html>'
+    >>> stub.requests
+    [('GET', 'https://manganato.com/')]
+    """
+
+    def __init__(self, responses: Union[dict, None] = None):
+        self.responses: dict[str, tuple[int, bytes, dict]] = {}
+        self.requests: list[tuple[str, str]] = []
+        for url, body in (responses or {}).items():
+            self.add(url, body)
+
+    def add(self, url: str, body: Union[str, bytes], status: int = 200, headers: Union[dict, None] = None):
+        if isinstance(body, str):
+            body = body.encode()
+        self.responses[url] = (status, body, headers or {})
+
+    def _respond(self, method: str, url: str, headers: Union[dict, None] = None) -> tuple[int, bytes, dict]:
+        self.requests.append((method, url))
+        status, body, res_headers = self.responses.get(url, (404, b"", {}))
+
+        # answers conditional requests like a server would
+        etag = res_headers.get("ETag")
+        if status == 200 and etag and (headers or {}).get("If-None-Match") == etag:
+            return 304, b"", res_headers
+        return status, body, res_headers
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        status, body, headers = self._respond(method, url, kwargs.get("headers"))
+        res = requests.Response()
+        res.status_code = status
+        res.reason = "OK" if status < 400 else "Stub Error"
+        res._content = body
+        res._content_consumed = True
+        res.url = url
+        res.headers = CaseInsensitiveDict(headers)
+        res.encoding = "utf-8"
+        res.request = requests.Request(method, url).prepare()
+        return res
+
+    async def text(self, session, url: str, **kwargs) -> tuple[int, str, dict]:
+        status, body, headers = self._respond("GET", url, kwargs.get("headers"))
+        return status, body.decode(), headers
+
+    async def stream(self, session, url: str, chunk_size: int, response: dict, **kwargs):
+        status, body, headers = self._respond("GET", url, kwargs.get("headers"))
+        response["status"] = status
+        response["headers"] = headers
+        if status == 304:
+            return
+        if status >= 400:
+            raise requests.HTTPError(f"{status} Error for url: {url}")
+        for i in range(0, len(body), chunk_size):
+            yield body[i : i + chunk_size]
+
+
+class HttpClient:
+    """
+    The one transport for pages, covers and images. Every request goes out
+    with the same browser headers and cookie jar over pooled connections,
+    and is reported to the hooks.
+
+    Methods:
+        get(url: str, **kwargs) / post(url: str, **kwargs) Sync requests, like requests.
+
+        request_headers(headers: dict) The client's headers updated with headers.
+
+        async_session(headers: dict) aiohttp session with the client's headers and cookies.
+
+        async_text(session, url: str) Page text, solving the challenge with the scraper if needed.
+
+        async_stream(session, url: str) Response body in chunks.
+
+        add_hook(hook: Callable[[dict], None]) Call hook with every request's event.
+
+        add_mirrors(mirrors: Mirrors) Route the requests of a site to its best mirror.
+
+        revalidating(validators: dict) Make the requests to the urls of validators conditional.
+
+    """
+
+    def __init__(
+        self,
+        session: Union[requests.Session, None] = None,
+        backend: Union[RequestsBackend, StubBackend, None] = None,
+        persist: bool = False,
+    ):
+        # the session is built on first use, importing the client costs nothing
+        self._session = session
+        self._backend = backend
+        # restore the saved cookies and user agent, and save them as they change
+        self.persist = persist
+        self.hooks: list[Callable[[dict], None]] = []
+        self.mirrors: list[Mirrors] = []
+        # per host: requests, errors, bytes, seconds
+        self.metrics: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self) -> requests.Session:
+        session = create_scraper(
+            browser={"browser": "firefox", "platform": "windows", "mobile": False}
+        )
+        # keep more connections around, pages and images are fetched from many threads
+        for prefix, adapter in list(session.adapters.items()):
+            session.mount(prefix, pooled_adapter(adapter))
+
+        if self.persist:
+            # reuse the clearance of the last run instead of solving the challenge again
+            load_session(session)
+
+            def save_cookies(res, *args, **kwargs):
+                if res.cookies:
+                    save_session(session)
+
+            session.hooks["response"].append(save_cookies)
+            atexit.register(save_session, session)
+        return session
+
+    @property
+    def backend(self) -> Union[RequestsBackend, StubBackend]:
+        if self._backend is None:
+            self._backend = RequestsBackend(self.session)
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend: Union[RequestsBackend, StubBackend]):
+        self._backend = backend
+
+    @property
+    def headers(self):
+        return self.session.headers
+
+    @property
+    def cookies(self):
+        return self.session.cookies
+
+    def request_headers(self, headers: Union[dict, None] = None) -> dict:
+        return {**self.session.headers, **(headers or {})}
+
+    def add_hook(self, hook: Callable[[dict], None]):
+        self.hooks.append(hook)
+
+    def add_mirrors(self, mirrors: Mirrors):
+        """Send the requests to any of the mirrors' domains to the best one"""
+        mirrors.probe_func = self._probe
+        self.mirrors.append(mirrors)
+
+    def mirrors_for(self, url: str) -> Union[Mirrors, None]:
+        host = urlparse(url).netloc
+        for mirrors in self.mirrors:
+            if host in mirrors:
+                return mirrors
+        return None
+
+    def _probe(self, domain: str) -> bool:
+        try:
+            res = self.get(f"https://{domain}/", rewrite=False, timeout=10)
+            return res.status_code < 500
+        except Exception:
+            return False
+
+    def _report(self, method: str, url: str, status: int, started: float, size: int, error=None):
+        seconds = time.perf_counter() - started
+        mirrors = self.mirrors_for(url)
+        if mirrors:
+            mirrors.record(url, seconds, error is None and status < 500)
+
+        event = {
+            "method": method,
+            "url": url,
+            "status": status,
+            "bytes": size,
+            "seconds": seconds,
+            "error": error,
+        }
+
+        host = urlparse(url).netloc
+        with self._lock:
+            metrics = self.metrics.setdefault(
+                host, {"requests": 0, "errors": 0, "bytes": 0, "seconds": 0.0}
+            )
+            metrics["requests"] += 1
+            metrics["bytes"] += size
+            metrics["seconds"] += event["seconds"]
+            if error or status >= 400:
+                metrics["errors"] += 1
+
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                logger.error(f"Error in request hook {hook}: {e}")
+
+    @contextmanager
+    def revalidating(self, validators: dict[str, dict]) -> Iterator[dict[str, dict]]:
+        """
+        Within the block, requests to the urls of validators are sent with
+        If-None-Match / If-Modified-Since, and raise NotModified on a 304.
+        Yields the validators of every response received, by url.
+
+            with client.revalidating({url: store.get_validators(url)}) as received:
+                page = client.get(url).text
+            store.save_validators(url, received.get(url, {}))
+        """
+        received: dict[str, dict] = {}
+        token = _revalidation.set((validators, received))
+        try:
+            yield received
+        finally:
+            _revalidation.reset(token)
+
+    def _conditional(self, url: str, kwargs: dict) -> bool:
+        """Add the validators of url to the request's headers, True if there are any"""
+        revalidation = _revalidation.get()
+        headers = conditional_headers(revalidation[0].get(url) or {}) if revalidation else {}
+        if headers:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), **headers}
+        return bool(headers)
+
+    def _validated(self, url: str, status: int, headers, conditional: bool):
+        """Keep the validators of a response, NotModified if it was a 304"""
+        revalidation = _revalidation.get()
+        if revalidation and status < 400:
+            validators = response_validators(headers)
+            if validators:
+                revalidation[1][url] = validators
+        if conditional and status == 304:
+            raise NotModified(url)
+
+    def request(self, method: str, url: str, rewrite: bool = True, **kwargs) -> requests.Response:
+        conditional = self._conditional(url, kwargs)
+        mirrors = self.mirrors_for(url) if rewrite else None
+        # a failed mirror gets one retry on the next best one
+        tried: tuple = ()
+        while True:
+            target = mirrors.rewrite(url, tried) if mirrors else url
+            tried += (urlparse(target).netloc,)
+            retry = mirrors is not None and len(tried) < min(2, len(mirrors.domains))
+
+            started = time.perf_counter()
+            try:
+                res = self.backend.request(method, target, **kwargs)
+            except Exception as e:
+                self._report(method, target, 0, started, 0, e)
+                if retry:
+                    continue
+                raise
+
+            size = 0 if kwargs.get("stream") else len(res.content)
+            self._report(method, target, res.status_code, started, size)
+            if res.status_code >= 500 and retry:
+                continue
+            self._validated(url, res.status_code, res.headers, conditional)
+            return res
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def async_session(self, headers: Union[dict, None] = None, **kwargs) -> aiohttp.ClientSession:
+        """
+        aiohttp session that passes as the client: same headers and cookies,
+        at most HOST_LIMIT connections per host. Must be created inside a running loop.
+        """
+        jar = aiohttp_cookie_jar(cookie_dicts(self.session.cookies))
+        connector = aiohttp.TCPConnector(limit_per_host=HOST_LIMIT)
+        return aiohttp.ClientSession(
+            headers=self.request_headers(headers),
+            cookie_jar=jar,
+            connector=connector,
+            **kwargs,
+        )
+
+    def rewrite(self, url: str) -> str:
+        mirrors = self.mirrors_for(url)
+        return mirrors.rewrite(url) if mirrors else url
+
+    async def async_text(self, session: aiohttp.ClientSession, url: str, **kwargs) -> str:
+        conditional = self._conditional(url, kwargs)
+        original, url = url, self.rewrite(url)
+        started = time.perf_counter()
+        try:
+            status, text, headers = await self.backend.text(session, url, **kwargs)
+        except Exception as e:
+            self._report("GET", url, 0, started, 0, e)
+            raise
+        self._report("GET", url, status, started, len(text))
+        self._validated(original, status, headers, conditional)
+
+        if status in (403, 503):
+            # challenged, the scraper can solve it
+            loop = asyncio.get_running_loop()
+            res = await loop.run_in_executor(None, lambda: self.get(url, rewrite=False))
+            res.raise_for_status()
+            return res.text
+
+        if status >= 400:
+            raise requests.HTTPError(f"{status} Error for url: {url}")
+        return text
+
+    async def async_stream(
+        self, session: aiohttp.ClientSession, url: str, chunk_size: int = 1024 * 1024, **kwargs
+    ):
+        conditional = self._conditional(url, kwargs)
+        original, url = url, self.rewrite(url)
+        started = time.perf_counter()
+        size = 0
+        response: dict = {}
+        try:
+            async for chunk in self.backend.stream(session, url, chunk_size, response, **kwargs):
+                size += len(chunk)
+                yield chunk
+        except Exception as e:
+            self._report("GET", url, 0, started, size, e)
+            raise
+        status = response.get("status", 200)
+        self._report("GET", url, status, started, size)
+        self._validated(original, status, response.get("headers", {}), conditional)
+
+
+client = HttpClient(persist=True)
+
+
+@atexit.register
+def save_mirrors():
+    for mirrors in client.mirrors:
+        mirrors.save()
@@ -0,0 +1,80 @@
+import os
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+
+class CBZ:
+    """
+    Create a CBZ (zip of images) file.
+
+    Methods:
+        set_title(title: str) Set the title of the CBZ.
+
+        set_author(author: str) Set the author of the CBZ.
+
+        set_cover(cover_image: str) Set the cover of the CBZ.
+
+        set_description(description: str) Set the summary in ComicInfo.xml.
+
+        add_chapter(title: str, images: list[str]) Add a chapter.
+
+        write(output_path: str) Write the CBZ to the specified path.
+
+    """
+
+    def __init__(self):
+        self.title: str = None  # type: ignore
+        self.author: str = None  # type: ignore
+        self.cover_image: str = None  # type: ignore
+        self.description = ""
+        self.chapters: list[tuple[str, list[str]]] = []
+
+    def set_title(self, title):
+        self.title = title
+
+    def set_author(self, author):
+        self.author = author
+
+    def set_cover(self, cover_image):
+        self.cover_image = cover_image
+
+    def set_description(self, description):
+        self.description = description
+
+    def add_chapter(self, title: str, images: list[str]):
+        self.chapters.append((title, images))
+
+    def _safe_filename(self, filename):
+        return re.sub(r"[^a-zA-Z0-9]", "_", filename)
+
+    def comic_info(self) -> str:
+        pages = sum(len(images) for _, images in self.chapters)
+        return f"""<?xml version="1.0" encoding="utf-8"?>
+<ComicInfo xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <Title>{escape(self.title or "")}</Title>
+  <Series>{escape(self.title or "")}</Series>
+  <Writer>{escape(self.author or "")}</Writer>
+  <Summary>{escape(self.description or "")}</Summary>
+  <PageCount>{pages}</PageCount>
+  <Manga>Yes</Manga>
+</ComicInfo>
+"""
+
+    def write(self, save_path):
+        if self.title is None or self.author is None:
+            raise Exception("Title and Author must be set")
+
+        # images are already compressed, so they are stored as they are
+        with zipfile.ZipFile(save_path, "w", zipfile.ZIP_STORED) as zf:
+            if self.cover_image:
+                _, ext = os.path.splitext(self.cover_image)
+                zf.write(self.cover_image, f"0000_cover{ext or '.jpg'}")
+
+            for i, (title, images) in enumerate(self.chapters, start=1):
+                folder = f"{i:04d}_{self._safe_filename(title)}"
+                for j, image in enumerate(images, start=1):
+                    _, ext = os.path.splitext(image)
+                    zf.write(image, f"{folder}/{j:04d}{ext}")
+
+            zf.writestr("ComicInfo.xml", self.comic_info())
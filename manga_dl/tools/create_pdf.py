@@ -1,5 +1,7 @@
 import io
 from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import IndirectObject, NameObject
+import hashlib
 import datetime
 import os
 import img2pdf
@@ -12,9 +14,14 @@ from reportlab.lib.units import inch
 from reportlab.platypus import Paragraph
 import json
 import os
+import logging
 from PIL import Image
 
 
+logger_name = os.environ.get("LOGGER_NAME", "manga")
+logger = logging.getLogger(logger_name)
+
+
 class PDFChapter:
     def __init__(self, title:str, imgs:list[str]):
         """
@@ -137,7 +144,7 @@ class PDF:
         write_pdf(output_path: str) Write the PDF to the specified path.
         
     """
-    def __init__(self):
+    def __init__(self, dedup: bool = False):
         self.title: str = None # type: ignore
         self.author = None # type: ignore
         self.cover_page: io.BytesIO = None # type: ignore
@@ -147,6 +154,8 @@ class PDF:
         self.toc: io.BytesIO = None # type: ignore
         self.intro: io.BytesIO = None # type: ignore
         self.size = 0
+        # embed the images repeated across chapters once
+        self.dedup = dedup
 
     def set_title(self, title):
         self.title = title
@@ -250,6 +259,45 @@ class PDF:
         packet.seek(0)
         self.intro = packet
 
+    def _dedup_images(self, writer: PdfWriter) -> PdfWriter:
+        """
+        Every chapter is converted on its own, so a page repeated in many
+        chapters is embedded many times. Point all the repeated image
+        XObjects to the first copy, then copy the pages to a new writer,
+        which only takes the objects still in use.
+        """
+        first: dict[str, IndirectObject] = {}
+        repeated = 0
+        for page in writer.pages:
+            resources = page.get("/Resources")
+            xobjects = resources.get_object().get("/XObject") if resources else None
+            if xobjects is None:
+                continue
+            xobjects = xobjects.get_object()
+
+            for name, ref in list(xobjects.items()):
+                if not isinstance(ref, IndirectObject):
+                    continue
+                obj = ref.get_object()
+                if obj.get("/Subtype") != "/Image":
+                    continue
+
+                key = hashlib.md5(obj.get_data()).hexdigest()
+                if key not in first:
+                    first[key] = ref
+                elif first[key].idnum != ref.idnum:
+                    xobjects[NameObject(name)] = first[key]
+                    repeated += 1
+
+        if not repeated:
+            return writer
+
+        deduped = PdfWriter()
+        for page in writer.pages:
+            deduped.add_page(page)
+        logger.info(f"Embedded {repeated} repeated images once")
+        return deduped
+
     def write(self, save_path):
         self._create_temp_dir()
         
@@ -267,6 +315,12 @@ class PDF:
         for chapter in self.chapters:
             merger.append(chapter.packet)
 
+        if self.dedup:
+            try:
+                merger = self._dedup_images(merger)
+            except Exception as e:
+                logger.error(f"Error removing repeated images from pdf: {e}")
+
         if self.title is None or self.author is None:
             raise Exception("Title and Author must be set")
 
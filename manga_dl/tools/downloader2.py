@@ -1,14 +1,12 @@
 import os
-import shutil
 import re
 import json
 import logging
 from multiprocessing import Manager
 import hashlib
 import aiofiles
-import requests
-from fake_headers import Headers
 import time
+from uuid import uuid4
 from .utils import (
     create_failure_image,
     compress_file_path,
@@ -20,6 +18,9 @@ from .utils import (
     share_progress_bar,
 )
 from .models import URLFile
+from .client import client
+from .exceptions import NotModified
+from .singleflight import SingleFlight
 import asyncio
 import aiohttp
 
@@ -31,8 +32,26 @@ if platform.system() == "Windows":
 logger_name = os.environ.get("LOGGER_NAME", "manga")
 logger = logging.getLogger(logger_name)
 
+# seconds before a downloaded image is revalidated, when its validators are known
+IMAGE_TTL = int(os.environ.get("IMAGE_TTL", 30 * 24 * 60 * 60))
+
+
+def stale_validators(validators, filepath: str, url: str) -> dict:
+    """Validators to revalidate a downloaded image with, {} if it is fresh or has none"""
+    if validators is None or time.time() - os.path.getmtime(filepath) < IMAGE_TTL:
+        return {}
+    return validators.get_validators(url)
+
+
+def tmp_file_path(filepath: str) -> str:
+    """A .tmp path to download filepath to, unique to this download"""
+    return f"{filepath}.{os.getpid()}-{uuid4().hex[:8]}.tmp"
+
 
 class Downloader:
+    # download_one calls in flight, by destination file
+    _flights = SingleFlight()
+
     def __init__(
         self,
         urls,
@@ -40,9 +59,12 @@ class Downloader:
         download_dir=None,
         check_exists=True,
         jpg_compress=True,
+        validators=None,
     ):
         self.urls = urls
-        self.headers = headers or Headers().generate()
+        self.headers = headers or {}
+        # get_validators(url) / save_validators(url, validators), to revalidate downloaded images
+        self.validators = validators
         self.download_dir = download_dir or os.path.join(os.getcwd(), "tmp")
         if not os.path.exists(self.download_dir):
             os.mkdir(self.download_dir)
@@ -51,6 +73,8 @@ class Downloader:
         self.failed_urls = Manager().list()
         self.current_progress = 0
         self.total_urls = len(urls)
+        # .tmp files of this downloader, the download dir is shared with others
+        self.tmp_files: set[str] = set()
 
     @staticmethod
     def is_file(url):
@@ -70,6 +94,7 @@ class Downloader:
 
         # print("Downloading", url, filepath)
 
+        raw_filepath = filepath
         cmp_filepath = compress_file_path(filepath)
         isCompressed = False
         isFileExists = False
@@ -81,28 +106,42 @@ class Downloader:
             filepath = cmp_filepath
             isCompressed = True
 
+        sent = stale_validators(self.validators, filepath, url) if isFileExists else {}
+
         failed = False
-        if not isFileExists:
-            tmp_path = filepath + ".tmp"
+        if not isFileExists or sent:
+            tmp_path = tmp_file_path(raw_filepath)
+            self.tmp_files.add(tmp_path)
             try:
                 timeout = aiohttp.ClientTimeout(
                     total=auto_scaled_divide(self.total_urls)
                 )
-                async with session.get(url, timeout=timeout) as response:
+                with client.revalidating({url: sent}) as received:
                     async with aiofiles.open(tmp_path, mode="wb") as f:
-                        async for chunk in response.content.iter_chunked(1024 * 1024):
+                        async for chunk in client.async_stream(session, url, timeout=timeout):
                             if chunk:
                                 await f.write(chunk)
-                shutil.move(tmp_path, filepath)
+                os.replace(tmp_path, raw_filepath)
+                filepath, isCompressed = raw_filepath, False
+                if self.validators is not None:
+                    self.validators.save_validators(url, received.get(url, {}))
+            except NotModified:
+                safe_remove(tmp_path)
+                os.utime(filepath)
             except Exception as e:
-                logging.error(f"Failed to download {url}: {e}")
-                self.failed_urls.append(url)
-                failed = True
+                safe_remove(tmp_path)
+                if sent:
+                    logger.warning(f"Failed to revalidate {url}, keeping {filepath}: {e}")
+                else:
+                    logging.error(f"Failed to download {url}: {e}")
+                    self.failed_urls.append(url)
+                    failed = True
+            self.tmp_files.discard(tmp_path)
 
         if not isCompressed and not failed:
             compressed = jpeg_compress(filepath, cmp_filepath)
             if compressed:
-                os.remove(filepath)
+                safe_remove(filepath)
                 filepath = cmp_filepath
             else:
                 logger.error(f"Failed to compress {filepath} {url}")
@@ -117,9 +156,7 @@ class Downloader:
     async def download_all(self):
         with tqdm(total=len(self.urls), desc="Downloading") as pbar:
             timeout = aiohttp.ClientTimeout(total=auto_scaled_divide(self.total_urls))
-            async with aiohttp.ClientSession(
-                headers=self.headers, timeout=timeout
-            ) as session:
+            async with client.async_session(self.headers, timeout=timeout) as session:
                 tasks = []
                 for url in self.urls:
                     task = asyncio.create_task(self.download_file(session, url, pbar))
@@ -127,7 +164,11 @@ class Downloader:
                 await asyncio.gather(*tasks)
 
     @staticmethod
-    def download_one(url, headers, download_dir) -> URLFile:
+    def download_one(url, headers, download_dir, validators=None) -> URLFile:
+        """
+        Download one image, compressed. Concurrent calls for the same image
+        wait for the first one and share its file.
+        """
         url = url.strip()
         if not Downloader.is_file(url):
             filename = get_file_name(url)
@@ -135,6 +176,14 @@ class Downloader:
         else:
             filepath = url
 
+        urlfile, _ = Downloader._flights.do(
+            filepath, Downloader._download_one, url, headers, download_dir, filepath, validators
+        )
+        return urlfile
+
+    @staticmethod
+    def _download_one(url, headers, download_dir, filepath, validators=None) -> URLFile:
+        raw_filepath = filepath
         cmp_filepath = compress_file_path(filepath)
         isCompressed = False
         isFileExists = False
@@ -146,23 +195,38 @@ class Downloader:
             filepath = cmp_filepath
             isCompressed = True
 
+        sent = stale_validators(validators, filepath, url) if isFileExists else {}
+
         failed = False
-        if not isFileExists:
+        if not isFileExists or sent:
+            tmp_path = tmp_file_path(raw_filepath)
             try:
-                response = requests.get(url, headers=headers)
-                with open(filepath, "wb") as f:
+                with client.revalidating({url: sent}) as received:
+                    response = client.get(url, headers=headers, stream=True)
+                response.raise_for_status()
+                with open(tmp_path, "wb") as f:
                     for chunk in response.iter_content(chunk_size=1024 * 1024):
                         if chunk:
                             f.write(chunk)
+                os.replace(tmp_path, raw_filepath)
+                filepath, isCompressed = raw_filepath, False
+                if validators is not None:
+                    validators.save_validators(url, received.get(url, {}))
 
+            except NotModified:
+                os.utime(filepath)
             except Exception as e:
-                logging.error(f"Failed to download {url}: {e}")
-                failed = True
+                safe_remove(tmp_path)
+                if sent:
+                    logger.warning(f"Failed to revalidate {url}, keeping {filepath}: {e}")
+                else:
+                    logging.error(f"Failed to download {url}: {e}")
+                    failed = True
 
         if not isCompressed and not failed:
             compressed = jpeg_compress(filepath, cmp_filepath)
             if compressed:
-                os.remove(filepath)
+                safe_remove(filepath)
                 filepath = cmp_filepath
             else:
                 logger.error(f"Failed to compress {filepath} {url}")
@@ -177,9 +241,9 @@ class Downloader:
             return URLFile(url, filepath)
 
     def delete_tmp_files(self):
-        for file in os.listdir(self.download_dir):
-            if file.endswith(".tmp"):
-                safe_remove(os.path.join(self.download_dir, file))
+        for path in list(self.tmp_files):
+            safe_remove(path)
+        self.tmp_files.clear()
 
     def download(self) -> tuple[list[URLFile], list[str]]:
         try:
@@ -11,3 +11,8 @@ class SourceNotFound(Exception):
 
 class InvalidMangaUrl(Exception):
     pass
+
+
+class NotModified(Exception):
+    """A conditional request found the cached copy still current (304)"""
+    pass
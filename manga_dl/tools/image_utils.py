@@ -0,0 +1,582 @@
+import io
+import os
+import logging
+
+from typing import Union
+
+import numpy as np
+from PIL import Image, JpegImagePlugin, features
+
+try:
+    # optional, lossless jpeg crops without decoding the pixels
+    from turbojpeg import TurboJPEG
+
+    turbojpeg = TurboJPEG()
+except Exception:
+    turbojpeg = None
+
+
+logger_name = os.environ.get("LOGGER_NAME", "manga")
+logger = logging.getLogger(logger_name)
+
+
+# a page taller than STRIP_RATIO * width is treated as a long strip (webtoon)
+STRIP_RATIO = float(os.environ.get("STRIP_RATIO", "3"))
+# height of a slice cut from a strip, relative to the strip width
+PAGE_RATIO = float(os.environ.get("PAGE_RATIO", "1.5"))
+# max (max - min) brightness of a row that still counts as a gutter
+GUTTER_TOLERANCE = 12
+# lossless jpeg crops start on an MCU row, at most 16 pixels high
+MCU_HEIGHT = 16
+
+_fallback_logged = False
+
+
+def _log_decoded_fallback():
+    """Say once per run that jpeg strips are decoded to be cut, and how to avoid it"""
+    global _fallback_logged
+    if not _fallback_logged:
+        _fallback_logged = True
+        logger.info(
+            "PyTurboJPEG is not installed, jpeg strips are decoded to be cut "
+            "(pip install RapidMangaDL[turbojpeg] cuts them losslessly)"
+        )
+
+
+def slice_path(path: str, index: int) -> str:
+    name, ext = os.path.splitext(path)
+    return f"{name}_s{index}{ext}"
+
+
+def is_strip(size: tuple[int, int], ratio: float = STRIP_RATIO) -> bool:
+    w, h = size
+    return w > 0 and h > w * ratio
+
+
+def _row_profile(img: Image.Image) -> tuple[np.ndarray, float]:
+    """
+    Returns a boolean array telling which rows are blank (gutters) and the
+    scale between the decoded rows and the real strip height.
+
+    For JPEG strips the decoder is asked for a DCT-scaled grayscale draft, so
+    only a fraction of the strip (down to 1/64) is ever decoded here.
+    """
+    w, h = img.size
+    img.draft("L", (max(1, w // 8), max(1, h // 8)))
+    gray = img.convert("L") if img.mode != "L" else img
+    arr = np.asarray(gray)
+    blank = (arr.max(axis=1).astype(np.int16) - arr.min(axis=1)) <= GUTTER_TOLERANCE
+    return blank, h / arr.shape[0]
+
+
+def find_cuts(
+    blank: np.ndarray, scale: float, height: int, page_height: int, align: int = 1
+) -> list[int]:
+    """
+    Find the rows (in strip coordinates) where the strip should be cut.
+    A cut is placed on the lowest gutter inside the second half of a page,
+    or at exactly one page height when there is no gutter to cut on.
+    Cuts are moved up to a multiple of align.
+    """
+    cuts = [0]
+    y = 0
+    while height - y > page_height:
+        lo = int((y + page_height // 2) / scale)
+        hi = int((y + page_height) / scale)
+        gutters = np.flatnonzero(blank[lo:hi])
+        if gutters.size:
+            cut = int((lo + gutters[-1]) * scale)
+        else:
+            cut = y + page_height
+
+        cut -= cut % align
+        if cut <= y:
+            cut = y + align
+        cut = min(cut, height)
+        cuts.append(cut)
+        y = cut
+
+    cuts.append(height)
+    return cuts
+
+
+def _remove(paths: list[str]):
+    for p in paths:
+        if os.path.exists(p):
+            os.remove(p)
+
+
+def _crop_lossless(path: str, w: int, cuts: list[int]) -> list[bytes]:
+    """
+    Cut a jpeg strip with turbojpeg, moving the compressed blocks without
+    decoding the pixels. Every cut but the last must be a multiple of MCU_HEIGHT.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    regions = [(0, top, w, bottom - top) for top, bottom in zip(cuts, cuts[1:])]
+    return turbojpeg.crop_multiple(data, regions)  # type: ignore
+
+
+def _crop_decoded(img: Image.Image, w: int, cuts: list[int]):
+    """
+    Cut a decoded strip, yielding each slice with the options to save it at
+    the source quality: jpeg slices reuse the strip's quantization tables and
+    subsampling, other formats are saved lossless.
+    """
+    options: dict = {}
+    if img.format == "JPEG":
+        options = {"qtables": img.quantization}
+        sampling = JpegImagePlugin.get_sampling(img)
+        if sampling != -1:
+            options["subsampling"] = sampling
+    elif img.format == "WEBP":
+        options = {"lossless": True}
+
+    for top, bottom in zip(cuts, cuts[1:]):
+        page = img.crop((0, top, w, bottom))
+        if page.mode not in ("RGB", "L"):
+            page = page.convert("RGB")
+        yield page, options
+
+
+def split_strip(path: str, page_ratio: float = PAGE_RATIO) -> list[str]:
+    """
+    Split a long strip into page-height slices cut at whitespace gutters.
+
+    Returns the slice paths in reading order, or [path] when the image is not
+    a strip. Slices are cached next to the strip as <name>_s<index><ext>.
+
+    Gutters are searched on a reduced draft decode. With PyTurboJPEG installed
+    jpeg strips are then cut losslessly on MCU rows, their pixels are never
+    decoded at full size. Otherwise (or for other formats) the strip is decoded
+    once to crop it, and the slices keep the source quality.
+    """
+    first = slice_path(path, 0)
+    if os.path.exists(first):
+        paths = []
+        i = 0
+        while os.path.exists(slice_path(path, i)):
+            paths.append(slice_path(path, i))
+            i += 1
+        return paths
+
+    try:
+        # Image.open only reads the header, nothing is decoded yet
+        with Image.open(path) as img:
+            if not is_strip(img.size):
+                return [path]
+            w, h = img.size
+            fmt = img.format
+            blank, scale = _row_profile(img)
+    except Exception as e:
+        logger.error(f"Error reading strip {path}: {e}")
+        return [path]
+
+    page_height = max(1, int(w * page_ratio))
+    lossless = turbojpeg is not None and fmt == "JPEG"
+    if fmt == "JPEG" and turbojpeg is None:
+        _log_decoded_fallback()
+    cuts = find_cuts(blank, scale, h, page_height, MCU_HEIGHT if lossless else 1)
+
+    paths = []
+    try:
+        if lossless:
+            try:
+                for i, data in enumerate(_crop_lossless(path, w, cuts)):
+                    tmp_path = slice_path(path, i) + ".tmp"
+                    paths.append(tmp_path)
+                    with open(tmp_path, "wb") as f:
+                        f.write(data)
+            except Exception as e:
+                logger.warning(f"Lossless crop of {path} failed, decoding it: {e}")
+                _remove(paths)
+                paths = []
+                lossless = False
+
+        if not lossless:
+            with Image.open(path) as img:
+                for i, (page, options) in enumerate(_crop_decoded(img, w, cuts)):
+                    tmp_path = slice_path(path, i) + ".tmp"
+                    paths.append(tmp_path)
+                    page.save(tmp_path, format=fmt or "PNG", **options)
+                    page.close()
+    except Exception as e:
+        logger.error(f"Error splitting strip {path}: {e}")
+        _remove(paths)
+        return [path]
+
+    # slices are moved in place only when the whole strip was split, so a
+    # cached _s0 always means a complete set of slices
+    for i, tmp_path in enumerate(paths):
+        os.replace(tmp_path, slice_path(path, i))
+
+    return [slice_path(path, i) for i in range(len(paths))]
+
+
+def ssim(a: np.ndarray, b: np.ndarray, block: int = 8) -> float:
+    """
+    Mean SSIM of two grayscale images over non overlapping blocks.
+    """
+    h = min(a.shape[0], b.shape[0]) // block * block
+    w = min(a.shape[1], b.shape[1]) // block * block
+    if h == 0 or w == 0:
+        return 1.0
+
+    a = a[:h, :w].astype(np.float64).reshape(h // block, block, w // block, block)
+    b = b[:h, :w].astype(np.float64).reshape(h // block, block, w // block, block)
+
+    mu_a = a.mean(axis=(1, 3))
+    mu_b = b.mean(axis=(1, 3))
+    var_a = a.var(axis=(1, 3))
+    var_b = b.var(axis=(1, 3))
+    cov = (
+        (a - mu_a[:, None, :, None]) * (b - mu_b[:, None, :, None])
+    ).mean(axis=(1, 3))
+
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+    s = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / (
+        (mu_a**2 + mu_b**2 + c1) * (var_a + var_b + c2)
+    )
+    return float(s.mean())
+
+
+def fit_quality(
+    path: str,
+    qpath: str,
+    budget: int,
+    min_ssim: Union[float, None] = None,
+    min_quality: int = 10,
+    max_quality: int = 95,
+    fmt: str = "jpeg",
+) -> tuple[int, int]:
+    """
+    Save path as fmt at qpath with the highest quality that fits in
+    budget bytes. If that quality is below min_ssim the lowest quality that
+    reaches min_ssim is used instead, even if it is over budget.
+
+    Runs in worker processes, so it only takes and returns plain values.
+    Returns (quality, size).
+    """
+    if os.path.exists(qpath):
+        return -1, os.path.getsize(qpath)
+
+    load_encoder(fmt)
+    img = Image.open(path)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    encoded: dict[int, bytes] = {}
+
+    def encode(quality: int) -> bytes:
+        if quality not in encoded:
+            buf = io.BytesIO()
+            img.save(buf, format=fmt.upper(), **ENCODERS[fmt], quality=quality)
+            encoded[quality] = buf.getvalue()
+        return encoded[quality]
+
+    def score(quality: int) -> float:
+        with Image.open(io.BytesIO(encode(quality))) as enc:
+            return ssim(reference, np.asarray(enc.convert("L")))
+
+    best = min_quality
+    lo, hi = min_quality, max_quality
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if len(encode(mid)) <= budget:
+            best = mid
+            lo = mid + 1
+        else:
+            hi = mid - 1
+
+    if min_ssim:
+        reference = np.asarray(img.convert("L"))
+        if score(best) < min_ssim:
+            found = max_quality
+            lo, hi = best + 1, max_quality
+            while lo <= hi:
+                mid = (lo + hi) // 2
+                if score(mid) >= min_ssim:
+                    found = mid
+                    hi = mid - 1
+                else:
+                    lo = mid + 1
+            best = found
+
+    data = encode(best)
+    img.close()
+    with open(qpath, "wb") as f:
+        f.write(data)
+
+    return best, len(data)
+
+
+MEDIA_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".avif": "image/avif",
+}
+
+# page encoders: format -> extra save options
+ENCODERS = {
+    "jpeg": {"optimize": True},
+    "webp": {"method": 6},
+    "avif": {"speed": 6},
+}
+
+EXTENSIONS = {
+    "jpeg": ".jpg",
+    "webp": ".webp",
+    "avif": ".avif",
+}
+
+
+def media_type(filename: str) -> str:
+    _, ext = os.path.splitext(filename)
+    return MEDIA_TYPES.get(ext.lower(), "image/jpeg")
+
+
+# output profiles for e-ink readers (Kindle, Kobo)
+EINK_PROFILES = {
+    "eink": {"dither": "diffusion", "format": "png"},
+    "eink-ordered": {"dither": "ordered", "format": "png"},
+    "eink-jpeg": {"dither": "none", "format": "jpeg"},
+}
+
+EINK_LEVELS = 16  # 4-bit grayscale
+
+_BAYER_4 = np.array(
+    [
+        [0, 8, 2, 10],
+        [12, 4, 14, 6],
+        [3, 11, 1, 9],
+        [15, 7, 13, 5],
+    ]
+)
+
+
+def _gray_palette(levels: int) -> list[int]:
+    step = 255 / (levels - 1)
+    palette = []
+    for i in range(levels):
+        palette.extend([round(i * step)] * 3)
+    return palette
+
+
+def ordered_dither(gray: np.ndarray, levels: int = EINK_LEVELS) -> np.ndarray:
+    """
+    Ordered (Bayer 4x4) dithering of a grayscale array down to levels.
+    Returns the palette index of every pixel.
+    """
+    h, w = gray.shape
+    threshold = (_BAYER_4 + 0.5) / 16 - 0.5
+    threshold = np.tile(threshold, (h // 4 + 1, w // 4 + 1))[:h, :w]
+    scaled = gray.astype(np.float32) * (levels - 1) / 255
+    return np.clip(np.floor(scaled + threshold + 0.5), 0, levels - 1).astype(np.uint8)
+
+
+def to_eink(img: Image.Image, dither: str = "diffusion", levels: int = EINK_LEVELS) -> Image.Image:
+    """
+    Convert an image to a levels-color grayscale palette image.
+    """
+    gray = img.convert("L")
+    palette = _gray_palette(levels)
+
+    if dither == "ordered":
+        out = Image.fromarray(ordered_dither(np.asarray(gray), levels), "P")
+        out.putpalette(palette)
+        return out
+
+    pal_img = Image.new("P", (1, 1))
+    pal_img.putpalette(palette)
+    method = (
+        Image.Dither.FLOYDSTEINBERG if dither == "diffusion" else Image.Dither.NONE
+    )
+    return gray.convert("RGB").quantize(palette=pal_img, dither=method)
+
+
+def eink_filename(filename: str, profile: str, quality: Union[int, None] = None) -> str:
+    name, _ = os.path.splitext(filename)
+    ext = ".png" if EINK_PROFILES[profile]["format"] == "png" else ".jpg"
+    if quality:
+        name += f"_q{quality}"
+    return f"{name}_{profile}{ext}"
+
+
+def eink_convert(path: str, qpath: str, profile: str = "eink", quality: Union[int, None] = None) -> str:
+    """
+    Save path as a 4-bit grayscale page for e-ink readers, either as an
+    optimized 4-bit PNG or as a grayscale JPEG.
+    """
+    if os.path.exists(qpath):
+        return qpath
+
+    options = EINK_PROFILES[profile]
+    with Image.open(path) as img:
+        out = to_eink(img, options["dither"])
+
+    if options["format"] == "png":
+        out.save(qpath, format="PNG", optimize=True, bits=4)
+    else:
+        out.convert("L").save(qpath, format="JPEG", optimize=True, quality=quality or 85)
+    out.close()
+    return qpath
+
+
+def load_encoder(fmt: str):
+    """
+    Register the pillow-avif-plugin for avif when pillow can't save it.
+    Worker processes don't share the parent's plugins, so they call it too.
+    """
+    if fmt != "avif":
+        return
+    try:
+        if features.check("avif"):
+            return
+    except ValueError:
+        pass
+    import pillow_avif  # noqa: F401 (registers the avif plugin)
+
+
+def encoder_available(fmt: str) -> bool:
+    if fmt == "jpeg":
+        return True
+    if fmt == "webp":
+        return features.check("webp")
+    if fmt == "avif":
+        try:
+            load_encoder(fmt)
+            return True
+        except ImportError:
+            return False
+    return False
+
+
+def encoded_filename(filename: str, fmt: str = "jpeg", quality: Union[int, None] = None) -> str:
+    name, _ = os.path.splitext(filename)
+    name = f"{name}_{fmt}"
+    if quality:
+        name = f"{name}_q{quality}"
+    return f"{name}{EXTENSIONS[fmt]}"
+
+
+def encode_page(path: str, qpath: str, fmt: str = "jpeg", quality: Union[int, None] = None) -> str:
+    """
+    Re-encode a page with one of the ENCODERS. Runs in worker processes.
+    """
+    if os.path.exists(qpath):
+        return qpath
+
+    load_encoder(fmt)
+    with Image.open(path) as img:
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.save(qpath, format=fmt.upper(), quality=quality or 90, **ENCODERS[fmt])
+    return qpath
+
+
+# hamming distance (out of 64 bits) under which two pages are the same page
+HASH_THRESHOLD = int(os.environ.get("HASH_THRESHOLD", "4"))
+# max mean pixel difference (0-255) of the 16x16 thumbnails of two same pages
+THUMB_THRESHOLD = 6
+
+
+def page_signature(path: str) -> tuple[int, bytes, tuple[int, int]]:
+    """
+    Returns the 64 bit dHash of a page, a 16x16 grayscale thumbnail used to
+    confirm hash matches, and the page size.
+    """
+    with Image.open(path) as img:
+        size = img.size
+        img.draft("L", (64, 64))
+        gray = img.convert("L")
+        arr = np.asarray(gray.resize((9, 8), Image.Resampling.LANCZOS), dtype=np.int16)
+        thumb = gray.resize((16, 16), Image.Resampling.BOX).tobytes()
+
+    bits = (arr[:, 1:] > arr[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0]), thumb, size
+
+
+def parse_hash(value: Union[str, int]) -> int:
+    if isinstance(value, int):
+        return value
+    return int(value, 16)
+
+
+def format_hash(value: int) -> str:
+    return f"{value:016x}"
+
+
+def hamming(hashes: np.ndarray, value: int) -> np.ndarray:
+    """
+    Hamming distance between every hash in hashes (uint64) and value.
+    """
+    xor = np.bitwise_xor(hashes, np.uint64(value))
+    return np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def find_duplicates(
+    signatures: dict[str, tuple[int, bytes, tuple[int, int]]],
+    threshold: int = HASH_THRESHOLD,
+) -> dict[str, str]:
+    """
+    Group near-identical pages. Returns {filename: first_filename} for every
+    page that repeats an earlier one (in the order of signatures).
+    """
+    duplicates = {}
+    kept: list[str] = []
+    kept_hashes = np.zeros(0, dtype=np.uint64)
+
+    for filename, (value, thumb, size) in signatures.items():
+        if kept:
+            for i in np.flatnonzero(hamming(kept_hashes, value) <= threshold):
+                first = kept[i]
+                _, first_thumb, first_size = signatures[first]
+                if first_size != size:
+                    continue
+                diff = np.abs(
+                    np.frombuffer(thumb, np.uint8).astype(np.int16)
+                    - np.frombuffer(first_thumb, np.uint8)
+                ).mean()
+                if diff <= THUMB_THRESHOLD:
+                    duplicates[filename] = first
+                    break
+
+        if filename not in duplicates:
+            kept.append(filename)
+            kept_hashes = np.append(kept_hashes, np.uint64(value))
+
+    return duplicates
+
+
+def find_fillers(
+    signatures: dict[str, tuple[int, bytes, tuple[int, int]]],
+    fillers: list[Union[str, int]],
+    threshold: int = HASH_THRESHOLD,
+) -> set[str]:
+    """
+    Returns the pages whose hash matches one of fillers. A filler is a
+    hash (hex string or int) or the path of a filler page image.
+    """
+    values = []
+    for filler in fillers:
+        if isinstance(filler, str) and os.path.exists(filler):
+            values.append(page_signature(filler)[0])
+        else:
+            try:
+                values.append(parse_hash(filler))
+            except ValueError:
+                logger.error(f"Invalid filler page: {filler}")
+
+    if not values:
+        return set()
+
+    hashes = np.array(values, dtype=np.uint64)
+    return {
+        filename
+        for filename, (value, _, _) in signatures.items()
+        if hamming(hashes, value).min() <= threshold
+    }
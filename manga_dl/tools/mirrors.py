@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+import time
+from typing import Callable, Union
+from urllib.parse import urlparse
+
+from .utils import get_app_path, logger, safe_remove
+
+
+MIRRORS_PATH = os.path.join(get_app_path(), "mirrors.json")
+# consecutive failures before a mirror is left for another one
+FAILURE_LIMIT = int(os.environ.get("MIRROR_FAILURE_LIMIT", 3))
+# seconds before a degraded mirror is probed again, doubled on every failed probe
+PROBE_INTERVAL = int(os.environ.get("MIRROR_PROBE_INTERVAL", 30))
+MAX_PROBE_INTERVAL = 600
+# weight of the newest latency in the moving average
+LATENCY_ALPHA = 0.3
+# another mirror has to be this much faster to take over
+SWITCH_RATIO = 0.7
+
+_file_lock = threading.Lock()
+
+
+def _load_mirrors(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Error loading mirrors from {path}: {e}")
+        safe_remove(path)
+        return {}
+
+
+class Mirrors:
+    """
+    Health of the mirrors of one site.
+
+    Requests to any of the domains are sent to the best mirror: the one with
+    the lowest latency that hasn't failed FAILURE_LIMIT times in a row.
+    Degraded mirrors are probed in the background until they answer again.
+    The best mirror and the latencies are saved between runs.
+
+    Parameters
+    ----------
+    name : str
+        Key in the mirrors file
+    domains : list[str]
+        Interchangeable domains, in order of preference
+    """
+
+    def __init__(self, name: str, domains: list[str], path: str = MIRRORS_PATH):
+        self.name = name
+        self.domains = list(domains)
+        self.path = path
+        self.latency: dict[str, Union[float, None]] = {i: None for i in self.domains}
+        self.failures: dict[str, int] = {i: 0 for i in self.domains}
+        self.current = self.domains[0]
+        # set by the client, probe(domain) -> bool
+        self.probe_func: Union[Callable[[str], bool], None] = None
+
+        self._probing: set[str] = set()
+        self._lock = threading.Lock()
+
+        saved = _load_mirrors(path).get(name, {})
+        if saved.get("best") in self.domains:
+            self.current = saved["best"]
+        for domain, latency in saved.get("latency", {}).items():
+            if domain in self.latency:
+                self.latency[domain] = latency
+
+    def __contains__(self, domain: str) -> bool:
+        return domain.removeprefix("www.") in self.domains
+
+    def degraded(self, domain: str) -> bool:
+        return self.failures[domain] >= FAILURE_LIMIT
+
+    def best(self, exclude: tuple = ()) -> str:
+        candidates = [i for i in self.domains if i not in exclude and not self.degraded(i)]
+        if not candidates:
+            # everything is down, try the one that failed the least
+            candidates = [i for i in self.domains if i not in exclude] or self.domains
+            return min(candidates, key=lambda i: self.failures[i])
+
+        if self.current in candidates:
+            best = self.current
+            current = self.latency[best]
+            for domain in candidates:
+                latency = self.latency[domain]
+                if current and latency and latency < current * SWITCH_RATIO:
+                    best, current = domain, latency
+            return best
+
+        # unknown mirrors are tried in order of preference
+        known = [i for i in candidates if self.latency[i] is not None]
+        if known:
+            return min(known, key=lambda i: self.latency[i])  # type: ignore
+        return candidates[0]
+
+    def rewrite(self, url: str, exclude: tuple = ()) -> str:
+        parse = urlparse(url)
+        if parse.netloc not in self:
+            return url
+        return parse._replace(netloc=self.best(exclude)).geturl()
+
+    def record(self, url: str, seconds: float, ok: bool):
+        domain = urlparse(url).netloc.removeprefix("www.")
+        if domain not in self.failures:
+            return
+
+        with self._lock:
+            if ok:
+                self.failures[domain] = 0
+                latency = self.latency[domain]
+                self.latency[domain] = (
+                    seconds
+                    if latency is None
+                    else LATENCY_ALPHA * seconds + (1 - LATENCY_ALPHA) * latency
+                )
+            else:
+                self.failures[domain] += 1
+
+            best = self.best()
+            changed = best != self.current
+            self.current = best
+            probe = self.degraded(domain) and domain not in self._probing
+            if probe:
+                self._probing.add(domain)
+
+        if changed:
+            logger.warning(f"Switching {self.name} to {best}")
+            self.save()
+
+        if probe:
+            threading.Thread(target=self._probe, args=(domain,), daemon=True).start()
+
+    def _probe(self, domain: str):
+        interval = PROBE_INTERVAL
+        try:
+            while self.probe_func:
+                time.sleep(interval)
+                if self.probe_func(domain):
+                    logger.info(f"Mirror {domain} of {self.name} is back")
+                    return
+                interval = min(interval * 2, MAX_PROBE_INTERVAL)
+        finally:
+            with self._lock:
+                self._probing.discard(domain)
+
+    def save(self):
+        with _file_lock:
+            data = _load_mirrors(self.path)
+            data[self.name] = {"best": self.current, "latency": self.latency}
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logger.error(f"Error saving mirrors to {self.path}: {e}")
+                safe_remove(tmp_path)
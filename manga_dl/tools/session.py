@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+import time
+from http.cookies import SimpleCookie
+
+import aiohttp
+import requests
+from requests.cookies import RequestsCookieJar, create_cookie
+from yarl import URL
+
+from .utils import get_app_path, logger, safe_remove
+
+
+SESSION_PATH = os.path.join(get_app_path(), "session.json")
+# cookies without an expiry (session cookies) are kept this long, in seconds
+SESSION_TTL = int(os.environ.get("SESSION_TTL", 12 * 60 * 60))
+
+_lock = threading.Lock()
+# fingerprint of the session last saved to or loaded from each path
+_saved: dict[str, frozenset] = {}
+
+
+def cookie_dicts(jar, ttl: int = SESSION_TTL) -> list[dict]:
+    """Unexpired cookies of a requests cookie jar as dicts"""
+    now = time.time()
+    cookies = []
+    for cookie in jar:
+        expires = cookie.expires or now + ttl
+        if expires <= now:
+            continue
+
+        cookies.append(
+            {
+                "name": cookie.name,
+                "value": cookie.value,
+                "domain": cookie.domain,
+                "path": cookie.path or "/",
+                "secure": cookie.secure,
+                "expires": int(expires),
+            }
+        )
+    return cookies
+
+
+def _fingerprint(user_agent: str, cookies: list[dict]) -> frozenset:
+    """What a saved session is compared on, expiry left out"""
+    return frozenset(
+        [("User-Agent", user_agent)] + [(i["name"], i["value"], i["domain"], i["path"]) for i in cookies]
+    )
+
+
+def save_session(session: requests.Session, path: str = SESSION_PATH) -> bool:
+    """
+    Save the cookies of a session (cloudflare clearance included) and the
+    user agent they were issued to, unless they didn't change since they
+    were last saved or loaded.
+
+    Returns
+    -------
+    bool
+        True if the file was written
+    """
+    with _lock:
+        tmp_path = path + ".tmp"
+        try:
+            # copied first, other threads keep setting cookies while this runs
+            jar = session.cookies.copy()
+            user_agent = session.headers.get("User-Agent", "")
+            cookies = cookie_dicts(jar)
+            fingerprint = _fingerprint(user_agent, cookies)
+            if _saved.get(path) == fingerprint:
+                return False
+
+            with open(tmp_path, "w") as f:
+                json.dump({"user_agent": user_agent, "cookies": cookies}, f)
+            os.replace(tmp_path, path)
+            _saved[path] = fingerprint
+            return True
+        except Exception as e:
+            logger.error(f"Error saving session to {path}: {e}")
+            safe_remove(tmp_path)
+            return False
+
+
+def saved_session(path: str = SESSION_PATH) -> tuple[str, list[dict]]:
+    """User agent and unexpired cookies of the saved session"""
+    if not os.path.exists(path):
+        return "", []
+
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except Exception as e:
+        logger.error(f"Error loading session from {path}: {e}")
+        safe_remove(path)
+        return "", []
+
+    now = time.time()
+    cookies = [i for i in data.get("cookies", []) if i.get("expires", 0) > now]
+    return data.get("user_agent", ""), cookies
+
+
+def load_session(session: requests.Session, path: str = SESSION_PATH) -> bool:
+    """Put the saved cookies and user agent in a session, False if none are left"""
+    user_agent, cookies = saved_session(path)
+    if not cookies:
+        return False
+    with _lock:
+        _saved[path] = _fingerprint(user_agent, cookies)
+
+    session.cookies.update(requests_cookie_jar(cookies))
+    # the clearance is only valid for the user agent that solved it
+    if user_agent:
+        session.headers["User-Agent"] = user_agent
+
+    logger.info(f"Loaded {len(cookies)} cookies from {path}")
+    return True
+
+
+def requests_cookie_jar(cookies: list[dict]) -> RequestsCookieJar:
+    jar = RequestsCookieJar()
+    for cookie in cookies:
+        jar.set_cookie(
+            create_cookie(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie["domain"],
+                path=cookie["path"],
+                secure=cookie["secure"],
+                expires=cookie["expires"],
+            )
+        )
+    return jar
+
+
+def aiohttp_cookie_jar(cookies: list[dict]) -> aiohttp.CookieJar:
+    jar = aiohttp.CookieJar()
+    for cookie in cookies:
+        morsel = SimpleCookie()
+        morsel[cookie["name"]] = cookie["value"]
+        morsel[cookie["name"]]["domain"] = cookie["domain"]
+        morsel[cookie["name"]]["path"] = cookie["path"]
+        jar.update_cookies(morsel, URL(f"https://{cookie['domain'].lstrip('.')}/"))
+    return jar
+
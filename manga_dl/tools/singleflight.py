@@ -0,0 +1,62 @@
+import threading
+from typing import Any, Callable
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Any = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls by key: while a call for a key is running, the
+    next callers for that key wait for it and get its result (or its error)
+    instead of running their own.
+
+    Only calls in flight are shared, nothing is kept once they finish.
+
+    Methods:
+        do(key: str, func: Callable, *args, **kwargs) (result, shared), shared
+        being True for the callers that waited on another one.
+
+    >>> flight = SingleFlight()
+    >>> flight.do("key", lambda: 1)
+    (1, False)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call] = {}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key: str, func: Callable, *args, **kwargs) -> tuple[Any, bool]:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result, False
@@ -179,15 +179,19 @@ def get_file_name(url: str, check_extension: bool = False):
 
 
 def jpeg_compress(img_path, save_path):
+    # written next to save_path and moved in place, readers never see half a file
+    tmp_path = f"{save_path}.{os.getpid()}-{threading.get_ident()}.tmp"
     try:
         image = Image.open(img_path)
         if image.mode != "RGB":
             image = image.convert("RGB")
-        image.save(save_path, format="JPEG", optimize=True, quality=85)
+        image.save(tmp_path, format="JPEG", optimize=True, quality=85)
         image.close()
+        os.replace(tmp_path, save_path)
         return save_path
     except Exception as e:
         logger.error(f"Error while compressing {img_path}: {e}")
+        safe_remove(tmp_path)
         return None
 
 
@@ -207,6 +211,65 @@ def txt_split(txt, sep, split="http"):
     return [url1] + rest
 
 
+# recycle a driver after this many page loads or past this much memory (MB)
+DRIVER_MAX_USES = int(os.environ.get("DRIVER_MAX_USES", 100))
+DRIVER_MAX_RSS = int(os.environ.get("DRIVER_MAX_RSS", 1024))
+
+
+def process_tree_rss(pid: int) -> Union[int, None]:
+    """Resident memory (MB) of a process and its children, None if unknown"""
+    try:
+        import psutil
+
+        try:
+            proc = psutil.Process(pid)
+            procs = [proc] + proc.children(recursive=True)
+        except psutil.Error:
+            return None
+
+        total = 0
+        for proc in procs:
+            try:
+                total += proc.memory_info().rss
+            except psutil.Error:
+                pass
+        return total // (1024 * 1024)
+
+    except ImportError:
+        pass
+
+    if not os.path.isdir("/proc"):
+        return None
+
+    children: dict[int, list[int]] = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                # the process name can contain spaces, ppid is the 2nd field after it
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            children.setdefault(ppid, []).append(int(name))
+        except (OSError, ValueError, IndexError):
+            continue
+
+    pids = [pid]
+    for p in pids:
+        pids.extend(children.get(p, []))
+
+    total = 0
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            pass
+    return total // 1024
+
+
 class Driver(webdriver.Chrome):
     def __init__(self, options:webdriver.ChromeOptions, *args, **kwargs):
         self.options = options
@@ -214,32 +277,130 @@ class Driver(webdriver.Chrome):
         self.kwargs = kwargs
         self.running = False
         self.usable = True
+        self.uses = 0
         self._init = False
+        self._restart = False
     
     def add_option(self, option):
         self.options.add_argument(option)
     
     def remove_option(self, option):
-        self.options._arguments.remove(option) if option in self.options._arguments else None
+        if option in self.options._arguments:
+            self.options._arguments.remove(option)
+            # options only apply when chrome starts
+            self._restart = self.running
+
+    def set_capability(self, name, value):
+        if self.options.capabilities.get(name) != value:
+            self.options.set_capability(name, value)
+            self._restart = self.running
     
 
     def init(self):
         super().__init__(options=self.options, *self.args, **self.kwargs)
         self.running = True
 
-    def get(self, url):
+    def start(self):
         if not self._init:
             self.init()
             self._init = True
 
+    def get(self, url):
+        if self._restart:
+            self.quit()
+            self.running = False
+            self._init = False
+            self._restart = False
+        self.start()
+        self.uses += 1
         super().get(url)
 
+    def rss(self) -> Union[int, None]:
+        """Memory used by chromedriver and its chrome processes in MB"""
+        if not self.running:
+            return 0
+        try:
+            return process_tree_rss(self.service.process.pid)
+        except Exception:
+            return None
+
+    def healthy(self) -> bool:
+        if not self.running:
+            return True
+        try:
+            self.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def worn_out(self) -> bool:
+        if self.uses >= DRIVER_MAX_USES:
+            return True
+        rss = self.rss()
+        return rss is not None and rss > DRIVER_MAX_RSS
+
+
+# a headless chrome uses roughly this much memory (MB) once a page is loaded
+DRIVER_MEMORY = int(os.environ.get("DRIVER_MEMORY", 300))
+# seconds to wait for the drivers to quit when exiting
+DRIVER_QUIT_TIMEOUT = int(os.environ.get("DRIVER_QUIT_TIMEOUT", 30))
+
+
+def available_memory() -> Union[int, None]:
+    """Available physical memory in MB, None if it can't be read"""
+    try:
+        pages = os.sysconf("SC_AVPHYS_PAGES")
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        return pages * page_size // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        pass
+
+    try:
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong),
+                ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong),
+                ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong),
+                ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong),
+                ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("sullAvailExtendedVirtual", ctypes.c_ulonglong),
+            ]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):  # type: ignore
+            return status.ullAvailPhys // (1024 * 1024)
+    except Exception:
+        pass
+
+    return None
+
+
+def default_driver_count() -> int:
+    """
+    Number of drivers to run at once: half the cores, but no more than
+    what fits in half of the available memory. DRIVER_COUNT overrides it.
+    """
+    if os.environ.get("DRIVER_COUNT"):
+        return max(1, int(os.environ["DRIVER_COUNT"]))
+
+    count = max(1, (os.cpu_count() or 2) // 2)
+    memory = available_memory()
+    if memory:
+        count = min(count, max(1, memory // 2 // DRIVER_MEMORY))
+    return count
+
 
 # create a selenium driver manager
 class DriverManager:
     def __init__(self, driver_count: int = -1):
         if driver_count == -1:
-            driver_count = (os.cpu_count() or 2) // 2
+            driver_count = default_driver_count()
 
         self.driver_count = driver_count
         self.manager: dict[str, Driver] = {}
@@ -248,7 +409,8 @@ class DriverManager:
         self._chromedrive_checked = False
         self._quited = False
 
-        self.lock = threading.Lock()
+        # guards self.manager, waiters are woken up when a driver is released
+        self.lock = threading.Condition()
 
     def check_for_chromedriver(self):
         if self._chromedrive_checked:
@@ -268,16 +430,21 @@ class DriverManager:
         return Driver(self.driver_options)
 
     def total_running(self):
-        total = 0
-        for key, value in self.manager.items():
-            if value.running:
-                total += 1
-        return total
+        # drivers start lazily on their first get(), so a driver counts
+        # as soon as it's handed out
+        return len(self.manager)
+
+    def started(self) -> bool:
+        """True if a chrome was actually started"""
+        with self.lock:
+            return any(driver.running for driver in self.manager.values())
 
     def get_usable(self):
-        for key, value in self.manager.items():
-            if value.usable:
-                return key, value
+        # prefer drivers that are already running
+        usable = [(k, v) for k, v in self.manager.items() if v.usable]
+        usable.sort(key=lambda i: not i[1].running)
+        if usable:
+            return usable[0]
         return None, None
 
     @property
@@ -294,40 +461,135 @@ class DriverManager:
 
         return options
 
-    def get_driver(self) -> tuple[str, webdriver.Chrome]:
+    @staticmethod
+    def configure(driver: Driver, remove_options: list[str] = [], capabilities: dict = {}):
+        """Drop default options and add capabilities, a running driver restarts on its next get()"""
+        for option in remove_options:
+            driver.remove_option(option)
+        for name, value in capabilities.items():
+            driver.set_capability(name, value)
+
+    def get_driver(
+        self, remove_options: list[str] = [], capabilities: dict = {}
+    ) -> tuple[str, Driver]:
+        """
+        A free driver, started on demand or a fresh one if it stopped responding.
+        Configured like warm() is, whichever way the driver was created.
+        """
+        key, driver = self.wait_for_driver()
+        if not driver.healthy():
+            logger.warning(f"Driver {key} is not responding, replacing it")
+            driver = self.replace_driver(key, driver)
+        self.configure(driver, remove_options, capabilities)
+        return key, driver
+
+    def wait_for_driver(self) -> tuple[str, Driver]:
+        with self.lock:
+            while True:
+                key, driver = self.get_usable()
+                if key:
+                    driver.usable = False  # type: ignore
+                    return key, driver  # type: ignore
+
+                if self.total_running() < self.driver_count:
+                    key = get_hash(str(uuid4()))
+                    driver = self.create_driver()
+                    driver.usable = False
+                    self.manager[key] = driver
+                    return key, driver
+
+                self.lock.wait()
+
+    def replace_driver(self, key: str, driver: Driver) -> Driver:
+        # the old driver is quit in the background, the new one starts on first use
+        new_driver = self.create_driver()
+        new_driver.usable = False
         with self.lock:
-            return self.wait_for_driver()
-
-    def wait_for_driver(self) -> tuple[str, webdriver.Chrome]:
-        while True:
-            ky, dr = self.get_usable()
-            if ky:
-                return ky, dr # type: ignore
-            
-            total = self.total_running()
-            if total < self.driver_count:
-                key = get_hash(str(uuid4()))
-                driver = self.create_driver()
-                driver.usable = False
-                self.manager[key] = driver
-                return key, driver
-            
-            time.sleep(0.1)
+            self.manager[key] = new_driver
+
+        threading.Thread(target=self._quit_driver, args=(key, driver), daemon=True).start()
+        return new_driver
 
     def release_driver(self, key: str):
         with self.lock:
-            if key in self.manager:
-                self.manager[key].usable = True
+            driver = self.manager.get(key)
+        if driver is None:
+            return
+
+        if driver.worn_out():
+            logger.info(f"Recycling driver {key} after {driver.uses} pages")
+            driver = self.replace_driver(key, driver)
+
+        with self.lock:
+            driver.usable = True
+            self.lock.notify()
+
+    def warm(
+        self, count: int = -1, remove_options: list[str] = [], capabilities: dict = {}
+    ) -> threading.Thread:
+        """
+        Start drivers in the background so they are ready when needed.
+
+        Parameters
+        ----------
+        count : int
+            Number of drivers to have running, all of them if -1
+        remove_options : list[str]
+            Default options to start the drivers without
+        capabilities : dict
+            Extra capabilities to start the drivers with
+        """
+
+        def _warm():
+            started = []
+            with self.lock:
+                target = self.driver_count if count == -1 else min(count, self.driver_count)
+                while self.total_running() < target:
+                    key, driver = get_hash(str(uuid4())), self.create_driver()
+                    self.configure(driver, remove_options, capabilities)
+                    driver.usable = False
+                    self.manager[key] = driver
+                    started.append((key, driver))
+
+            for key, driver in started:
+                try:
+                    driver.start()
+                except Exception as e:
+                    logger.error(f"Error while warming driver {key}: {e}")
+
+                with self.lock:
+                    quited = self.manager.get(key) is not driver
+                    driver.usable = True
+                    self.lock.notify()
+
+                if quited:
+                    self._quit_driver(key, driver)
+
+        t = threading.Thread(target=_warm)
+        t.daemon = True
+        t.start()
+        return t
+
+    def _quit_driver(self, key: str, driver: Driver):
+        try:
+            if driver.running:
+                driver.quit()
+        except Exception as e:
+            logger.error(f"Error while quitting driver {key}: {e}")
+            return False
+        return True
 
     def _quit(self):
         logger.info("Quitting drivers...")
 
+        with self.lock:
+            drivers = self.manager
+            self.manager = {}
+            self.lock.notify_all()
+
         flag = False
-        for key, value in self.manager.items():
-            try:
-                value.quit()
-            except Exception as e:
-                logger.error(f"Error while quitting driver {key}: {e}")
+        for key, value in drivers.items():
+            if not self._quit_driver(key, value):
                 flag = True
         
         if flag:
@@ -335,7 +597,6 @@ class DriverManager:
         else:
             logger.info("Drivers quited successfully")
 
-        self.manager = {}
         self._quited = False
 
     def quit(self) -> threading.Thread:
@@ -351,10 +612,16 @@ class DriverManager:
 
 @atexit.register
 def quit_drivers():
+    # nothing to do (or log, the streams may be closed) unless a chrome was started
+    if not driver_manager.started():
+        return
     try:
-        driver_manager.quit()
+        t = driver_manager.quit()
+        # a daemon thread would be killed at exit, leaving chrome running
+        if t:
+            t.join(DRIVER_QUIT_TIMEOUT)
     except Exception as e:
         logger.error(f"Error while quitting drivers: {e}")
 
 
-driver_manager = DriverManager(2)
+driver_manager = DriverManager()
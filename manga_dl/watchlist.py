@@ -0,0 +1,208 @@
+import concurrent.futures as cf
+import json
+import os
+import sys
+import threading
+import time
+from queue import Queue
+from typing import Union
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tools import get_app_path, logger, safe_remove
+from tools.client import HOST_LIMIT
+from manga import Manga
+from manga_sources import Chapter, get_source
+
+
+WATCHLIST_PATH = os.path.join(get_app_path(), "watchlist.json")
+# seconds between two polls of the watchlist
+SYNC_INTERVAL = int(os.environ.get("SYNC_INTERVAL", 60 * 60))
+
+
+class Watchlist:
+    """
+    Series to keep up to date, with the chapters already downloaded of each.
+
+    Entries are saved by url as {"title", "format", "quality", "downloaded", "checked"},
+    downloaded being chapter ids.
+
+    Methods:
+        add(manga: Manga, format: str, quality: int, download_existing: bool) Watch a series.
+
+        remove(url: str) Stop watching a series.
+
+        new_chapters(manga: Manga) Chapters of manga that weren't downloaded yet.
+
+        mark_downloaded(manga: Manga, chapters: list[Chapter]) Remember chapters as downloaded.
+    """
+
+    def __init__(self, path: str = WATCHLIST_PATH):
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading watchlist from {path}: {e}")
+
+    def __len__(self):
+        return len(self.entries)
+
+    def save(self):
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(self.entries, f, indent=2)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logger.error(f"Error saving watchlist to {self.path}: {e}")
+                safe_remove(tmp_path)
+
+    def add(self, manga: Manga, format: str = "epub", quality: int = 100, download_existing=False):
+        """
+        Watch manga. Its current chapters are only downloaded on the next sync
+        if download_existing, otherwise only the ones released after now are.
+        """
+        manga.set_info()
+        with self._lock:
+            self.entries[manga.url] = {
+                "title": manga.title,
+                "format": format,
+                "quality": quality,
+                "downloaded": [] if download_existing else [i.id for i in manga.chapters],
+                "checked": time.time(),
+            }
+        self.save()
+        logger.info(f"Watching {manga.title} ({len(self.entries)} series)")
+
+    def remove(self, url: str) -> bool:
+        with self._lock:
+            entry = self.entries.pop(url, None)
+        if entry:
+            self.save()
+            logger.info(f"Stopped watching {entry['title']}")
+        return entry is not None
+
+    def new_chapters(self, manga: Manga) -> list[Chapter]:
+        with self._lock:
+            downloaded = set(self.entries[manga.url]["downloaded"])
+        return [i for i in manga.chapters if i.id not in downloaded]
+
+    def mark_downloaded(self, manga: Manga, chapters: list[Chapter]):
+        with self._lock:
+            entry = self.entries[manga.url]
+            entry["downloaded"].extend(i.id for i in chapters)
+            entry["title"] = manga.title
+        self.save()
+
+    def by_source(self) -> dict[str, list[str]]:
+        """Urls of the series, grouped by source"""
+        groups: dict[str, list[str]] = {}
+        for url in self.entries:
+            try:
+                name = get_source(url).name
+            except Exception as e:
+                logger.error(f"Skipping {url}: {e}")
+                continue
+            groups.setdefault(name, []).append(url)
+        return groups
+
+
+def poll(watchlist: Watchlist, url: str) -> Union[tuple[Manga, list[Chapter]], None]:
+    """The series' new chapters, None if it has none or can't be reached"""
+    try:
+        manga = Manga(url)
+        # conditional request, a page that didn't change costs a 304
+        manga.set_info(refresh=True)
+    except Exception as e:
+        logger.error(f"Error checking {url}: {e}")
+        return None
+
+    with watchlist._lock:
+        watchlist.entries[url]["checked"] = time.time()
+
+    chapters = watchlist.new_chapters(manga)
+    if not chapters:
+        return None
+    logger.info(f"{manga.title}: {len(chapters)} new chapters")
+    return manga, chapters
+
+
+def download(watchlist: Watchlist, manga: Manga, chapters: list[Chapter]):
+    entry = watchlist.entries[manga.url]
+    manga.select_chapters(chapters)
+
+    create = getattr(manga, f"create_{entry['format']}")
+    path = create(quality=entry["quality"])
+    watchlist.mark_downloaded(manga, chapters)
+    logger.info(f"{manga.title}: saved {len(chapters)} new chapters to {path}")
+
+
+def sync_once(watchlist: Watchlist) -> int:
+    """
+    Check every series for new chapters and download them.
+
+    Series are checked source by source in parallel, at most HOST_LIMIT at
+    a time per source. New chapters are queued and downloaded one series at
+    a time while the rest are still being checked.
+
+    Returns
+    -------
+    int
+        Series with new chapters
+    """
+    queue: Queue = Queue()
+    updated = 0
+
+    def downloader():
+        while True:
+            item = queue.get()
+            if item is None:
+                break
+            try:
+                download(watchlist, *item)
+            except Exception as e:
+                logger.error(f"Error downloading new chapters of {item[0].url}: {e}")
+
+    thread = threading.Thread(target=downloader, daemon=True)
+    thread.start()
+
+    groups = watchlist.by_source()
+    executors = [cf.ThreadPoolExecutor(HOST_LIMIT) for _ in groups]
+    try:
+        futures = [
+            executor.submit(poll, watchlist, url)
+            for executor, urls in zip(executors, groups.values())
+            for url in urls
+        ]
+        for future in cf.as_completed(futures):
+            result = future.result()
+            if result:
+                updated += 1
+                queue.put(result)
+    finally:
+        for executor in executors:
+            executor.shutdown()
+        queue.put(None)
+        thread.join()
+        watchlist.save()
+
+    return updated
+
+
+def sync(watchlist: Watchlist, interval: int = SYNC_INTERVAL, once: bool = False):
+    """Keep the watchlist up to date, checking it every interval seconds"""
+    while True:
+        started = time.time()
+        logger.info(f"Checking {len(watchlist)} series for new chapters")
+        updated = sync_once(watchlist)
+        logger.info(f"{updated} series updated in {time.time() - started:.0f}s")
+
+        if once:
+            return
+        time.sleep(max(0, interval - (time.time() - started)))
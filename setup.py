@@ -50,9 +50,16 @@ setup(
     author_email=package_author_email,
     url="https://github.com/shhossain/RapidMangaDL",
     packages=find_packages(),
-    package_data={"manga_dl": ["public/*", "templates/*"]},
+    package_data={
+        "manga_dl": ["public/*", "templates/*"],
+        "manga_dl.manga_sources": ["fixtures/*.html"],
+    },
     include_package_data=True,
     install_requires=requirements,
+    extras_require={
+        # lossless cuts of long jpeg strips, needs libjpeg-turbo
+        "turbojpeg": ["PyTurboJPEG"],
+    },
     entry_points={
         "console_scripts": [
             "manga-dl = manga_dl.main:main",
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+MANGA_DL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "manga_dl")
+sys.path.append(MANGA_DL)
+
+import app
+
+DOWNLOAD = {"start_id": "1", "end_id": "2", "quality": 80, "dtypes": ["epub"], "manga_id": "bato_1_x"}
+
+
+@pytest.mark.parametrize("option", [{"profile": "kindle"}, {"img_format": "gif"}])
+def test_download_rejects_unknown_options(option):
+    res = app.app.test_client().post("/api/manga/download", json={**DOWNLOAD, **option})
+
+    assert res.status_code == 400
+    assert res.get_json()["success"] is False
+    # the rejected request didn't take the download slot
+    assert app.isDownloading.value == 0
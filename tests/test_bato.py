@@ -0,0 +1,39 @@
+import os
+import sys
+
+MANGA_DL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "manga_dl")
+sys.path.append(MANGA_DL)
+
+from manga_sources import Bato
+
+FIXTURES = os.path.join(MANGA_DL, "manga_sources", "fixtures")
+
+
+def read_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def test_chapter_img_urls_v2():
+    urls = Bato.parse_chapter_img_urls(read_fixture("bato_chapter_v2.html"))
+
+    assert len(urls) == 12
+    assert urls[0] == (
+        "https://xfs-n05.xfsbb.com/comic/7006/a41/65e4b1d77c6c1e2d5c3f4a41/48211000_1200_1740_310000.jpeg"
+    )
+    assert urls[-1] == (
+        "https://xfs-n05.xfsbb.com/comic/7006/a41/65e4b1d77c6c1e2d5c3f4a41/48211011_1200_1773_320747.jpeg"
+    )
+
+
+def test_chapter_img_urls_v3():
+    urls = Bato.parse_chapter_img_urls(read_fixture("bato_chapter_v3.html"))
+
+    assert urls == [
+        f"https://k07.mbuul.org/media/mbch/1b6/65f8c3a4e1d2b0c9a8f7e6d5/{20990000 + i}.webp"
+        for i in range(9)
+    ]
+
+
+def test_chapter_img_urls_without_image_data():
+    assert Bato.parse_chapter_img_urls("<html><body><div id='viewer'></div></body></html>") == []
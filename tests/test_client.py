@@ -0,0 +1,94 @@
+import os
+import sys
+
+import pytest
+import requests
+
+MANGA_DL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "manga_dl")
+sys.path.append(MANGA_DL)
+
+from tools import HttpClient, StubBackend
+from tools.client import POOL_SIZE
+from tools.exceptions import NotModified
+from tools.mirrors import Mirrors
+
+PAGE = "https://chapmanganato.com/manga-dr980474"
+
+
+class FlakyStub(StubBackend):
+    """Raises a connection error for the hosts in down"""
+
+    def __init__(self, responses: dict, down: set):
+        super().__init__(responses)
+        self.down = down
+
+    def request(self, method, url, **kwargs):
+        if requests.utils.urlparse(url).netloc in self.down:
+            self.requests.append((method, url))
+            raise requests.ConnectionError(f"connection refused: {url}")
+        return super().request(method, url, **kwargs)
+
+
+def test_hooks_and_metrics_see_every_request():
+    client = HttpClient(backend=StubBackend({PAGE: "<html>page</html>"}))
+    events = []
+    client.add_hook(events.append)
+    client.add_hook(lambda event: 1 / 0)  # a broken hook doesn't break requests
+
+    assert client.get(PAGE).text == "<html>page</html>"
+    assert client.get(PAGE + "/missing").status_code == 404
+
+    assert [(i["url"], i["status"], i["bytes"]) for i in events] == [
+        (PAGE, 200, len("<html>page</html>")),
+        (PAGE + "/missing", 404, 0),
+    ]
+    metrics = client.metrics["chapmanganato.com"]
+    assert metrics["requests"] == 2
+    assert metrics["errors"] == 1
+    assert metrics["bytes"] == len("<html>page</html>")
+
+
+def test_connection_errors_are_retried_on_another_mirror(tmp_path):
+    stub = FlakyStub({"https://mto.to/series/1": "page"}, down={"bato.to"})
+    client = HttpClient(backend=stub)
+    mirrors = Mirrors("bato", ["bato.to", "mto.to"], path=str(tmp_path / "mirrors.json"))
+    client.add_mirrors(mirrors)
+    mirrors.probe_func = None
+
+    assert client.get("https://bato.to/series/1").text == "page"
+    assert [url for _, url in stub.requests] == ["https://bato.to/series/1", "https://mto.to/series/1"]
+    assert client.metrics["bato.to"]["errors"] == 1
+
+
+def test_connection_errors_without_mirrors_are_raised():
+    stub = FlakyStub({}, down={"chapmanganato.com"})
+    client = HttpClient(backend=stub)
+
+    with pytest.raises(requests.ConnectionError):
+        client.get(PAGE)
+    assert len(stub.requests) == 1
+    assert client.metrics["chapmanganato.com"]["errors"] == 1
+
+
+def test_revalidation_raises_not_modified():
+    stub = StubBackend()
+    stub.add(PAGE, "<html>page</html>", headers={"ETag": '"v1"'})
+    client = HttpClient(backend=stub)
+
+    with client.revalidating({PAGE: {}}) as received:
+        client.get(PAGE)
+    assert received[PAGE] == {"etag": '"v1"'}
+
+    with pytest.raises(NotModified):
+        with client.revalidating(received):
+            client.get(PAGE)
+
+
+def test_session_is_built_on_first_use_with_pooled_adapters():
+    client = HttpClient()
+    assert client._session is None
+
+    adapters = client.session.adapters
+    assert {i._pool_maxsize for i in adapters.values()} == {POOL_SIZE}
+    # the https adapter keeps the scraper's TLS settings
+    assert adapters["https://"].cipherSuite
@@ -0,0 +1,66 @@
+import os
+import sys
+
+MANGA_DL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "manga_dl")
+sys.path.append(MANGA_DL)
+
+import tools.utils
+from tools.utils import DRIVER_MAX_USES, DriverManager, quit_drivers
+
+REMOVE = ["--blink-settings=imagesEnabled=false"]
+CAPABILITIES = {"goog:loggingPrefs": {"performance": "ALL"}}
+
+
+def make_manager(count: int = 1) -> DriverManager:
+    manager = DriverManager(count)
+    # drivers only start chrome on their first get(), none is started here
+    manager._chromedrive_checked = True
+    return manager
+
+
+def configured(driver) -> bool:
+    return (
+        REMOVE[0] not in driver.options.arguments
+        and driver.options.capabilities.get("goog:loggingPrefs") == CAPABILITIES["goog:loggingPrefs"]
+    )
+
+
+def test_on_demand_driver_is_configured():
+    manager = make_manager()
+    key, driver = manager.get_driver(REMOVE, CAPABILITIES)
+
+    assert configured(driver)
+    manager.release_driver(key)
+
+
+def test_recycled_driver_is_configured_on_next_use():
+    manager = make_manager()
+    key, driver = manager.get_driver(REMOVE, CAPABILITIES)
+    driver.uses = DRIVER_MAX_USES
+    manager.release_driver(key)
+
+    key, recycled = manager.get_driver(REMOVE, CAPABILITIES)
+    assert recycled is not driver
+    assert configured(recycled)
+    manager.release_driver(key)
+
+
+def test_default_drivers_keep_default_options():
+    manager = make_manager()
+    key, driver = manager.get_driver()
+
+    assert not configured(driver)
+    manager.release_driver(key)
+
+
+def test_exit_skips_managers_that_never_started_chrome(monkeypatch):
+    manager = make_manager()
+    key, _ = manager.get_driver()
+    manager.release_driver(key)
+    monkeypatch.setattr(tools.utils, "driver_manager", manager)
+
+    quit_drivers()
+
+    # handed out but never started, so there was nothing to quit
+    assert not manager._quited
+    assert len(manager.manager) == 1
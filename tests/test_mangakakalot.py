@@ -0,0 +1,134 @@
+import base64
+import io
+import json
+import os
+import sys
+
+from PIL import Image
+
+MANGA_DL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "manga_dl")
+sys.path.append(MANGA_DL)
+
+from manga_sources import MangaKakalot
+from manga_sources.store import close_stores
+
+FIXTURES = os.path.join(MANGA_DL, "manga_sources", "fixtures")
+CHAPTER_URL = "https://mangakakalot.to/read/omniscient-readers-viewpoint-2/en/chapter-180"
+
+
+def read_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+class FakeDriver:
+    """Plays back a chapter page and its DevTools events, counts the canvas waits"""
+
+    def __init__(self, html: str, log: list, canvases: int = 8, data_urls: list = []):
+        self.page_source = html
+        self.canvases = canvases
+        self.data_urls = data_urls
+        self.scripts = 0
+        self.waits = 0
+        self._log = log
+        self._pending: list = []
+
+    def remove_option(self, option):
+        pass
+
+    def set_capability(self, name, value):
+        pass
+
+    def get(self, url):
+        self._pending = self._log
+
+    def get_log(self, kind):
+        entries, self._pending = self._pending, []
+        return entries
+
+    def find_elements(self, by, value):
+        return [object()] * self.canvases
+
+    def find_element(self, by, value):
+        self.waits += 1
+        return object()
+
+    def execute_cdp_cmd(self, cmd, params):
+        return {"body": base64.b64encode(params["requestId"].encode()).decode(), "base64Encoded": True}
+
+    def execute_script(self, script):
+        self.scripts += 1
+        return self.data_urls
+
+
+def png_data_url(shade: int) -> str:
+    buffer = io.BytesIO()
+    Image.new("L", (8, 12), shade).save(buffer, "PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def make_source(tmp_path) -> MangaKakalot:
+    source = MangaKakalot("https://mangakakalot.to/omniscient-readers-viewpoint-2")
+    source._temp_dir = str(tmp_path)
+    return source
+
+
+def test_select_page_images_keeps_the_pages_in_request_order():
+    log = json.loads(read_fixture("mangakakalot_chapter_network.json"))
+    pages = MangaKakalot.select_page_images([json.loads(i["message"])["message"] for i in log])
+
+    assert [url for url, _ in pages] == [
+        f"https://c-1.mangakakalot.to/scrambled/2310871/{n:02d}.jpg" for n in range(1, 9)
+    ]
+
+
+def test_captured_pages_skip_the_canvas_wait(tmp_path):
+    log = json.loads(read_fixture("mangakakalot_chapter_network.json"))
+    driver = FakeDriver(read_fixture("mangakakalot_chapter_canvas.html"), log)
+    try:
+        paths = make_source(tmp_path).get_chapter_img_urls(CHAPTER_URL, driver=driver)
+    finally:
+        close_stores()
+
+    assert driver.waits == 0
+    assert len(paths) == 8
+    assert all(os.path.exists(i) for i in paths)
+
+
+def test_missing_captures_wait_for_the_canvases(tmp_path):
+    log = json.loads(read_fixture("mangakakalot_chapter_network.json"))
+    # the last page hasn't been requested by the load event
+    driver = FakeDriver(read_fixture("mangakakalot_chapter_canvas.html"), log, canvases=9)
+    try:
+        make_source(tmp_path).get_chapter_img_urls(CHAPTER_URL, driver=driver)
+    finally:
+        close_stores()
+
+    assert driver.waits >= 1
+
+
+def test_canvases_are_saved_in_one_script_call(tmp_path, monkeypatch):
+    monkeypatch.setenv("CAPTURE_NETWORK", "0")
+    data_urls = [png_data_url(i * 30) for i in range(8)]
+    driver = FakeDriver(read_fixture("mangakakalot_chapter_canvas.html"), [], data_urls=data_urls)
+    try:
+        paths = make_source(tmp_path).get_chapter_img_urls(CHAPTER_URL, driver=driver)
+    finally:
+        close_stores()
+
+    assert driver.scripts == 1
+    assert [Image.open(i).getpixel((0, 0)) for i in paths] == [i * 30 for i in range(8)]
+    assert all(i.endswith(".png") for i in paths)
+
+
+def test_unreadable_canvas_fails_the_chapter(tmp_path, monkeypatch):
+    monkeypatch.setenv("CAPTURE_NETWORK", "0")
+    data_urls = [png_data_url(0)] * 7 + [None]
+    driver = FakeDriver(read_fixture("mangakakalot_chapter_canvas.html"), [], data_urls=data_urls)
+    try:
+        paths = make_source(tmp_path).get_chapter_img_urls(CHAPTER_URL, driver=driver)
+    finally:
+        close_stores()
+
+    assert paths == []
+    assert not list(tmp_path.glob("*.png"))
@@ -0,0 +1,63 @@
+import os
+import sys
+
+MANGA_DL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "manga_dl")
+sys.path.append(MANGA_DL)
+
+from tools import HttpClient, StubBackend
+from tools.mirrors import FAILURE_LIMIT, Mirrors
+
+
+def make_client(tmp_path, responses: dict) -> tuple[HttpClient, Mirrors, StubBackend]:
+    stub = StubBackend()
+    for url, (status, body) in responses.items():
+        stub.add(url, body, status)
+    client = HttpClient(backend=stub)
+    mirrors = Mirrors("bato", ["bato.to", "mto.to"], path=str(tmp_path / "mirrors.json"))
+    client.add_mirrors(mirrors)
+    # no background probes of the failed mirror
+    mirrors.probe_func = None
+    return client, mirrors, stub
+
+
+def test_failed_mirror_is_retried_on_the_next(tmp_path):
+    client, _, stub = make_client(
+        tmp_path,
+        {
+            "https://bato.to/series/1": (503, "down"),
+            "https://mto.to/series/1": (200, "page"),
+        },
+    )
+
+    res = client.get("https://bato.to/series/1")
+
+    assert res.text == "page"
+    assert stub.requests == [("GET", "https://bato.to/series/1"), ("GET", "https://mto.to/series/1")]
+
+
+def test_traffic_moves_to_the_next_mirror(tmp_path):
+    client, mirrors, stub = make_client(
+        tmp_path,
+        {
+            "https://bato.to/series/1": (503, "down"),
+            "https://mto.to/series/1": (200, "page"),
+        },
+    )
+
+    for _ in range(FAILURE_LIMIT):
+        client.get("https://bato.to/series/1")
+    stub.requests.clear()
+
+    assert mirrors.current == "mto.to"
+    assert client.get("https://bato.to/series/1").text == "page"
+    assert stub.requests == [("GET", "https://mto.to/series/1")]
+    # the choice is kept for the next run
+    assert Mirrors("bato", ["bato.to", "mto.to"], path=mirrors.path).current == "mto.to"
+
+
+def test_client_errors_are_not_failovers(tmp_path):
+    client, mirrors, stub = make_client(tmp_path, {"https://bato.to/series/1": (404, "")})
+
+    assert client.get("https://bato.to/series/1").status_code == 404
+    assert stub.requests == [("GET", "https://bato.to/series/1")]
+    assert mirrors.failures["bato.to"] == 0
@@ -0,0 +1,54 @@
+import os
+import sys
+import threading
+import time
+
+MANGA_DL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "manga_dl")
+sys.path.append(MANGA_DL)
+
+import manga
+from manga import Manga
+from manga_sources import MangaInfo
+
+
+class FakeSource:
+    def __init__(self, name: str, delay: float = 0, error: bool = False, hang: bool = False):
+        self.name = name
+        self.domain = f"{name}.test"
+        self.delay = delay
+        self.error = error
+        self.release = threading.Event() if hang else None
+
+    def search(self, query: str) -> list[MangaInfo]:
+        if self.release:
+            self.release.wait()
+        time.sleep(self.delay)
+        if self.error:
+            raise Exception("unreachable")
+        return [MangaInfo(f"{query} {self.name}", f"https://bato.to/series/{len(self.name)}/{self.name}")]
+
+
+def run(monkeypatch, fakes, deadline):
+    monkeypatch.setattr(manga, "sources", fakes)
+    started = time.monotonic()
+    names = [name for name, _ in Manga.search_iter("solo", deadline)]
+    return names, time.monotonic() - started
+
+
+def test_results_stream_as_sources_finish(monkeypatch):
+    names, _ = run(monkeypatch, [FakeSource("slow", 0.3), FakeSource("fast")], 5)
+    assert names == ["fast", "slow"]
+
+
+def test_failing_source_is_skipped(monkeypatch):
+    names, _ = run(monkeypatch, [FakeSource("broken", error=True), FakeSource("fine")], 5)
+    assert names == ["fine"]
+
+
+def test_hung_source_misses_its_deadline(monkeypatch):
+    hung = FakeSource("hung", hang=True)
+    names, took = run(monkeypatch, [hung, FakeSource("fine", 0.05)], 0.3)
+
+    assert names == ["fine"]
+    assert took < 1
+    hung.release.set()
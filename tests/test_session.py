@@ -0,0 +1,42 @@
+import os
+import sys
+import time
+
+import requests
+from requests.cookies import create_cookie
+
+MANGA_DL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "manga_dl")
+sys.path.append(MANGA_DL)
+
+from tools.session import load_session, save_session
+
+
+def make_session(value: str = "abc") -> requests.Session:
+    session = requests.Session()
+    session.headers["User-Agent"] = "Mozilla/5.0 test"
+    session.cookies.set_cookie(
+        create_cookie("cf_clearance", value, domain=".bato.to", expires=int(time.time()) + 3600)
+    )
+    return session
+
+
+def test_save_session_only_writes_changes(tmp_path):
+    path = str(tmp_path / "session.json")
+    session = make_session()
+
+    assert save_session(session, path)
+    assert not save_session(session, path)
+
+    session.cookies.set("cf_clearance", "def", domain=".bato.to")
+    assert save_session(session, path)
+
+
+def test_loaded_session_is_not_saved_again(tmp_path):
+    path = str(tmp_path / "session.json")
+    save_session(make_session(), path)
+
+    session = requests.Session()
+    assert load_session(session, path)
+    assert session.headers["User-Agent"] == "Mozilla/5.0 test"
+    assert session.cookies.get("cf_clearance") == "abc"
+    assert not save_session(session, path)
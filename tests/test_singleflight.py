@@ -0,0 +1,121 @@
+import io
+import os
+import sys
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+MANGA_DL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "manga_dl")
+sys.path.append(MANGA_DL)
+
+from tools import Downloader, SingleFlight, StubBackend
+from tools.client import client
+
+CALLERS = 8
+
+
+def run_together(target) -> list:
+    """Call target from CALLERS threads released at once, results in thread order"""
+    barrier = threading.Barrier(CALLERS)
+    results: list = [None] * CALLERS
+
+    def call(i):
+        barrier.wait()
+        try:
+            results[i] = target()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return "page"
+
+    results = run_together(lambda: flight.do("key", fetch))
+
+    assert len(calls) == 1
+    assert [i[0] for i in results] == ["page"] * CALLERS
+    assert sorted(i[1] for i in results) == [False] + [True] * (CALLERS - 1)
+    assert len(flight) == 0
+
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        raise ValueError("gone")
+
+    results = run_together(lambda: flight.do("key", fetch))
+
+    assert len(calls) == 1
+    assert all(isinstance(i, ValueError) for i in results)
+    # nothing is kept, the next call runs again
+    with pytest.raises(ValueError):
+        flight.do("key", fetch)
+    assert len(calls) == 2
+
+
+class SlowStub(StubBackend):
+    def request(self, method, url, **kwargs):
+        time.sleep(0.2)
+        return super().request(method, url, **kwargs)
+
+
+def test_concurrent_downloads_of_an_image_fetch_it_once(tmp_path, monkeypatch):
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), "white").save(buffer, "JPEG")
+    url = "https://xfs-n05.xfsbb.com/comic/7006/page_1.jpeg"
+    stub = SlowStub({url: buffer.getvalue()})
+    monkeypatch.setattr(client, "backend", stub)
+
+    results = run_together(lambda: Downloader.download_one(url, {}, str(tmp_path)))
+
+    assert stub.requests == [("GET", url)]
+    assert len({i.filepath for i in results}) == 1
+    assert os.path.exists(results[0].filepath)
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_concurrent_info_lookups_fetch_the_page_once(tmp_path, monkeypatch):
+    import manga_sources.utils
+    from manga_sources import MangaNato
+    from manga_sources.store import close_stores
+
+    url = "https://chapmanganato.com/manga-dr980474"
+    with open(os.path.join(MANGA_DL, "manga_sources", "fixtures", "manganato_info.html"), "rb") as f:
+        stub = SlowStub({url: f.read()})
+    monkeypatch.setattr(client, "backend", stub)
+    # keep the user's catalog out of it
+    monkeypatch.setattr(manga_sources.utils, "get_catalog", lambda: None)
+
+    def get_info():
+        source = MangaNato(url)
+        source._temp_dir = str(tmp_path)
+        return source.get_info()
+
+    try:
+        results = run_together(get_info)
+    finally:
+        close_stores()
+
+    assert stub.requests == [("GET", url)]
+    assert {i.title for i in results} == {"Solo Leveling"}
+    # waiters get their own copy of the info
+    assert len({id(i) for i in results}) == CALLERS
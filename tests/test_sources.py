@@ -0,0 +1,60 @@
+import os
+import sys
+
+import pytest
+
+MANGA_DL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "manga_dl")
+sys.path.append(MANGA_DL)
+
+from manga_sources import Bato, MangaKakalot, MangaNato, ONEkissmanga
+from manga_sources.utils import make_soup
+
+FIXTURES = os.path.join(MANGA_DL, "manga_sources", "fixtures")
+
+INFO_PAGES = [
+    (MangaNato("https://chapmanganato.com/manga-dr980474"), "manganato_info.html", 20),
+    (ONEkissmanga("https://1stkissmanga.me/manga/solo-leveling/"), "onekissmanga_info.html", 16),
+    (Bato("https://bato.to/series/72315/solo-leveling"), "bato_info.html", 18),
+    (MangaKakalot("https://mangakakalot.to/solo-leveling-2186"), "mangakakalot_info.html", 0),
+]
+
+
+def read_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def chapter_list(info) -> list[tuple[str, str]]:
+    return [(c.url, c.title) for c in info.chapters]
+
+
+@pytest.mark.parametrize("source, fixture, chapters", INFO_PAGES)
+def test_strained_info_matches_full_parse(source, fixture, chapters):
+    html = read_fixture(fixture)
+    full = source.parse_info(make_soup(html))
+    strained = source.parse_info(make_soup(html, source.strainers["info"]))
+
+    assert strained.title == full.title == "Solo Leveling"
+    assert strained.cover_url == full.cover_url
+    assert strained.description == full.description
+    assert chapter_list(strained) == chapter_list(full)
+    assert len(full.chapters) == chapters
+
+
+def test_info_chapters_are_oldest_first():
+    source, fixture, _ = INFO_PAGES[0]
+    info = source.parse_info(make_soup(read_fixture(fixture), source.strainers["info"]))
+
+    assert info.chapters[0].url == "https://chapmanganato.com/manga-dr980474/chapter-1"
+    assert info.chapters[-1].title == "Chapter 20"
+
+
+def test_strained_chapters_match_full_parse():
+    source = INFO_PAGES[-1][0]
+    html = read_fixture("mangakakalot_chapters.html")
+    full = source.parse_chapters(make_soup(html))
+    strained = source.parse_chapters(make_soup(html, source.strainers["chapters"]))
+
+    assert [(c.url, c.title) for c in strained] == [(c.url, c.title) for c in full]
+    assert len(full) == 15
+    assert full[0].url == "https://mangakakalot.to/read/solo-leveling-2186/en/chapter-1"
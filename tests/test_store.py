@@ -0,0 +1,84 @@
+import json
+import os
+import sys
+
+MANGA_DL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "manga_dl")
+sys.path.append(MANGA_DL)
+
+from tools import get_file_name
+from manga_sources import store as store_module
+from manga_sources.store import SCHEMA_VERSION, MetadataStore, get_store
+
+URL = "https://chapmanganato.com/manga-ab123456"
+CHAPTER_URL = f"{URL}/chapter-1"
+
+
+def write_json(path: str, data, mtime: float = 0):
+    with open(path, "w") as f:
+        json.dump(data, f)
+    if mtime:
+        os.utime(path, (mtime, mtime))
+
+
+def write_caches(folder):
+    manga_key = get_file_name(URL, True)
+    images_key = get_file_name(CHAPTER_URL, True)
+    write_json(
+        os.path.join(folder, f"{manga_key}_info.json"),
+        {"url": URL, "title": "Title", "chapters": [{"url": CHAPTER_URL, "id": "1", "title": "Chapter 1"}]},
+        mtime=1000,
+    )
+    write_json(os.path.join(folder, f"{images_key}_info.json"), ["https://img/1.jpg", "https://img/2.jpg"])
+    return manga_key, images_key
+
+
+def test_migrate_fills_ids_and_urls(tmp_path):
+    manga_key, images_key = write_caches(tmp_path)
+    store = MetadataStore(str(tmp_path / "metadata.db"))
+
+    assert store.version == 0
+    assert store.migrate(str(tmp_path)) == 2
+    assert store.version == SCHEMA_VERSION
+    assert not list(tmp_path.glob("*_info.json"))
+
+    data, updated = store.get_manga(manga_key)
+    assert data["title"] == "Title" and updated == 1000
+    assert store.manga_by_id("manganato_ab123456")["url"] == URL
+    assert store._one("SELECT url FROM images WHERE key = ?", (images_key,))[0] == CHAPTER_URL
+    store.close()
+
+
+def test_migrate_keeps_newer_rows(tmp_path):
+    manga_key, _ = write_caches(tmp_path)
+    store = MetadataStore(str(tmp_path / "metadata.db"))
+    store.put_manga(manga_key, URL, "manganato_ab123456", {"url": URL, "title": "Newer"})
+
+    store.migrate(str(tmp_path))
+
+    assert store.get_manga(manga_key)[0]["title"] == "Newer"
+    store.close()
+
+
+def test_failed_migration_keeps_files(tmp_path, monkeypatch):
+    write_caches(tmp_path)
+    store = MetadataStore(str(tmp_path / "metadata.db"))
+    monkeypatch.setattr(store, "_write", lambda statements: False)
+
+    assert store.migrate(str(tmp_path)) == 0
+    assert len(list(tmp_path.glob("*_info.json"))) == 2
+    assert store.version == 0
+    store.close()
+
+
+def test_get_store_migrates_once(tmp_path, monkeypatch):
+    write_caches(tmp_path)
+    monkeypatch.setattr(store_module, "_stores", {})
+    store = get_store(str(tmp_path))
+    assert store.version == SCHEMA_VERSION
+    store_module.close_stores()
+
+    # a json cache written by an older version after the migration stays put
+    write_json(os.path.join(tmp_path, "late_info.json"), ["https://img/3.jpg"])
+    get_store(str(tmp_path))
+    store_module.close_stores()
+    assert os.path.exists(os.path.join(tmp_path, "late_info.json"))
@@ -0,0 +1,49 @@
+import logging
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+MANGA_DL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "manga_dl")
+sys.path.append(MANGA_DL)
+
+from tools import image_utils
+from tools.image_utils import split_strip
+
+
+def make_strip(path: str, panels: int = 4, width: int = 200):
+    """White strip with a dark panel every 1.5 widths, gutters in between"""
+    page = int(width * 1.5)
+    strip = np.full((page * panels, width, 3), 255, dtype=np.uint8)
+    for i in range(panels):
+        strip[i * page + 40 : (i + 1) * page - 40, 20:-20] = 40
+    Image.fromarray(strip).save(path, quality=90)
+
+
+def test_strip_is_cut_at_gutters(tmp_path):
+    path = str(tmp_path / "strip.jpg")
+    make_strip(path)
+
+    paths = split_strip(path)
+
+    slices = [np.asarray(Image.open(i).convert("L")) for i in paths]
+    assert sum(i.shape[0] for i in slices) == 1200
+    assert all(i.shape[0] <= 300 for i in slices)
+    # every cut is on a gutter, no panel is cut through
+    assert all(i[-1].min() > 200 for i in slices[:-1])
+    # cached, the second call doesn't cut again
+    assert split_strip(path) == paths
+
+
+def test_decoded_fallback_is_logged_once(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(image_utils, "turbojpeg", None)
+    monkeypatch.setattr(image_utils, "_fallback_logged", False)
+    for i in range(2):
+        make_strip(str(tmp_path / f"strip{i}.jpg"))
+
+    with caplog.at_level(logging.INFO, logger=image_utils.logger.name):
+        split_strip(str(tmp_path / "strip0.jpg"))
+        split_strip(str(tmp_path / "strip1.jpg"))
+
+    assert sum("PyTurboJPEG" in i.message for i in caplog.records) == 1